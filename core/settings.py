@@ -14,6 +14,7 @@ import os
 from pathlib import Path
 import environ
 import dj_database_url
+from corsheaders.defaults import default_headers
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -64,6 +65,9 @@ INSTALLED_APPS += [
 ]
 
 MIDDLEWARE = [
+    'esports.middleware.PerformanceMiddleware',
+    'esports.middleware.QueryDetectorMiddleware',
+    'esports.middleware.ReplicaMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -97,10 +101,82 @@ WSGI_APPLICATION = 'core.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Persistent connections (DB_CONN_MAX_AGE > 0) only suit WSGI workers.
+# Under ASGI each async request runs its queries on a new thread, so
+# kept-alive connections pile up; enable DB_POOL there instead.
 DATABASES = {
-    'default': dj_database_url.parse(env('POSTGRES_URL'))
+    'default': dj_database_url.parse(
+        env('POSTGRES_URL'),
+        conn_max_age=env.int('DB_CONN_MAX_AGE', default=0),
+        conn_health_checks=env.bool('DB_CONN_HEALTH_CHECKS', default=True),
+    )
 }
 
+# In-process pooling needs psycopg 3 (the `pool` extra) and replaces
+# persistent connections: each request borrows a pooled connection.
+if env.bool('DB_POOL', default=False):
+    from psycopg_pool import ConnectionPool
+
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = False
+    DATABASES['default'].setdefault('OPTIONS', {})['pool'] = {
+        'min_size': env.int('DB_POOL_MIN_SIZE', default=2),
+        'max_size': env.int('DB_POOL_MAX_SIZE', default=10),
+        'timeout': env.float('DB_POOL_TIMEOUT', default=10.0),
+        'max_idle': env.float('DB_POOL_MAX_IDLE', default=600.0),
+        'max_lifetime': env.float('DB_POOL_MAX_LIFETIME', default=3600.0),
+    }
+    if env.bool('DB_POOL_HEALTH_CHECKS', default=True):
+        DATABASES['default']['OPTIONS']['pool']['check'] = \
+            ConnectionPool.check_connection
+
+
+# Read replicas, e.g. DATABASE_REPLICA_URLS=postgres://...,postgres://...
+# Safe-method requests read from them through esports.routers.ReplicaRouter.
+DATABASE_REPLICAS = []
+for index, url in enumerate(env.list('DATABASE_REPLICA_URLS', default=[])):
+    alias = f'replica_{index}'
+    DATABASES[alias] = dj_database_url.parse(
+        url,
+        conn_max_age=DATABASES['default']['CONN_MAX_AGE'],
+        conn_health_checks=DATABASES['default']['CONN_HEALTH_CHECKS'],
+        test_options={'MIRROR': 'default'},
+    )
+    if 'pool' in DATABASES['default'].get('OPTIONS', {}):
+        DATABASES[alias]['OPTIONS'] = {
+            'pool': dict(DATABASES['default']['OPTIONS']['pool'])}
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['esports.routers.ReplicaRouter']
+REPLICA_STICKY_SECONDS = env.int('REPLICA_STICKY_SECONDS', default=5)
+REPLICA_MAX_LAG = env.float('REPLICA_MAX_LAG', default=2.0)
+REPLICA_CHECK_INTERVAL = env.float('REPLICA_CHECK_INTERVAL', default=5.0)
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# CACHE_URL accepts locmemcache://, filecache:///path or redis://host:port/db
+# Response versions and ETags, login throttles, token versions and admin
+# game assignments live in this cache. locmemcache:// is per process, so
+# deployments running several processes must share one (redis://);
+# `manage.py check --deploy` warns otherwise.
+
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://')
+}
+
+PUBLIC_CACHE_ALIAS = 'default'
+PUBLIC_CACHE_TIMEOUT = env.int('PUBLIC_CACHE_TIMEOUT', default=300)
+
+# Token versions are cached so authenticated requests skip the user
+# lookup. A locmemcache:// cache is per process: a revocation reaches
+# the other processes only when their entry expires, so keep this short
+# unless CACHE_URL points at a cache shared by every process.
+TOKEN_VERSION_CACHE_TIMEOUT = env.int(
+    'TOKEN_VERSION_CACHE_TIMEOUT', default=30)
+# Same constraint for the games assigned to each admin.
+ADMIN_GAMES_CACHE_TIMEOUT = env.int('ADMIN_GAMES_CACHE_TIMEOUT', default=30)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -132,6 +208,39 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing
+# https://docs.djangoproject.com/en/5.2/topics/auth/passwords/
+# The selected profile hashes new passwords; the remaining hashers only
+# verify existing hashes, which are upgraded on the next successful login.
+
+PASSWORD_PBKDF2_ITERATIONS = env.int(
+    'PASSWORD_PBKDF2_ITERATIONS', default=1_000_000)
+PASSWORD_ARGON2_TIME_COST = env.int('PASSWORD_ARGON2_TIME_COST', default=2)
+PASSWORD_ARGON2_MEMORY_COST = env.int(
+    'PASSWORD_ARGON2_MEMORY_COST', default=102400)
+PASSWORD_ARGON2_PARALLELISM = env.int(
+    'PASSWORD_ARGON2_PARALLELISM', default=8)
+PASSWORD_SCRYPT_WORK_FACTOR = env.int(
+    'PASSWORD_SCRYPT_WORK_FACTOR', default=2**14)
+PASSWORD_SCRYPT_PARALLELISM = env.int(
+    'PASSWORD_SCRYPT_PARALLELISM', default=1)
+
+PASSWORD_HASHER_PROFILES = {
+    'pbkdf2': 'esports.hashers.TunedPBKDF2PasswordHasher',
+    'argon2': 'esports.hashers.TunedArgon2PasswordHasher',
+    'scrypt': 'esports.hashers.TunedScryptPasswordHasher',
+}
+
+PASSWORD_HASHER_PROFILE = env('PASSWORD_HASHER_PROFILE', default='pbkdf2')
+
+PASSWORD_HASHERS = [PASSWORD_HASHER_PROFILES[PASSWORD_HASHER_PROFILE]] + [
+    hasher for profile, hasher in PASSWORD_HASHER_PROFILES.items()
+    if profile != PASSWORD_HASHER_PROFILE
+] + [
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
@@ -159,15 +268,104 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = BASE_DIR / 'media'
 
+STORAGES = {
+    'default': {
+        'BACKEND': 'esports.storage.HashedFileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
+# Resumable uploads are assembled here before being attached to a model
+UPLOAD_TEMP_DIR = env('UPLOAD_TEMP_DIR', default=str(BASE_DIR / 'uploads'))
+UPLOAD_MAX_SIZE = env.int('UPLOAD_MAX_SIZE', default=4 * 1024 ** 3)
+
+# Hand media bodies to the front server: '', 'x-accel' (nginx) or
+# 'x-sendfile' (Apache/lighttpd)
+MEDIA_OFFLOAD = env('MEDIA_OFFLOAD', default='')
+MEDIA_ACCEL_PREFIX = env('MEDIA_ACCEL_PREFIX', default='/protected-media/')
+
+# Responsive renditions generated for Game.images and Team.logo
+IMAGE_RENDITION_WIDTHS = env.list(
+    'IMAGE_RENDITION_WIDTHS', cast=int, default=[320, 640, 1280])
+IMAGE_RENDITION_FORMATS = env.list(
+    'IMAGE_RENDITION_FORMATS', default=['avif', 'webp', 'jpeg'])
+IMAGE_RENDITION_QUALITY = env.int('IMAGE_RENDITION_QUALITY', default=80)
+IMAGE_RENDITION_WORKERS = env.int('IMAGE_RENDITION_WORKERS', default=2)
+
+METRICS_LATENCY_BUCKETS = env.list(
+    'METRICS_LATENCY_BUCKETS', cast=float,
+    default=[0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5])
+# REMOTE_ADDR values allowed to scrape /metrics; empty disables it.
+# Behind a local reverse proxy every client is 127.0.0.1, so only list
+# loopback when the proxy does not forward /metrics.
+METRICS_ALLOWED_IPS = env.list('METRICS_ALLOWED_IPS', default=[])
+REQUEST_QUERY_BUDGET = env.int('REQUEST_QUERY_BUDGET', default=50)
+
+# 'off', 'log' (a sample of requests) or 'raise' (every request).
+QUERY_DETECTOR_MODE = env('QUERY_DETECTOR_MODE', default='off')
+QUERY_DETECTOR_SAMPLE_RATE = env.float(
+    'QUERY_DETECTOR_SAMPLE_RATE', default=0.01)
+QUERY_DETECTOR_THRESHOLD = env.int('QUERY_DETECTOR_THRESHOLD', default=5)
+QUERY_DETECTOR_SLOW_MS = env.int('QUERY_DETECTOR_SLOW_MS', default=200)
+
+ADMIN_ESTIMATED_COUNT_THRESHOLD = env.int(
+    'ADMIN_ESTIMATED_COUNT_THRESHOLD', default=100000)
+
+# Background tasks are stored in the database and run by
+# `manage.py run_tasks`. TASKS_EAGER runs them inline instead.
+TASKS_EAGER = env.bool('TASKS_EAGER', default=False)
+TASK_MAX_ATTEMPTS = env.int('TASK_MAX_ATTEMPTS', default=5)
+TASK_RETRY_BACKOFF = env.float('TASK_RETRY_BACKOFF', default=2.0)
+TASK_RETRY_MAX_DELAY = env.float('TASK_RETRY_MAX_DELAY', default=600.0)
+TASK_VISIBILITY_TIMEOUT = env.int('TASK_VISIBILITY_TIMEOUT', default=600)
+# e.g. TASK_QUEUE_CONCURRENCY=images=2,standings=1
+TASK_QUEUE_CONCURRENCY = env.dict(
+    'TASK_QUEUE_CONCURRENCY', cast={'value': int}, default={'images': 2})
+
+# Decisions accepted by one bulk registration review request.
+REGISTRATION_REVIEW_MAX_ROWS = env.int(
+    'REGISTRATION_REVIEW_MAX_ROWS', default=5000)
+
+# Matches started less than SCHEDULE_MATCH_DURATION seconds ago are
+# still listed in the public schedule; it is also their calendar length.
+SCHEDULE_MATCH_DURATION = env.int('SCHEDULE_MATCH_DURATION', default=7200)
+SCHEDULE_FEED_SIZE = env.int('SCHEDULE_FEED_SIZE', default=500)
+
+LIVE_BROKER = env('LIVE_BROKER', default='esports.live.LocalBroker')
+LIVE_QUEUE_SIZE = env.int('LIVE_QUEUE_SIZE', default=100)
+LIVE_HEARTBEAT = env.int('LIVE_HEARTBEAT', default=15)
+
 AUTH_USER_MODEL = 'esports.CustomUser'
 
 CORS_ALLOWED_ORIGINS = env('CORS_ALLOWED_ORIGINS').split(',')
+# The frontend echoes X-Primary-Until (see ReplicaMiddleware) because
+# the primary_until cookie is not sent cross-site. Resumable uploads
+# exchange their offsets in Upload-* headers.
+CORS_ALLOW_HEADERS = (*default_headers, 'x-primary-until', 'upload-offset')
+CORS_EXPOSE_HEADERS = ['X-Primary-Until', 'Upload-Offset', 'Upload-Length']
 
 DEFAULT_SUPERADMIN_USERNAME = env('DEFAULT_SUPERADMIN_USERNAME')
 DEFAULT_SUPERADMIN_PASSWORD = env('DEFAULT_SUPERADMIN_PASSWORD')
 
+STANDINGS_POINTS = {
+    'wins': env.int('STANDINGS_POINTS_WIN', default=3),
+    'draws': env.int('STANDINGS_POINTS_DRAW', default=1),
+    'losses': env.int('STANDINGS_POINTS_LOSS', default=0),
+}
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'esports.authentication.RoleJWTAuthentication',
     ),
+    'DEFAULT_PAGINATION_CLASS': 'esports.pagination.IdCursorPagination',
+    'PAGE_SIZE': 20,
+    # Number of trusted proxies in front of the app. With 0, throttles key
+    # on REMOTE_ADDR and ignore the client-supplied X-Forwarded-For.
+    'NUM_PROXIES': env.int('NUM_PROXIES', default=0),
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': env('LOGIN_RATE_PER_IP', default='20/min'),
+        'login_username': env('LOGIN_RATE_PER_USERNAME', default='5/min'),
+    },
 }
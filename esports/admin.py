@@ -1,14 +1,153 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.utils import (
+    get_fields_from_path, get_last_value_from_parameters
+)
+from django.contrib.admin.widgets import AutocompleteSelect
 from django.core.exceptions import ValidationError
 from .models import (
     CustomUser, Game, AdminGame, Team, TeamPlayer, IndividualInscription,
     Tournament, Match, MatchParticipant, Transmission,
-    MediaContent, ContactInfo
+    MediaContent, ContactInfo, RegistrationReview
 )
+from .pagination import EstimatedCountPaginator
+from .permissions import managed_game_ids
+from .reviews import ConcurrentReview, RegistrationReviewer
+from .tasks import rebuild_tournament_standings
+
+
+MATCH_PARTICIPANTS = (
+    'match__participants__team', 'match__participants__user')
+
+
+class AutocompleteFilter(admin.FieldListFilter):
+    """
+    Filters on a foreign key through the admin autocomplete view, so the
+    sidebar only loads the selected row instead of the whole table. The
+    related model admin must define search_fields.
+    """
+    template = 'admin/esports/autocomplete_filter.html'
+
+    def __init__(self, field, request, params, model, model_admin,
+                 field_path):
+        self.lookup_kwarg = f'{field_path}__{field.target_field.name}__exact'
+        self.lookup_val = get_last_value_from_parameters(
+            params, self.lookup_kwarg)
+        super().__init__(field, request, params, model, model_admin,
+                         field_path)
+        self.admin_site = model_admin.admin_site
+
+    def expected_parameters(self):
+        return [self.lookup_kwarg]
+
+    def get_facet_counts(self, pk_attname, filtered_qs):
+        return {}
+
+    def widget(self):
+        remote = self.field.remote_field.model
+        field = forms.ModelChoiceField(
+            queryset=remote._default_manager.all(), required=False,
+            widget=AutocompleteSelect(self.field, self.admin_site))
+        return field.widget.render(
+            self.lookup_kwarg, self.lookup_val,
+            attrs={'id': f'autocomplete-filter-{self.field_path}'})
+
+    def choices(self, changelist):
+        yield {
+            'selected': self.lookup_val is None,
+            'query_string': changelist.get_query_string(
+                remove=[self.lookup_kwarg]),
+            'display': 'All',
+            'hidden': [(name, value)
+                       for name, value in changelist.params.items()
+                       if name != self.lookup_kwarg],
+        }
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Changelist defaults for tables that grow with every registration or
+    match: estimated counts and autocomplete foreign key filters.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    @property
+    def media(self):
+        media = super().media
+        for list_filter in self.list_filter:
+            if isinstance(list_filter, tuple) and \
+                    list_filter[1] is AutocompleteFilter:
+                field = get_fields_from_path(self.model, list_filter[0])[-1]
+                media += AutocompleteSelect(field, self.admin_site).media
+                return media + forms.Media(
+                    js=['esports/autocomplete_filter.js'])
+        return media
+
+
+class GameScopedAdmin:
+    """
+    Limits admins to the rows of the games assigned to them, and the
+    game choices of their forms to those games. `game_path` is the
+    lookup from the model to its game.
+    """
+    game_path = 'game'
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        game_ids = managed_game_ids(request.user)
+        if game_ids is None:
+            return queryset
+        return queryset.filter(**{f'{self.game_path}__in': game_ids})
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        game_ids = managed_game_ids(request.user)
+        if db_field.related_model is Game and game_ids is not None:
+            kwargs['queryset'] = Game.objects.filter(pk__in=game_ids)
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+
+class RegistrationReviewActions:
+    """
+    Confirm and reject actions that review every selected registration
+    with RegistrationReviewer instead of one save per row.
+    """
+    review_kind = None
+    actions = ['confirm_registrations', 'reject_registrations']
+
+    def review(self, request, queryset, status):
+        decisions = [(self.review_kind, pk, status)
+                     for pk in queryset.values_list('pk', flat=True)]
+        try:
+            report = RegistrationReviewer(
+                request.user.pk, managed_game_ids(request.user)
+            ).run(decisions)
+        except ConcurrentReview as exc:
+            self.message_user(request, str(exc), messages.ERROR)
+            return
+
+        counts = report.counts
+        self.message_user(
+            request,
+            f"{counts['updated']} updated, {counts['unchanged']} unchanged, "
+            f"{counts['errors']} rejected by validation.",
+            messages.WARNING if counts['errors'] else messages.SUCCESS)
+        errors = [row for row in report.results if row['result'] == 'error']
+        for row in errors[:10]:
+            self.message_user(
+                request, f"#{row['id']}: {row['error']}", messages.ERROR)
+
+    @admin.action(description="Confirm selected registrations")
+    def confirm_registrations(self, request, queryset):
+        self.review(request, queryset, 'confirmed')
+
+    @admin.action(description="Reject selected registrations")
+    def reject_registrations(self, request, queryset):
+        self.review(request, queryset, 'rejected')
 
 
 @admin.register(CustomUser)
-class CustomUserAdmin(admin.ModelAdmin):
+class CustomUserAdmin(LargeTableAdmin):
     list_display = ('username', 'nickname', 'role', 'email')
     search_fields = ('username', 'nickname', 'email')
     list_filter = ['role']
@@ -27,7 +166,8 @@ class TournamentInline(admin.TabularInline):
 
 
 @admin.register(Game)
-class GameAdmin(admin.ModelAdmin):
+class GameAdmin(GameScopedAdmin, admin.ModelAdmin):
+    game_path = 'pk'
     list_display = ('name', 'type_of_game', 'active')
     list_filter = ('type_of_game', 'active')
     search_fields = ('name',)
@@ -56,53 +196,116 @@ class GameAdmin(admin.ModelAdmin):
 
 
 @admin.register(AdminGame)
-class AdminGameAdmin(admin.ModelAdmin):
+class AdminGameAdmin(GameScopedAdmin, LargeTableAdmin):
     list_display = ('admin', 'game')
-    list_filter = ('admin', 'game')
+    list_select_related = ('admin', 'game')
+    list_filter = (
+        ('admin', AutocompleteFilter), ('game', AutocompleteFilter))
     search_fields = ('admin__username', 'game__name')
     autocomplete_fields = ['admin', 'game']
 
 
 @admin.register(Team)
-class TeamAdmin(admin.ModelAdmin):
+class TeamAdmin(GameScopedAdmin, RegistrationReviewActions,
+                LargeTableAdmin):
+    review_kind = 'team'
     list_display = (
         'name', 'captain', 'game', 'registration_status', 'created_at'
         )
-    list_filter = ('registration_status', 'game')
+    list_select_related = ('captain', 'game')
+    list_filter = ('registration_status', ('game', AutocompleteFilter))
     search_fields = ('name',)
 
 
 @admin.register(TeamPlayer)
-class TeamPlayerAdmin(admin.ModelAdmin):
+class TeamPlayerAdmin(GameScopedAdmin, LargeTableAdmin):
+    game_path = 'team__game'
     list_display = ('user', 'team')
+    list_select_related = ('user', 'team')
+    list_filter = (('team', AutocompleteFilter),)
 
 
 @admin.register(IndividualInscription)
-class IndividualInscriptionAdmin(admin.ModelAdmin):
+class IndividualInscriptionAdmin(GameScopedAdmin, RegistrationReviewActions,
+                                 LargeTableAdmin):
+    review_kind = 'inscription'
     list_display = ('user', 'game', 'registration_status', 'created_at')
-    list_filter = ('registration_status', 'game')
+    list_select_related = ('user', 'game')
+    list_filter = ('registration_status', ('game', AutocompleteFilter))
 
 
 @admin.register(Tournament)
-class TournamentAdmin(admin.ModelAdmin):
+class TournamentAdmin(GameScopedAdmin, LargeTableAdmin):
     list_display = ('name', 'game', 'start_date', 'status')
-    list_filter = ('status', 'game')
+    list_select_related = ('game',)
+    list_filter = ('status', ('game', AutocompleteFilter))
+    search_fields = ('name',)
+    actions = ['rebuild_standings']
+
+    @admin.action(description="Rebuild standings of selected tournaments")
+    def rebuild_standings(self, request, queryset):
+        ids = list(queryset.values_list('pk', flat=True))
+        for pk in ids:
+            rebuild_tournament_standings.enqueue(
+                args=[pk], key=f'standings:{pk}')
+        self.message_user(
+            request, f"Queued a standings rebuild for {len(ids)} "
+            "tournaments.", messages.SUCCESS)
 
 
 @admin.register(Match)
-class MatchAdmin(admin.ModelAdmin):
+class MatchAdmin(GameScopedAdmin, LargeTableAdmin):
+    game_path = 'tournament__game'
     list_display = ('tournament', 'round', 'date', 'status')
-    list_filter = ('status', 'tournament')
+    list_select_related = ('tournament',)
+    list_filter = ('status', ('tournament', AutocompleteFilter))
+    search_fields = ('round', 'tournament__name')
+
+    def get_queryset(self, request):
+        # Match.__str__ lists the participants in every row label.
+        return super().get_queryset(request).prefetch_related(
+            'participants__team', 'participants__user')
 
 
 @admin.register(MatchParticipant)
-class MatchParticipantAdmin(admin.ModelAdmin):
+class MatchParticipantAdmin(GameScopedAdmin, LargeTableAdmin):
+    game_path = 'match__tournament__game'
     list_display = ('match', 'team', 'user')
+    list_select_related = ('match', 'team', 'user')
+    list_filter = (('match__tournament', AutocompleteFilter),)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related(
+            *MATCH_PARTICIPANTS)
 
 
 @admin.register(Transmission)
-class TransmissionAdmin(admin.ModelAdmin):
+class TransmissionAdmin(GameScopedAdmin, LargeTableAdmin):
+    game_path = 'match__tournament__game'
     list_display = ('match', 'platform', 'url')
+    list_select_related = ('match',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related(
+            *MATCH_PARTICIPANTS)
+
+
+@admin.register(RegistrationReview)
+class RegistrationReviewAdmin(LargeTableAdmin):
+    list_display = ('kind', 'registration_id', 'previous_status', 'status',
+                    'reviewer', 'created_at')
+    list_select_related = ('reviewer',)
+    list_filter = ('kind', 'status', ('reviewer', AutocompleteFilter))
+    search_fields = ('=registration_id', '=batch')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
 
 
 @admin.register(MediaContent)
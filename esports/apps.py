@@ -6,4 +6,5 @@ class EsportsConfig(AppConfig):
     name = 'esports'
 
     def ready(self):
+        import esports.checks
         import esports.signals
@@ -0,0 +1,114 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import AdminGame
+from .routers import primary_reads
+
+
+ROLE_CLAIM = 'role'
+TOKEN_VERSION_CLAIM = 'token_version'
+ADMIN_GAMES_VERSION_KEY = 'esports:auth:admin_games:version'
+
+
+def token_version_key(user_id):
+    return f'esports:auth:{user_id}:token_version'
+
+
+def get_token_version(user_id):
+    """
+    Returns the current token version of a user, reading the primary
+    only on a cache miss. Returns None when the user no longer exists.
+    Entries expire after TOKEN_VERSION_CACHE_TIMEOUT so processes that
+    do not share the cache pick up revocations made elsewhere.
+    """
+    key = token_version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        with primary_reads():
+            version = get_user_model().objects.filter(
+                pk=user_id).values_list('token_version', flat=True).first()
+        if version is not None:
+            cache.set(key, version, settings.TOKEN_VERSION_CACHE_TIMEOUT)
+    return version
+
+
+def get_admin_game_ids(user_id):
+    """
+    Returns the ids of the games assigned to admin `user_id`, reading
+    the primary only on a cache miss. Entries are keyed by a version
+    that every AdminGame change bumps, so reassignments between admins
+    invalidate both sides. The bump only reaches processes sharing the
+    cache; the others re-read after ADMIN_GAMES_CACHE_TIMEOUT.
+    """
+    version = cache.get(ADMIN_GAMES_VERSION_KEY)
+    if version is None:
+        cache.add(ADMIN_GAMES_VERSION_KEY, 1, None)
+        version = cache.get(ADMIN_GAMES_VERSION_KEY, 1)
+    key = f'esports:auth:admin_games:{version}:{user_id}'
+    game_ids = cache.get(key)
+    if game_ids is None:
+        with primary_reads():
+            game_ids = frozenset(AdminGame.objects.filter(
+                admin_id=user_id).values_list('game_id', flat=True))
+        cache.set(key, game_ids, settings.ADMIN_GAMES_CACHE_TIMEOUT)
+    return game_ids
+
+
+def bump_admin_games():
+    try:
+        cache.incr(ADMIN_GAMES_VERSION_KEY)
+    except ValueError:
+        cache.add(ADMIN_GAMES_VERSION_KEY, 2, None)
+
+
+def issue_tokens(user):
+    refresh = RefreshToken.for_user(user)
+    refresh[ROLE_CLAIM] = user.role
+    refresh[TOKEN_VERSION_CLAIM] = user.token_version
+    return refresh
+
+
+class RoleTokenUser(TokenUser):
+    """
+    Stateless user built from the access token claims. It carries enough
+    for the role-based permission checks; views that need the full row
+    must load it explicitly.
+    """
+
+    @cached_property
+    def id(self):
+        return int(self.token[api_settings.USER_ID_CLAIM])
+
+    @cached_property
+    def role(self):
+        return self.token[ROLE_CLAIM]
+
+    def is_admin(self):
+        return self.role in ['admin', 'superadmin']
+
+    def is_superadmin(self):
+        return self.role == 'superadmin'
+
+
+class RoleJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        if (ROLE_CLAIM not in validated_token
+                or TOKEN_VERSION_CLAIM not in validated_token):
+            return super().get_user(validated_token)
+
+        user = RoleTokenUser(validated_token)
+        version = get_token_version(user.id)
+        if version is None:
+            raise AuthenticationFailed(
+                "User not found", code='user_not_found')
+        if version != validated_token[TOKEN_VERSION_CLAIM]:
+            raise AuthenticationFailed(
+                "Token has been revoked", code='token_revoked')
+        return user
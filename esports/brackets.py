@@ -0,0 +1,189 @@
+from datetime import timedelta
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .models import IndividualInscription, Match, MatchParticipant, Team
+from .schedule import refresh_later
+
+
+BRACKET_FORMATS = (
+    'single_elimination',
+    'double_elimination',
+    'round_robin',
+    'swiss',
+)
+BYE = 'Bye'
+
+
+def load_entrants(tournament):
+    """
+    Returns the confirmed entrant ids for the tournament's game, in
+    registration order, and the MatchParticipant field they belong to.
+    """
+    game = tournament.game
+    if game.type_of_game == 'team':
+        qs = Team.objects.filter(game=game, registration_status='confirmed')
+        return list(qs.order_by('created_at', 'id').values_list(
+            'id', flat=True)), 'team_id'
+
+    qs = IndividualInscription.objects.filter(
+        game=game, registration_status='confirmed')
+    return list(qs.order_by('created_at', 'id').values_list(
+        'user_id', flat=True)), 'user_id'
+
+
+def seed_positions(size):
+    order = [1]
+    while len(order) < size:
+        total = len(order) * 2 + 1
+        order = [seed for top in order for seed in (top, total - top)]
+    return order
+
+
+def round_label(index, total, prefix=''):
+    if index == total:
+        label = 'Final'
+    elif index == total - 1:
+        label = 'Semifinals'
+    elif index == total - 2:
+        label = 'Quarterfinals'
+    else:
+        label = f'Round {index}'
+    return f'{prefix}{label}'
+
+
+def elimination_rounds(entrants, prefix=''):
+    """
+    Builds a seeded elimination bracket as `(day, label, pairings)`
+    rounds. Byes are not played: the top seeds that receive one are
+    placed directly in their second-round match, and later rounds are
+    created without participants.
+    """
+    size = 1 << (len(entrants) - 1).bit_length()
+    total = size.bit_length() - 1
+    seeds = [entrants[seed - 1] if seed <= len(entrants) else None
+             for seed in seed_positions(size)]
+    first = [tuple(entrant for entrant in seeds[i:i + 2] if entrant)
+             for i in range(0, size, 2)]
+
+    if total == 1:
+        return [(0, round_label(1, total, prefix), first)]
+
+    second = [
+        tuple(pair[0] for pair in first[i:i + 2] if len(pair) == 1)
+        for i in range(0, len(first), 2)
+    ]
+    rounds = [
+        (0, round_label(1, total, prefix),
+         [pair for pair in first if len(pair) == 2]),
+        (1, round_label(2, total, prefix), second),
+    ]
+    for index in range(3, total + 1):
+        rounds.append((index - 1, round_label(index, total, prefix),
+                       [()] * (size >> index)))
+    return rounds
+
+
+def single_elimination(entrants):
+    return elimination_rounds(entrants)
+
+
+def double_elimination(entrants):
+    """
+    Losers round n is played on day n, once the winners round feeding
+    it is over, so losers rounds interleave with the winners bracket.
+    """
+    rounds = elimination_rounds(entrants, prefix='Winners ')
+    size = 1 << (len(entrants) - 1).bit_length()
+    total = size.bit_length() - 1
+    losers = 2 * (total - 1)
+    for index in range(1, losers + 1):
+        matches = size >> (2 + (index - 1) // 2)
+        rounds.append((index, f'Losers Round {index}', [()] * matches))
+    rounds.append((max(losers, total - 1) + 1, 'Grand Final', [()]))
+    return rounds
+
+
+def round_robin(entrants):
+    players = list(entrants)
+    if len(players) % 2:
+        players.append(None)
+    count = len(players)
+
+    rounds = []
+    for index in range(1, count):
+        pairs = [(players[i], players[count - 1 - i])
+                 for i in range(count // 2)]
+        rounds.append((index - 1, f'Round {index}', [
+            pair for pair in pairs if None not in pair]))
+        players = [players[0], players[-1]] + players[1:-1]
+    return rounds
+
+
+def swiss(entrants):
+    """
+    Pairs the first Swiss round, top half against bottom half, and gives
+    the last entrant of an odd field a bye. Later rounds depend on
+    results and are paired once those are known.
+    """
+    half = len(entrants) // 2
+    pairs = [(entrants[i], entrants[i + half]) for i in range(half)]
+    if len(entrants) % 2:
+        pairs.append((entrants[-1], None))
+    return [(0, 'Round 1', pairs)]
+
+
+GENERATORS = {
+    'single_elimination': single_elimination,
+    'double_elimination': double_elimination,
+    'round_robin': round_robin,
+    'swiss': swiss,
+}
+
+
+def generate_bracket(tournament, bracket_format,
+                     round_interval=timedelta(days=1), replace=False):
+    """
+    Generates every Match and MatchParticipant of `tournament` for the
+    given format and writes them with two bulk inserts in one
+    transaction. A round played on day n is scheduled n intervals after
+    the tournament start date. A None in a pairing is a bye: its match
+    is recorded with the other entrant only.
+    """
+    if bracket_format not in GENERATORS:
+        raise ValidationError(f"Unknown bracket format '{bracket_format}'.")
+
+    entrants, participant_field = load_entrants(tournament)
+    if len(entrants) < 2:
+        raise ValidationError(
+            "A bracket needs at least two confirmed entrants.")
+
+    rounds = GENERATORS[bracket_format](entrants)
+
+    matches = []
+    slots = []
+    for day, label, pairings in rounds:
+        date = tournament.start_date + day * round_interval
+        for pairing in pairings:
+            matches.append(Match(
+                tournament=tournament, date=date, round=label,
+                results=BYE if None in pairing else ''))
+            slots.append(pairing)
+
+    with transaction.atomic():
+        existing = Match.objects.filter(tournament=tournament)
+        if replace:
+            existing.delete()
+        elif existing.exists():
+            raise ValidationError("This tournament already has matches.")
+
+        Match.objects.bulk_create(matches)
+        MatchParticipant.objects.bulk_create(
+            MatchParticipant(match=match, **{participant_field: entrant})
+            for match, pairing in zip(matches, slots)
+            for entrant in pairing if entrant is not None
+        )
+        # Bulk inserts send no signals.
+        refresh_later(tournament=tournament.pk)
+    return matches
@@ -0,0 +1,149 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponseNotModified, JsonResponse
+from rest_framework import status
+from rest_framework.response import Response
+
+from .routers import primary_reads
+
+
+CATALOG_VERSION_KEY = 'esports:games:version'
+STATS_KEYS = ('hits', 'misses', 'not_modified')
+
+
+def get_cache():
+    return caches[settings.PUBLIC_CACHE_ALIAS]
+
+
+def game_version_key(game_id):
+    return f'esports:games:{game_id}:version'
+
+
+def get_versions(keys):
+    cache = get_cache()
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, 1, None)
+            versions[key] = cache.get(key, 1)
+    return [versions[key] for key in keys]
+
+
+async def aget_versions(keys):
+    cache = get_cache()
+    versions = await cache.aget_many(keys)
+    for key in keys:
+        if key not in versions:
+            await cache.aadd(key, 1, None)
+            versions[key] = await cache.aget(key, 1)
+    return [versions[key] for key in keys]
+
+
+def bump_versions(keys):
+    cache = get_cache()
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, 2, None)
+
+
+def bump_game(game_id):
+    bump_versions([CATALOG_VERSION_KEY, game_version_key(game_id)])
+
+
+def record(event):
+    cache = get_cache()
+    key = f'esports:games:stats:{event}'
+    if not cache.add(key, 1, None):
+        cache.incr(key)
+
+
+async def arecord(event):
+    cache = get_cache()
+    key = f'esports:games:stats:{event}'
+    if not await cache.aadd(key, 1, None):
+        await cache.aincr(key)
+
+
+def get_stats():
+    cache = get_cache()
+    keys = {f'esports:games:stats:{event}': event for event in STATS_KEYS}
+    values = cache.get_many(keys)
+    stats = {event: values.get(key, 0) for key, event in keys.items()}
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = stats['hits'] / lookups if lookups else 0.0
+    return stats
+
+
+def response_digest(request, versions):
+    url = request.build_absolute_uri()
+    raw_key = ':'.join([url] + [str(version) for version in versions])
+    return hashlib.md5(raw_key.encode()).hexdigest()
+
+
+def etag_matches(request, etag):
+    if_none_match = request.headers.get('If-None-Match', '')
+    return etag in [tag.strip() for tag in if_none_match.split(',')]
+
+
+def cached_response(request, version_keys, build):
+    """
+    Serves `build()` through the public cache. The cache key and ETag are
+    derived from the current versions of `version_keys` and the full URL,
+    so a bumped version makes every older entry unreachable. `build()`
+    reads from the primary so no entry predates its version.
+    """
+    digest = response_digest(request, get_versions(version_keys))
+    etag = f'"{digest}"'
+
+    if etag_matches(request, etag):
+        record('not_modified')
+        return Response(status=status.HTTP_304_NOT_MODIFIED,
+                        headers={'ETag': etag})
+
+    cache = get_cache()
+    key = f'esports:games:response:{digest}'
+    data = cache.get(key)
+    if data is None:
+        record('misses')
+        with primary_reads():
+            response = build()
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(key, response.data, settings.PUBLIC_CACHE_TIMEOUT)
+    else:
+        record('hits')
+        response = Response(data, status=status.HTTP_200_OK)
+
+    response['ETag'] = etag
+    return response
+
+
+async def acached_response(request, version_keys, build):
+    """
+    Async counterpart of `cached_response` for plain Django views.
+    `build` is a coroutine function returning `(data, status)`.
+    """
+    digest = response_digest(request, await aget_versions(version_keys))
+    etag = f'"{digest}"'
+
+    if etag_matches(request, etag):
+        await arecord('not_modified')
+        return HttpResponseNotModified(headers={'ETag': etag})
+
+    cache = get_cache()
+    key = f'esports:games:response:{digest}'
+    data = await cache.aget(key)
+    response_status = status.HTTP_200_OK
+    if data is None:
+        await arecord('misses')
+        with primary_reads():
+            data, response_status = await build()
+        if response_status == status.HTTP_200_OK:
+            await cache.aset(key, data, settings.PUBLIC_CACHE_TIMEOUT)
+    else:
+        await arecord('hits')
+
+    return JsonResponse(data, status=response_status, headers={'ETag': etag})
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+
+LOCAL_CACHE = 'django.core.cache.backends.locmem.LocMemCache'
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Response cache versions, ETags and login throttles are only
+    consistent between processes when their cache is shared.
+    """
+    aliases = sorted({'default', settings.PUBLIC_CACHE_ALIAS})
+    return [
+        Warning(
+            f"The '{alias}' cache is local to each process.",
+            hint=(
+                "Set CACHE_URL to a cache shared by every process (e.g. "
+                "redis://) when running more than one. Otherwise version "
+                "bumps, ETags and login throttles only apply to the "
+                "process that handled the request."),
+            id='esports.W001')
+        for alias in aliases
+        if settings.CACHES[alias]['BACKEND'] == LOCAL_CACHE
+    ]
@@ -0,0 +1,99 @@
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections
+from PIL import Image, ImageOps, features
+
+
+PIL_FORMATS = {
+    'avif': 'AVIF',
+    'webp': 'WEBP',
+    'jpeg': 'JPEG',
+}
+
+
+def rendition_formats():
+    return [fmt for fmt in settings.IMAGE_RENDITION_FORMATS
+            if fmt == 'jpeg' or features.check(fmt)]
+
+
+def rendition_name(source, width, fmt):
+    stem, _ = os.path.splitext(source)
+    return f'renditions/{stem}/{width}w.{fmt}'
+
+
+def render(source, storage=default_storage):
+    """
+    Encodes `source` at every configured width narrower than the
+    original (or at its own width when it is already smaller) and in
+    every supported format. Returns `{'source': name, fmt: {width:
+    name}}` and the number of bytes written.
+    """
+    with storage.open(source, 'rb') as stream:
+        image = ImageOps.exif_transpose(Image.open(stream))
+        image.load()
+
+    widths = [w for w in settings.IMAGE_RENDITION_WIDTHS if w < image.width]
+    widths = widths or [image.width]
+
+    renditions = {'source': source}
+    written = 0
+    for width in widths:
+        height = max(1, round(image.height * width / image.width))
+        resized = image.resize((width, height), Image.LANCZOS)
+        for fmt in rendition_formats():
+            frame = resized
+            if fmt == 'jpeg' and frame.mode not in ('RGB', 'L'):
+                frame = frame.convert('RGB')
+            buffer = BytesIO()
+            frame.save(buffer, PIL_FORMATS[fmt],
+                       quality=settings.IMAGE_RENDITION_QUALITY)
+
+            name = storage.save(rendition_name(source, width, fmt),
+                                ContentFile(buffer.getvalue()))
+            renditions.setdefault(fmt, {})[str(width)] = name
+            written += buffer.tell()
+    return renditions, written
+
+
+def generate_renditions(model, pk, image_field, renditions_field):
+    """
+    Renders the image of one row and stores the rendition map, unless
+    the image was replaced in the meantime. Returns the rendition map.
+    """
+    source = model.objects.filter(pk=pk).values_list(
+        image_field, flat=True).first()
+    if not source:
+        return None
+    renditions, _ = render(source)
+    model.objects.filter(pk=pk, **{image_field: source}).update(
+        **{renditions_field: renditions})
+    return renditions
+
+
+def in_worker(func, *args):
+    """
+    Runs `func` on a pool thread, which owns its database connection
+    and must release it when the job ends.
+    """
+    try:
+        return func(*args)
+    finally:
+        close_old_connections()
+
+
+def srcset(renditions, storage=default_storage):
+    """
+    Turns a stored rendition map into `{fmt: 'url 320w, url 640w'}`.
+    """
+    return {
+        fmt: ', '.join(
+            f'{storage.url(name)} {width}w'
+            for width, name in sorted(names.items(), key=lambda i: int(i[0]))
+        )
+        for fmt, names in (renditions or {}).items()
+        if fmt != 'source'
+    }
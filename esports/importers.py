@@ -0,0 +1,314 @@
+import csv
+import json
+from itertools import islice
+
+from django.db import DatabaseError, transaction
+
+from .models import CustomUser, Game, IndividualInscription, Team, TeamPlayer
+from .search import index
+
+
+IMPORT_FORMATS = {
+    '.csv': 'csv',
+    '.jsonl': 'jsonl',
+}
+
+
+class RowError(Exception):
+    pass
+
+
+def import_format(filename):
+    for extension, fmt in IMPORT_FORMATS.items():
+        if filename.lower().endswith(extension):
+            return fmt
+    return None
+
+
+class DecodedLines:
+    """
+    Iterates a binary stream as lines of UTF-8 text, dropping the byte
+    order mark spreadsheet exports start with. A line that is not valid
+    UTF-8 raises RowError and iteration resumes with the next line.
+    """
+
+    def __init__(self, stream):
+        self.lines = iter(stream)
+        self.line = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        raw = next(self.lines)
+        self.line += 1
+        try:
+            return raw.decode('utf-8-sig' if self.line == 1 else 'utf-8')
+        except UnicodeDecodeError:
+            raise RowError("Line is not valid UTF-8.")
+
+
+def read_rows(stream, fmt):
+    """
+    Yields `(line, row, error)` tuples from a CSV or JSONL binary stream
+    without reading the whole stream into memory.
+    """
+    lines = DecodedLines(stream)
+    if fmt == 'csv':
+        yield from read_csv(lines)
+        return
+
+    while True:
+        try:
+            text = next(lines).strip()
+        except StopIteration:
+            return
+        except RowError as exc:
+            yield lines.line, None, str(exc)
+            continue
+        if text:
+            yield (lines.line, *parse_json(text))
+
+
+def read_csv(lines):
+    reader = csv.DictReader(lines)
+    try:
+        reader.fieldnames
+    except RowError as exc:
+        yield lines.line, None, str(exc)
+        return
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except RowError as exc:
+            yield lines.line, None, str(exc)
+            continue
+        yield lines.line, row, None
+
+
+def parse_json(text):
+    try:
+        row = json.loads(text)
+    except ValueError as exc:
+        return None, f"Invalid JSON: {exc}"
+    if not isinstance(row, dict):
+        return None, "Each line must be a JSON object."
+    return row, None
+
+
+class ImportReport:
+    def __init__(self):
+        self.created = {
+            'teams': 0,
+            'team_players': 0,
+            'individual_inscriptions': 0,
+        }
+        self.errors = []
+
+    def add_error(self, line, message):
+        self.errors.append({'line': line, 'error': message})
+
+    def as_dict(self):
+        return {'created': self.created, 'errors': self.errors}
+
+
+class RegistrationImporter:
+    """
+    Imports team and individual registrations in chunks. The
+    one-confirmed-registration-per-captain/user-per-game constraints of
+    Team and IndividualInscription are checked against sets loaded once
+    per import, and every chunk is written with bulk_create in its own
+    transaction. Invalid rows are reported and skipped. `game_ids`
+    limits the import to registrations for those games.
+    """
+    chunk_size = 1000
+
+    def __init__(self, chunk_size=None, game_ids=None):
+        if chunk_size:
+            self.chunk_size = chunk_size
+        self.game_ids = game_ids
+        self.report = ImportReport()
+
+    def run(self, rows):
+        self.games = {game.name: game for game in Game.objects.only(
+            'id', 'name', 'type_of_game')}
+        self.confirmed_captains = {}
+        for game_id, captain_id in Team.objects.filter(
+                registration_status='confirmed').values_list(
+                'game_id', 'captain_id'):
+            self.confirmed_captains.setdefault(game_id, set()).add(captain_id)
+        self.confirmed_users = {}
+        for game_id, user_id in IndividualInscription.objects.filter(
+                registration_status='confirmed').values_list(
+                'game_id', 'user_id'):
+            self.confirmed_users.setdefault(game_id, set()).add(user_id)
+
+        rows = iter(rows)
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                break
+            self.import_chunk(chunk)
+        return self.report
+
+    def import_chunk(self, chunk):
+        self.load_users(chunk)
+        # Confirmed (owners, owner id) pairs claimed by this chunk.
+        self.claimed = []
+
+        teams = []
+        inscriptions = []
+        lines = []
+        for line, row, error in chunk:
+            try:
+                kind, built = self.build(row, error)
+            except RowError as exc:
+                self.report.add_error(line, str(exc))
+                continue
+            (teams if kind == 'team' else inscriptions).append(built)
+            lines.append(line)
+
+        try:
+            with transaction.atomic():
+                self.write(teams, inscriptions)
+        except DatabaseError as exc:
+            # Nothing was written; later chunks may claim these again.
+            for owners, owner_id in self.claimed:
+                owners.discard(owner_id)
+            for line in lines:
+                self.report.add_error(line, f"Database error: {exc}")
+
+    def load_users(self, chunk):
+        usernames = set()
+        for _, row, _ in chunk:
+            if row:
+                usernames.update(self.usernames(row))
+        self.users = dict(CustomUser.objects.filter(
+            username__in=usernames).values_list('username', 'id'))
+
+    def build(self, row, error):
+        if error:
+            raise RowError(error)
+        kind = field(row, 'kind')
+        if kind == 'team':
+            return kind, self.build_team(row)
+        if kind == 'individual':
+            return kind, self.build_inscription(row)
+        raise RowError("kind must be either 'team' or 'individual'.")
+
+    def write(self, teams, inscriptions):
+        Team.objects.bulk_create(team for team, _ in teams)
+        players = TeamPlayer.objects.bulk_create(
+            TeamPlayer(team=team, user_id=user_id)
+            for team, player_ids in teams for user_id in player_ids
+        )
+        IndividualInscription.objects.bulk_create(inscriptions)
+        # Bulk inserts send no signals; confirmed teams are searchable.
+        confirmed = [team for team, _ in teams
+                     if team.registration_status == 'confirmed']
+        if confirmed:
+            transaction.on_commit(lambda: index(confirmed))
+
+        self.report.created['teams'] += len(teams)
+        self.report.created['team_players'] += len(players)
+        self.report.created['individual_inscriptions'] += len(inscriptions)
+
+    def usernames(self, row):
+        names = [row.get('captain'), row.get('user')]
+        names += split_players(row.get('players'))
+        return [name for name in names if isinstance(name, str) and name]
+
+    def user_id(self, username):
+        try:
+            return self.users[username]
+        except KeyError:
+            raise RowError(f"User '{username}' does not exist.")
+
+    def game(self, row, type_of_game):
+        name = field(row, 'game')
+        game = self.games.get(name)
+        if game is None:
+            raise RowError(f"Game '{name}' does not exist.")
+        if self.game_ids is not None and game.id not in self.game_ids:
+            raise RowError(f"You do not manage game '{name}'.")
+        if game.type_of_game != type_of_game:
+            raise RowError(f"Game '{name}' is not a {type_of_game} game.")
+        return game
+
+    def build_team(self, row):
+        game = self.game(row, 'team')
+        captain_id = self.user_id(field(row, 'captain'))
+        status = registration_status(row)
+        player_ids = [self.user_id(name)
+                      for name in split_players(row.get('players'))]
+        team = Team(
+            name=model_field(row, Team, 'name'),
+            logo=model_field(row, Team, 'logo'),
+            captain_id=captain_id,
+            game=game,
+            voucher=model_field(row, Team, 'voucher'),
+            registration_status=status,
+        )
+
+        if status == 'confirmed':
+            self.claim(self.confirmed_captains, game.id, captain_id,
+                       "This captain is already registered for this game.")
+        return team, player_ids
+
+    def build_inscription(self, row):
+        game = self.game(row, 'individual')
+        user_id = self.user_id(field(row, 'user'))
+        inscription = IndividualInscription(
+            user_id=user_id,
+            game=game,
+            voucher=model_field(row, IndividualInscription, 'voucher'),
+            registration_status=registration_status(row),
+        )
+
+        if inscription.registration_status == 'confirmed':
+            self.claim(self.confirmed_users, game.id, user_id,
+                       "User is already registered for this game.")
+        return inscription
+
+    def claim(self, confirmed, game_id, owner_id, message):
+        owners = confirmed.setdefault(game_id, set())
+        if owner_id in owners:
+            raise RowError(message)
+        owners.add(owner_id)
+        self.claimed.append((owners, owner_id))
+
+
+def field(row, name):
+    value = row.get(name)
+    if not isinstance(value, str) or not value.strip():
+        raise RowError(f"'{name}' is required.")
+    return value.strip()
+
+
+def model_field(row, model, name):
+    """
+    A required field bounded by the max_length of `model.name`, so an
+    over-long value fails its row instead of the whole chunk.
+    """
+    value = field(row, name)
+    max_length = model._meta.get_field(name).max_length
+    if max_length and len(value) > max_length:
+        raise RowError(f"'{name}' must be at most {max_length} characters.")
+    return value
+
+
+def registration_status(row):
+    status = str(row.get('registration_status') or 'pending').strip()
+    if status not in dict(Team.STATUS_CHOICES):
+        raise RowError(f"Invalid registration_status '{status}'.")
+    return status
+
+
+def split_players(value):
+    if isinstance(value, list):
+        return [name for name in value if isinstance(name, str) and name]
+    if not isinstance(value, str):
+        return []
+    return [name.strip() for name in value.split(';') if name.strip()]
@@ -0,0 +1,208 @@
+import asyncio
+import json
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils.module_loading import import_string
+
+from .models import Match, MatchParticipant
+
+
+def tournament_channel(tournament_id):
+    return f'tournament:{tournament_id}'
+
+
+def match_channel(match_id):
+    return f'match:{match_id}'
+
+
+def encode(event, payload):
+    """
+    Formats one server-sent event. Each event is encoded once and the
+    same bytes are queued for every subscriber.
+    """
+    data = json.dumps(payload, cls=DjangoJSONEncoder, separators=(',', ':'))
+    return f'event: {event}\ndata: {data}\n\n'.encode()
+
+
+class Subscription:
+    """
+    A bounded queue of encoded events owned by one event loop. A
+    subscriber that falls `maxsize` events behind is disconnected
+    instead of buffering without limit.
+    """
+
+    def __init__(self, channels, maxsize):
+        self.channels = tuple(channels)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+        self.closed = False
+
+    def put(self, message):
+        if self.closed:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.close()
+
+    def close(self):
+        self.closed = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+
+def deliver(subscriptions, message):
+    for subscription in subscriptions:
+        subscription.put(message)
+
+
+class Hub:
+    """
+    In-process fan-out of events to the subscriptions of each channel.
+    `dispatch` may be called from any thread; it wakes every event loop
+    with subscribers once per event, not once per subscriber.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.channels = defaultdict(set)
+
+    def subscribe(self, channels, maxsize=None):
+        subscription = Subscription(
+            channels, maxsize or settings.LIVE_QUEUE_SIZE)
+        with self.lock:
+            for channel in subscription.channels:
+                self.channels[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            for channel in subscription.channels:
+                subscribers = self.channels.get(channel)
+                if subscribers is None:
+                    continue
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self.channels[channel]
+
+    def dispatch(self, channel, message):
+        by_loop = defaultdict(list)
+        with self.lock:
+            for subscription in self.channels.get(channel, ()):
+                by_loop[subscription.loop].append(subscription)
+
+        for loop, subscriptions in by_loop.items():
+            try:
+                loop.call_soon_threadsafe(deliver, subscriptions, message)
+            except RuntimeError:
+                for subscription in subscriptions:
+                    self.unsubscribe(subscription)
+
+
+hub = Hub()
+
+
+class LocalBroker:
+    """
+    Delivers events to the subscribers of this process only. A broker
+    for several nodes publishes to a shared bus instead and calls
+    `hub.dispatch` from its listener for every message it receives.
+    """
+
+    def __init__(self, hub):
+        self.hub = hub
+
+    def publish(self, channel, message):
+        self.hub.dispatch(channel, message)
+
+
+_broker = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        _broker = import_string(settings.LIVE_BROKER)(hub)
+    return _broker
+
+
+def publish(event, payload, channels):
+    message = encode(event, payload)
+    broker = get_broker()
+    for channel in channels:
+        broker.publish(channel, message)
+
+
+def match_changes(match, created):
+    """
+    Returns the live fields of `match` that differ from the values it
+    was loaded with, or every live field when it was just created.
+    """
+    loaded = {} if created else getattr(match, '_loaded_values', {})
+    return {
+        name: getattr(match, name) for name in match.LIVE_FIELDS
+        if created or loaded.get(name) != getattr(match, name)
+    }
+
+
+def broadcast_match(match, changes):
+    if not changes:
+        return
+    publish('match', {
+        'match': match.pk,
+        'tournament': match.tournament_id,
+        'changes': changes,
+    }, [match_channel(match.pk), tournament_channel(match.tournament_id)])
+
+
+def broadcast_participant(participant):
+    if MatchParticipant.match.is_cached(participant):
+        tournament_id = participant.match.tournament_id
+    else:
+        tournament_id = Match.objects.filter(
+            pk=participant.match_id).values_list(
+            'tournament_id', flat=True).first()
+    publish('score', {
+        'match': participant.match_id,
+        'tournament': tournament_id,
+        'participant': participant.pk,
+        'team': participant.team_id,
+        'user': participant.user_id,
+        'score': participant.score,
+    }, [match_channel(participant.match_id),
+        tournament_channel(tournament_id)])
+
+
+async def event_stream(subscription):
+    try:
+        yield b'retry: 5000\n\n'
+        while True:
+            try:
+                message = await asyncio.wait_for(
+                    subscription.queue.get(), settings.LIVE_HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield b': keep-alive\n\n'
+                continue
+            if message is None:
+                return
+            yield message
+    finally:
+        hub.unsubscribe(subscription)
+
+
+def stream_response(channels):
+    """
+    Server-sent event stream of `channels`. It must be served under
+    ASGI: a WSGI worker would be held for the whole connection.
+    """
+    response = StreamingHttpResponse(
+        event_stream(hub.subscribe(channels)),
+        content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
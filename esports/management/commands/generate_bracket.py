@@ -0,0 +1,41 @@
+from datetime import timedelta
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from esports.brackets import BRACKET_FORMATS, generate_bracket
+from esports.models import Tournament
+
+
+class Command(BaseCommand):
+    help = "Generate the matches of a tournament from its confirmed entrants."
+
+    def add_arguments(self, parser):
+        parser.add_argument('tournament_id', type=int)
+        parser.add_argument(
+            '--format', choices=BRACKET_FORMATS,
+            default='single_elimination')
+        parser.add_argument(
+            '--interval-hours', type=float, default=24,
+            help="Hours between consecutive rounds.")
+        parser.add_argument(
+            '--replace', action='store_true',
+            help="Delete the tournament's existing matches first.")
+
+    def handle(self, *args, **options):
+        try:
+            tournament = Tournament.objects.select_related('game').get(
+                pk=options['tournament_id'])
+        except Tournament.DoesNotExist:
+            raise CommandError("Tournament not found.")
+
+        try:
+            matches = generate_bracket(
+                tournament, options['format'],
+                round_interval=timedelta(hours=options['interval_hours']),
+                replace=options['replace'])
+        except ValidationError as exc:
+            raise CommandError(' '.join(exc.messages))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {len(matches)} matches for {tournament.name}."))
@@ -0,0 +1,83 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from esports.cache import bump_game
+from esports.images import generate_renditions, in_worker
+from esports.models import Game, Team
+
+
+TARGETS = {
+    'game': (Game, 'images', 'image_renditions'),
+    'team': (Team, 'logo', 'logo_renditions'),
+}
+
+
+class Command(BaseCommand):
+    help = "Generate missing image renditions for games and team logos."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model', choices=TARGETS, action='append',
+            help="Limit to one model. Defaults to all of them.")
+        parser.add_argument(
+            '--workers', type=int, default=settings.IMAGE_RENDITION_WORKERS)
+        parser.add_argument(
+            '--force', action='store_true',
+            help="Re-render images that already have renditions.")
+
+    def handle(self, *args, **options):
+        jobs = []
+        for name in options['model'] or TARGETS:
+            model, image_field, renditions_field = TARGETS[name]
+            rows = model.objects.exclude(**{image_field: ''}).values_list(
+                'pk', image_field, renditions_field)
+            for pk, source, renditions in rows.iterator():
+                if options['force'] or (renditions or {}).get(
+                        'source') != source:
+                    jobs.append((model, pk, image_field, renditions_field))
+
+        started = time.perf_counter()
+        results = []
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            futures = [pool.submit(in_worker, generate_renditions, *job)
+                       for job in jobs]
+            for job, future in zip(jobs, futures):
+                try:
+                    renditions = future.result()
+                except Exception as exc:
+                    self.stderr.write(
+                        f"{job[0].__name__} {job[1]}: {exc}")
+                    continue
+                if renditions:
+                    results.append(renditions)
+                    if job[0] is Game:
+                        bump_game(job[1])
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f"Rendered {len(results)} of {len(jobs)} images in "
+            f"{elapsed:.2f}s ({len(results) / max(elapsed, 1e-9):.1f}/s).")
+        self.report_savings(results)
+
+    def report_savings(self, results):
+        source_bytes = sum(
+            default_storage.size(renditions['source'])
+            for renditions in results)
+        largest = {}
+        for renditions in results:
+            for fmt, names in renditions.items():
+                if fmt == 'source':
+                    continue
+                widest = max(names, key=int)
+                largest[fmt] = largest.get(fmt, 0) + default_storage.size(
+                    names[widest])
+
+        for fmt, size in largest.items():
+            saved = source_bytes - size
+            self.stdout.write(
+                f"{fmt}: {size} bytes at the widest rendition, "
+                f"{saved} bytes saved against {source_bytes} source bytes.")
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from esports.importers import RegistrationImporter, import_format, read_rows
+
+
+class Command(BaseCommand):
+    help = "Bulk import team and individual registrations from CSV or JSONL."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument(
+            '--format', choices=['csv', 'jsonl'],
+            help="Input format. Defaults to the file extension.")
+        parser.add_argument(
+            '--chunk-size', type=int,
+            default=RegistrationImporter.chunk_size)
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or import_format(options['path'])
+        if fmt is None:
+            raise CommandError("Cannot infer the format; use --format.")
+
+        importer = RegistrationImporter(chunk_size=options['chunk_size'])
+        with open(options['path'], 'rb') as stream:
+            report = importer.run(read_rows(stream, fmt))
+
+        for error in report.errors:
+            self.stderr.write(f"Line {error['line']}: {error['error']}")
+        created = ', '.join(
+            f"{count} {name}" for name, count in report.created.items())
+        self.stdout.write(self.style.SUCCESS(f"Created {created}."))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from esports.models import Match
+from esports.schedule import refresh
+
+
+class Command(BaseCommand):
+    help = "Recompute the public schedule entries from their matches."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'tournament_ids', nargs='*', type=int,
+            help="Tournaments to rebuild. Defaults to all of them.")
+
+    def handle(self, *args, **options):
+        matches = Match.objects.all()
+        if options['tournament_ids']:
+            matches = matches.filter(
+                tournament_id__in=options['tournament_ids'])
+
+        refresh(matches)
+        self.stdout.write("Rebuilt the schedule.")
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from esports.models import Tournament
+from esports.standings import rebuild_standings
+
+
+class Command(BaseCommand):
+    help = "Recompute tournament standings from their played matches."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'tournament_ids', nargs='*', type=int,
+            help="Tournaments to rebuild. Defaults to all of them.")
+
+    def handle(self, *args, **options):
+        tournaments = Tournament.objects.all()
+        if options['tournament_ids']:
+            tournaments = tournaments.filter(pk__in=options['tournament_ids'])
+
+        for tournament in tournaments.iterator():
+            rebuild_standings(tournament)
+            self.stdout.write(f"Rebuilt standings for {tournament.name}.")
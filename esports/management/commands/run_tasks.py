@@ -0,0 +1,94 @@
+import multiprocessing
+import os
+import signal
+import socket
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+import esports.tasks  # noqa: F401 - registers the task functions
+from esports.taskqueue import work
+
+
+def worker_name(index):
+    return f'{socket.gethostname()}:{os.getpid()}:{index}'
+
+
+def run_worker(index, queues, burst, stop, poll_interval):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    work(worker_name(index), queues, burst, stop, poll_interval)
+
+
+class Command(BaseCommand):
+    help = "Run queued background tasks with a pool of worker processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--queue', action='append', dest='queues',
+            help="Queue to consume. Repeat for several; defaults to all.")
+        parser.add_argument('--processes', type=int, default=1)
+        parser.add_argument(
+            '--burst', action='store_true',
+            help="Exit once no task is due instead of polling.")
+        parser.add_argument('--poll-interval', type=float, default=1.0)
+
+    def handle(self, *args, **options):
+        queues = options['queues']
+        burst = options['burst']
+        poll_interval = options['poll_interval']
+        if options['processes'] <= 1:
+            self.run_inline(queues, burst, poll_interval)
+        else:
+            self.run_pool(
+                options['processes'], queues, burst, poll_interval)
+
+    def run_inline(self, queues, burst, poll_interval):
+        stop = multiprocessing.Event()
+        signal.signal(signal.SIGTERM, lambda *_: stop.set())
+        try:
+            processed = work(
+                worker_name(0), queues, burst, stop, poll_interval)
+        except KeyboardInterrupt:
+            return
+        self.stdout.write(f"Processed {processed} tasks.")
+
+    def run_pool(self, processes, queues, burst, poll_interval):
+        # Children inherit no open connection; each opens its own.
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        stop = context.Event()
+        signal.signal(signal.SIGTERM, lambda *_: stop.set())
+
+        def start(index):
+            process = context.Process(
+                target=run_worker,
+                args=(index, queues, burst, stop, poll_interval),
+                daemon=True)
+            process.start()
+            return process
+
+        workers = {index: start(index) for index in range(processes)}
+        try:
+            while workers:
+                self.supervise(workers, start, stop, poll_interval)
+        except KeyboardInterrupt:
+            stop.set()
+            for process in workers.values():
+                process.join()
+
+    def supervise(self, workers, start, stop, poll_interval):
+        """
+        Waits on every worker once, restarting those that crashed and
+        forgetting those that exited cleanly.
+        """
+        for index, process in list(workers.items()):
+            process.join(poll_interval)
+            if process.is_alive():
+                continue
+            if process.exitcode != 0 and not stop.is_set():
+                self.stderr.write(
+                    f"Worker {index} exited with "
+                    f"{process.exitcode}; restarting.")
+                workers[index] = start(index)
+            else:
+                del workers[index]
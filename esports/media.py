@@ -0,0 +1,164 @@
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.http import (
+    FileResponse, Http404, HttpResponse, HttpResponseNotModified,
+    StreamingHttpResponse
+)
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+from .storage import content_hash
+
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+BLOCK_SIZE = 64 * 1024
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'public, no-cache'
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header, size):
+    """
+    Returns the inclusive `(start, end)` of a single byte range, or None
+    when the header should be ignored and the whole file served.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+
+    start, end = match.groups()
+    if start == '':
+        length = int(end)
+        if length == 0:
+            raise RangeNotSatisfiable
+        return max(0, size - length), size - 1
+
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise RangeNotSatisfiable
+    return start, end
+
+
+def read_range(path, start, length):
+    with open(path, 'rb') as stream:
+        stream.seek(start)
+        while length > 0:
+            chunk = stream.read(min(BLOCK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def offload(path, name):
+    if settings.MEDIA_OFFLOAD == 'x-accel':
+        response = HttpResponse()
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_PREFIX + name
+        return response
+    if settings.MEDIA_OFFLOAD == 'x-sendfile':
+        response = HttpResponse()
+        response['X-Sendfile'] = path
+        return response
+    return None
+
+
+def media_file(path):
+    """
+    The absolute path and stat of the uploaded file `path`; raises
+    Http404 for anything but a regular file under MEDIA_ROOT.
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        stat = os.stat(full_path)
+    except (ValueError, OSError):
+        raise Http404("File not found.")
+    if not os.path.isfile(full_path):
+        raise Http404("File not found.")
+    return full_path, stat
+
+
+def validators(path, stat):
+    """
+    Caching headers of a file: content-hashed names are immutable,
+    other files are revalidated against their size and mtime.
+    """
+    digest = content_hash(path)
+    if digest:
+        etag = f'"{digest}"'
+        cache_control = IMMUTABLE
+    else:
+        etag = f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+        cache_control = REVALIDATE
+    return {
+        'ETag': etag,
+        'Cache-Control': cache_control,
+        'Last-Modified': http_date(stat.st_mtime),
+        'Accept-Ranges': 'bytes',
+    }
+
+
+def body_response(request, full_path, size, etag):
+    """
+    The whole file, or the requested byte range when `If-Range` (if
+    any) still matches `etag`.
+    """
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+
+    byte_range = None
+    if_range = request.headers.get('If-Range')
+    if 'Range' in request.headers and (not if_range or if_range == etag):
+        try:
+            byte_range = parse_range(request.headers['Range'], size)
+        except RangeNotSatisfiable:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    if byte_range is None:
+        response = FileResponse(
+            open(full_path, 'rb'), content_type=content_type)
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            read_range(full_path, start, end - start + 1),
+            status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+
+    if encoding:
+        response['Content-Encoding'] = encoding
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    Serves an uploaded file with strong validators and byte ranges.
+    Files with a content hash in their name are cached as immutable.
+    """
+    full_path, stat = media_file(path)
+    headers = validators(path, stat)
+
+    if_none_match = request.headers.get('If-None-Match', '')
+    if headers['ETag'] in [tag.strip() for tag in if_none_match.split(',')]:
+        response = HttpResponseNotModified()
+    else:
+        response = offload(full_path, path)
+    if response is None:
+        response = body_response(
+            request, full_path, stat.st_size, headers['ETag'])
+        if response.status_code == 416:
+            return response
+
+    for header, value in headers.items():
+        response[header] = value
+    return response
@@ -0,0 +1,238 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+
+logger = logging.getLogger(__name__)
+
+current_sample = ContextVar('esports_request_sample', default=None)
+
+
+class RequestSample:
+    """
+    Measurements of one request, filled in by the query wrapper and the
+    performance middleware while the request is being handled.
+    """
+    __slots__ = ('started', 'queries', 'db_time', 'render_started',
+                 'render_time')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_started = None
+        self.render_time = 0.0
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Execute wrapper installed on every database connection. Outside a
+    request it only costs a context variable lookup.
+    """
+    sample = current_sample.get()
+    if sample is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        sample.db_time += time.perf_counter() - started
+        sample.queries += 1
+
+
+def install_query_wrapper(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class RouteStats:
+    __slots__ = ('buckets', 'count', 'duration', 'queries', 'db_time',
+                 'render_time', 'response_bytes', 'over_budget')
+
+    def __init__(self, size):
+        self.buckets = [0] * size
+        self.count = 0
+        self.duration = 0.0
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self.response_bytes = 0
+        self.over_budget = 0
+
+
+class Registry:
+    """
+    Per-process request metrics keyed by route name. Each process
+    reports its own series; Prometheus sums them across instances.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = tuple(sorted(buckets))
+        self.lock = threading.Lock()
+        self.routes = {}
+        self.connections_opened = {}
+
+    def connection_opened(self, alias):
+        with self.lock:
+            self.connections_opened[alias] = \
+                self.connections_opened.get(alias, 0) + 1
+
+    def observe(self, route, duration, sample, response_bytes):
+        over_budget = sample.queries > settings.REQUEST_QUERY_BUDGET
+        index = bisect_left(self.buckets, duration)
+        with self.lock:
+            stats = self.routes.get(route)
+            if stats is None:
+                stats = self.routes[route] = RouteStats(len(self.buckets))
+            if index < len(self.buckets):
+                stats.buckets[index] += 1
+            stats.count += 1
+            stats.duration += duration
+            stats.queries += sample.queries
+            stats.db_time += sample.db_time
+            stats.render_time += sample.render_time
+            stats.response_bytes += response_bytes
+            stats.over_budget += over_budget
+        return over_budget
+
+    def clear(self):
+        with self.lock:
+            self.routes.clear()
+            self.connections_opened.clear()
+
+    def render(self):
+        with self.lock:
+            routes = {route: (list(stats.buckets), stats.count,
+                              stats.duration, stats.queries, stats.db_time,
+                              stats.render_time, stats.response_bytes,
+                              stats.over_budget)
+                      for route, stats in sorted(self.routes.items())}
+            opened = sorted(self.connections_opened.items())
+
+        lines = [
+            '# HELP esports_request_duration_seconds Request latency.',
+            '# TYPE esports_request_duration_seconds histogram',
+        ]
+        for route, (buckets, count, duration, *_) in routes.items():
+            cumulative = 0
+            for bound, observed in zip(self.buckets, buckets):
+                cumulative += observed
+                lines.append(
+                    f'esports_request_duration_seconds_bucket'
+                    f'{{route="{route}",le="{bound}"}} {cumulative}')
+            lines.append(
+                f'esports_request_duration_seconds_bucket'
+                f'{{route="{route}",le="+Inf"}} {count}')
+            lines.append(
+                f'esports_request_duration_seconds_sum'
+                f'{{route="{route}"}} {duration}')
+            lines.append(
+                f'esports_request_duration_seconds_count'
+                f'{{route="{route}"}} {count}')
+
+        counters = (
+            ('esports_db_queries_total', 3, 'Database queries executed.'),
+            ('esports_db_query_seconds_total', 4,
+             'Time spent executing database queries.'),
+            ('esports_serialize_seconds_total', 5,
+             'Time spent rendering response bodies.'),
+            ('esports_response_bytes_total', 6, 'Response body bytes.'),
+            ('esports_query_budget_exceeded_total', 7,
+             'Requests that exceeded REQUEST_QUERY_BUDGET.'),
+        )
+        for name, position, description in counters:
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} counter')
+            for route, values in routes.items():
+                lines.append(f'{name}{{route="{route}"}} {values[position]}')
+
+        lines += [
+            '# HELP esports_db_connections_opened_total '
+            'Database connections opened.',
+            '# TYPE esports_db_connections_opened_total counter',
+        ]
+        for alias, count in opened:
+            lines.append(
+                f'esports_db_connections_opened_total{{alias="{alias}"}} '
+                f'{count}')
+        lines += pool_metrics()
+        return '\n'.join(lines) + '\n'
+
+
+POOL_METRICS = (
+    ('esports_db_pool_size', 'gauge', 'pool_size',
+     'Connections currently managed by the pool.'),
+    ('esports_db_pool_available', 'gauge', 'pool_available',
+     'Idle connections ready to be handed out.'),
+    ('esports_db_pool_max', 'gauge', 'pool_max',
+     'Maximum size of the pool.'),
+    ('esports_db_pool_requests_waiting', 'gauge', 'requests_waiting',
+     'Requests currently waiting for a connection.'),
+    ('esports_db_pool_requests_total', 'counter', 'requests_num',
+     'Connections requested from the pool.'),
+    ('esports_db_pool_requests_queued_total', 'counter', 'requests_queued',
+     'Requests that had to wait for a connection.'),
+    ('esports_db_pool_requests_wait_ms_total', 'counter', 'requests_wait_ms',
+     'Time spent waiting for a connection.'),
+    ('esports_db_pool_requests_errors_total', 'counter', 'requests_errors',
+     'Requests that timed out waiting for a connection.'),
+)
+
+
+def pool_metrics():
+    """
+    Saturation of the psycopg connection pools configured with DB_POOL.
+    """
+    stats = {
+        alias: connections[alias].pool.get_stats()
+        for alias in connections
+        if connections.settings[alias].get('OPTIONS', {}).get('pool')
+    }
+    if not stats:
+        return []
+    lines = []
+    for name, kind, key, description in POOL_METRICS:
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} {kind}')
+        for alias, values in stats.items():
+            lines.append(f'{name}{{alias="{alias}"}} {values.get(key, 0)}')
+    return lines
+
+
+registry = Registry(settings.METRICS_LATENCY_BUCKETS)
+
+
+def route_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    return match.view_name or match._func_path
+
+
+def finish(request, response, sample):
+    """
+    Records `sample` for the route of `request` and adds the
+    Server-Timing header to `response`.
+    """
+    duration = time.perf_counter() - sample.started
+    if response.streaming:
+        response_bytes = int(response.get('Content-Length') or 0)
+    else:
+        response_bytes = len(response.content)
+
+    route = route_name(request)
+    if registry.observe(route, duration, sample, response_bytes):
+        logger.warning(
+            "%s executed %d queries, over the budget of %d",
+            route, sample.queries, settings.REQUEST_QUERY_BUDGET)
+
+    response['Server-Timing'] = (
+        f'db;dur={sample.db_time * 1000:.2f};desc="{sample.queries} queries", '
+        f'serialize;dur={sample.render_time * 1000:.2f}, '
+        f'total;dur={duration * 1000:.2f}')
+    return response
@@ -0,0 +1,162 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .metrics import RequestSample, current_sample, finish
+from .querydetector import current_detector, request_detector
+from .routers import ReplicaChoice, request_replica
+
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+ADMIN_PATH = '/admin/'
+PRIMARY_COOKIE = 'primary_until'
+
+
+class PerformanceMiddleware:
+    """
+    Measures latency, database queries and response rendering per route
+    for both sync and async views. Place it first in MIDDLEWARE so that
+    it sees the whole request.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        sample = RequestSample()
+        token = current_sample.set(sample)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_sample.reset(token)
+        return finish(request, response, sample)
+
+    async def __acall__(self, request):
+        sample = RequestSample()
+        token = current_sample.set(sample)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_sample.reset(token)
+        return finish(request, response, sample)
+
+    def process_template_response(self, request, response):
+        # Runs last, right before DRF renders the serialized data.
+        sample = current_sample.get()
+        if sample is not None:
+            sample.render_started = time.perf_counter()
+            response.add_post_render_callback(
+                lambda rendered: self.rendered(sample))
+        return response
+
+    @staticmethod
+    def rendered(sample):
+        sample.render_time += time.perf_counter() - sample.render_started
+
+
+class QueryDetectorMiddleware:
+    """
+    Watches requests for repeated (N+1) and slow queries. Every request
+    is checked in 'raise' mode, a sample of them in 'log' mode.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        detector = request_detector()
+        if detector is None:
+            return self.get_response(request)
+        token = current_detector.set(detector)
+        try:
+            return self.get_response(request)
+        finally:
+            current_detector.reset(token)
+            detector.report(request.path)
+
+    async def __acall__(self, request):
+        detector = request_detector()
+        if detector is None:
+            return await self.get_response(request)
+        token = current_detector.set(detector)
+        try:
+            return await self.get_response(request)
+        finally:
+            current_detector.reset(token)
+            detector.report(request.path)
+
+
+class ReplicaMiddleware:
+    """
+    Lets ReplicaRouter serve safe-method requests from replicas. A
+    client that has just written reads from the primary until the
+    `primary_until` cookie or X-Primary-Until header it was given
+    expires, so it always sees its own writes. The admin never uses
+    replicas.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = request_replica.set(self.replica_choice(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            request_replica.reset(token)
+        return self.process_response(request, response)
+
+    async def __acall__(self, request):
+        token = request_replica.set(self.replica_choice(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            request_replica.reset(token)
+        return self.process_response(request, response)
+
+    def replica_choice(self, request):
+        if self.reads_from_replica(request):
+            return ReplicaChoice()
+        return None
+
+    def reads_from_replica(self, request):
+        if not settings.DATABASE_REPLICAS or \
+                request.method not in SAFE_METHODS or \
+                request.path.startswith(ADMIN_PATH):
+            return False
+        primary_until = request.headers.get('X-Primary-Until') or \
+            request.COOKIES.get(PRIMARY_COOKIE)
+        try:
+            return float(primary_until or 0) <= time.time()
+        except ValueError:
+            return True
+
+    def process_response(self, request, response):
+        if request.method in SAFE_METHODS or response.status_code >= 400 \
+                or not settings.DATABASE_REPLICAS:
+            return response
+        window = settings.REPLICA_STICKY_SECONDS
+        primary_until = f'{time.time() + window:.3f}'
+        response['X-Primary-Until'] = primary_until
+        response.set_cookie(PRIMARY_COOKIE, primary_until, max_age=window,
+                            httponly=True, samesite='Lax')
+        return response
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:39
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('esports', '0005_customuser_token_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='matchparticipant',
+            name='score',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='Standing',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('played', models.IntegerField(default=0)),
+                ('wins', models.IntegerField(default=0)),
+                ('draws', models.IntegerField(default=0)),
+                ('losses', models.IntegerField(default=0)),
+                ('points', models.IntegerField(default=0)),
+                ('score_for', models.IntegerField(default=0)),
+                ('score_against', models.IntegerField(default=0)),
+                ('score_difference', models.IntegerField(default=0)),
+                ('team', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='esports.team')),
+                ('tournament', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='standings', to='esports.tournament')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['tournament', '-points', '-score_difference', '-score_for', 'id'], name='standing_rank_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('team__isnull', False)), fields=('tournament', 'team'), name='unique_team_standing'), models.UniqueConstraint(condition=models.Q(('user__isnull', False)), fields=('tournament', 'user'), name='unique_user_standing')],
+            },
+        ),
+    ]
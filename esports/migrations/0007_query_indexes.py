@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('esports', '0006_standings'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['role'], name='customuser_role_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='game',
+            index=models.Index(condition=models.Q(('active', True)), fields=['id'], name='game_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='individualinscription',
+            index=models.Index(fields=['registration_status'], name='inscription_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['status', 'date'], name='match_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['date'], name='match_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='team',
+            index=models.Index(fields=['registration_status'], name='team_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tournament',
+            index=models.Index(fields=['status'], name='tournament_status_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='individualinscription',
+            constraint=models.UniqueConstraint(condition=models.Q(('registration_status', 'confirmed')), fields=('user', 'game'), name='unique_confirmed_inscription', violation_error_message='User is already registered for this game.'),
+        ),
+        migrations.AddConstraint(
+            model_name='team',
+            constraint=models.UniqueConstraint(condition=models.Q(('registration_status', 'confirmed')), fields=('captain', 'game'), name='unique_confirmed_captain', violation_error_message='This captain is already registered for this game.'),
+        ),
+    ]
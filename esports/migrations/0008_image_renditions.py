@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('esports', '0007_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='image_renditions',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='team',
+            name='logo_renditions',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
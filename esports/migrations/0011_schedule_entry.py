@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('esports', '0010_task_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduleEntry',
+            fields=[
+                ('match', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='schedule_entry', serialize=False, to='esports.match')),
+                ('date', models.DateTimeField()),
+                ('data', models.JSONField()),
+                ('game', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='esports.game')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date', 'match'], name='schedule_date_idx'), models.Index(fields=['game', 'date', 'match'], name='schedule_game_idx')],
+            },
+        ),
+    ]
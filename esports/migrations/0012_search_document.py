@@ -0,0 +1,101 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:07
+
+from django.db import migrations, models
+
+
+# Titles are names, so the 'simple' configuration (no stemming) is used
+# for both weights; prefix queries cover partially typed words.
+INDEX_SQL = {
+    'postgresql': [
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        "ALTER TABLE esports_searchdocument ADD COLUMN vector tsvector "
+        "GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('simple', title), 'A') || "
+        "setweight(to_tsvector('simple', body), 'B')) STORED",
+        "CREATE INDEX search_vector_idx ON esports_searchdocument "
+        "USING gin (vector)",
+        "CREATE INDEX search_title_trgm_idx ON esports_searchdocument "
+        "USING gin (title gin_trgm_ops)",
+    ],
+    'sqlite': [
+        "CREATE VIRTUAL TABLE esports_searchdocument_fts USING fts5("
+        "title, body, content='esports_searchdocument', content_rowid='id', "
+        "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        "CREATE TRIGGER esports_searchdocument_ai "
+        "AFTER INSERT ON esports_searchdocument BEGIN "
+        "INSERT INTO esports_searchdocument_fts(rowid, title, body) "
+        "VALUES (new.id, new.title, new.body); END",
+        "CREATE TRIGGER esports_searchdocument_ad "
+        "AFTER DELETE ON esports_searchdocument BEGIN "
+        "INSERT INTO esports_searchdocument_fts"
+        "(esports_searchdocument_fts, rowid, title, body) "
+        "VALUES ('delete', old.id, old.title, old.body); END",
+        "CREATE TRIGGER esports_searchdocument_au "
+        "AFTER UPDATE ON esports_searchdocument BEGIN "
+        "INSERT INTO esports_searchdocument_fts"
+        "(esports_searchdocument_fts, rowid, title, body) "
+        "VALUES ('delete', old.id, old.title, old.body); "
+        "INSERT INTO esports_searchdocument_fts(rowid, title, body) "
+        "VALUES (new.id, new.title, new.body); END",
+    ],
+}
+
+DROP_SQL = {
+    'postgresql': [
+        "ALTER TABLE esports_searchdocument DROP COLUMN vector",
+    ],
+    'sqlite': [
+        "DROP TRIGGER esports_searchdocument_au",
+        "DROP TRIGGER esports_searchdocument_ad",
+        "DROP TRIGGER esports_searchdocument_ai",
+        "DROP TABLE esports_searchdocument_fts",
+    ],
+}
+
+BACKFILL_SQL = [
+    "INSERT INTO esports_searchdocument (kind, object_id, title, body) "
+    "SELECT 'game', id, name, description FROM esports_game",
+    "INSERT INTO esports_searchdocument (kind, object_id, title, body) "
+    "SELECT 'team', id, name, '' FROM esports_team "
+    "WHERE registration_status = 'confirmed'",
+    "INSERT INTO esports_searchdocument (kind, object_id, title, body) "
+    "SELECT 'player', id, nickname, '' FROM esports_customuser "
+    "WHERE role IN ('player', 'captain') AND is_active",
+    "INSERT INTO esports_searchdocument (kind, object_id, title, body) "
+    "SELECT 'tournament', id, name, '' FROM esports_tournament",
+]
+
+
+def create_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for statement in INDEX_SQL.get(vendor, []) + BACKFILL_SQL:
+        schema_editor.execute(statement)
+
+
+def drop_index(apps, schema_editor):
+    for statement in DROP_SQL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('esports', '0011_schedule_entry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('game', 'Game'), ('team', 'Team'), ('player', 'Player'), ('tournament', 'Tournament')], max_length=10)),
+                ('object_id', models.BigIntegerField()),
+                ('title', models.TextField()),
+                ('body', models.TextField(blank=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id'), name='unique_search_document')],
+            },
+        ),
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:11
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('esports', '0012_search_document'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegistrationReview',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('batch', models.UUIDField(default=uuid.uuid4)),
+                ('kind', models.CharField(choices=[('team', 'Team'), ('inscription', 'Individual inscription')], max_length=11)),
+                ('registration_id', models.BigIntegerField()),
+                ('previous_status', models.CharField(choices=[('pending', 'Pending'), ('confirmed', 'Confirmed'), ('rejected', 'Rejected')], max_length=10)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('confirmed', 'Confirmed'), ('rejected', 'Rejected')], max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('reviewer', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='registration_reviews', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'registration_id'], name='review_registration_idx'), models.Index(fields=['batch'], name='review_batch_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('esports', '0013_registration_review'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='standing',
+            name='standing_rank_idx',
+        ),
+        migrations.AddIndex(
+            model_name='standing',
+            index=models.Index(fields=['tournament', '-points', '-score_difference', '-score_for', 'team', 'user'], name='standing_rank_idx'),
+        ),
+    ]
@@ -1,7 +1,10 @@
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.core.exceptions import ValidationError
 from django.core.validators import FileExtensionValidator
+from django.utils import timezone
 
 
 class CustomUser(AbstractUser):
@@ -16,6 +19,15 @@ class CustomUser(AbstractUser):
     role = models.CharField(
         max_length=10, choices=ROLE_CHOICES, default='player'
         )
+    token_version = models.PositiveIntegerField(default=0)
+
+    # Access tokens carry these; changing them revokes issued tokens.
+    TOKEN_FIELDS = ('role', 'is_active')
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(fields=['role'], name='customuser_role_idx')
+        ]
 
     def __str__(self):
         return (
@@ -29,6 +41,31 @@ class CustomUser(AbstractUser):
     def is_superadmin(self):
         return self.role == 'superadmin'
 
+    def revoke_tokens(self):
+        self.token_version += 1
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_token_fields = {
+            name: instance.__dict__[name]
+            for name in cls.TOKEN_FIELDS if name in instance.__dict__
+        }
+        return instance
+
+    def save(self, *args, **kwargs):
+        loaded = getattr(self, '_loaded_token_fields', {})
+        update_fields = kwargs.get('update_fields')
+        if any(getattr(self, name) != value
+               for name, value in loaded.items()
+               if update_fields is None or name in update_fields):
+            self.revoke_tokens()
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'token_version'}
+        super().save(*args, **kwargs)
+        self._loaded_token_fields = {
+            name: getattr(self, name) for name in self.TOKEN_FIELDS}
+
 
 class Game(models.Model):
     TYPE_CHOICES = (
@@ -43,8 +80,18 @@ class Game(models.Model):
     images = models.ImageField(
         upload_to='games/',
         validators=[FileExtensionValidator(['jpg', 'jpeg', 'png'])])
+    image_renditions = models.JSONField(default=dict, blank=True)
     active = models.BooleanField(default=True)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['id'],
+                name='game_active_idx',
+                condition=models.Q(active=True)
+            )
+        ]
+
     def __str__(self):
         return self.name
 
@@ -76,6 +123,7 @@ class Team(models.Model):
     )
     name = models.CharField(max_length=100)
     logo = models.ImageField(upload_to='logos/')
+    logo_renditions = models.JSONField(default=dict, blank=True)
     captain = models.ForeignKey(
         CustomUser, on_delete=models.CASCADE, related_name='captain_of'
         )
@@ -86,22 +134,26 @@ class Team(models.Model):
         )
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['captain', 'game'],
+                name='unique_confirmed_captain',
+                condition=models.Q(registration_status='confirmed'),
+                violation_error_message=(
+                    "This captain is already registered for this game."
+                )
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['registration_status'], name='team_status_idx'
+            )
+        ]
+
     def __str__(self):
         return self.name
 
-    def clean(self):
-        qs = Team.objects.filter(
-            captain=self.captain,
-            game=self.game,
-            registration_status='confirmed'
-        )
-        if self.pk:
-            qs = qs.exclude(pk=self.pk)
-        if qs.exists():
-            raise ValidationError(
-                "This captain is already registered for this game."
-                )
-
 
 class TeamPlayer(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
@@ -125,20 +177,27 @@ class IndividualInscription(models.Model):
         )
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'game'],
+                name='unique_confirmed_inscription',
+                condition=models.Q(registration_status='confirmed'),
+                violation_error_message=(
+                    "User is already registered for this game."
+                )
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['registration_status'],
+                name='inscription_status_idx'
+            )
+        ]
+
     def __str__(self):
         return f"{self.user.nickname} for {self.game.name}"
 
-    def clean(self):
-        qs = IndividualInscription.objects.filter(
-            user=self.user,
-            game=self.game,
-            registration_status='confirmed'
-        )
-        if self.pk:
-            qs = qs.exclude(pk=self.pk)
-        if qs.exists():
-            raise ValidationError("User is already registered for this game.")
-
 
 class Tournament(models.Model):
     STATUS_CHOICES = (
@@ -153,6 +212,11 @@ class Tournament(models.Model):
         max_length=10, choices=STATUS_CHOICES, default='upcoming'
         )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status'], name='tournament_status_idx')
+        ]
+
     def __str__(self):
         return self.name
 
@@ -163,6 +227,8 @@ class Match(models.Model):
         ('played', 'Played'),
         ('canceled', 'Canceled'),
     )
+    LIVE_FIELDS = ('status', 'results', 'date', 'round')
+
     tournament = models.ForeignKey(Tournament, on_delete=models.CASCADE)
     date = models.DateTimeField()
     results = models.CharField(max_length=50, blank=True)
@@ -171,6 +237,24 @@ class Match(models.Model):
         )
     round = models.CharField(max_length=50)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['status', 'date'], name='match_status_date_idx'
+            ),
+            models.Index(fields=['date'], name='match_date_idx')
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_status = instance.__dict__.get('status')
+        instance._loaded_values = {
+            name: instance.__dict__[name]
+            for name in cls.LIVE_FIELDS if name in instance.__dict__
+        }
+        return instance
+
     def __str__(self):
         participants = self.participants.all()
         names = [
@@ -189,6 +273,7 @@ class MatchParticipant(models.Model):
     user = models.ForeignKey(
         CustomUser, on_delete=models.CASCADE, null=True, blank=True
         )
+    score = models.IntegerField(null=True, blank=True)
 
     class Meta:
         constraints = [
@@ -204,6 +289,24 @@ class MatchParticipant(models.Model):
             )
         ]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'score' in instance.__dict__:
+            instance._loaded_score = instance.score
+        return instance
+
+    def score_changed(self, update_fields=None):
+        """
+        Whether saving changes the score the participant was loaded
+        with. New participants, and those not loaded from the database,
+        count as changed.
+        """
+        if update_fields is not None and 'score' not in update_fields:
+            return False
+        return (self._state.adding or '_loaded_score' not in vars(self)
+                or self.score != self._loaded_score)
+
     def clean(self):
         if self.team and self.user:
             raise ValidationError(
@@ -218,6 +321,54 @@ class MatchParticipant(models.Model):
         return self.team.name if self.team else self.user.nickname
 
 
+class Standing(models.Model):
+    tournament = models.ForeignKey(
+        Tournament, on_delete=models.CASCADE, related_name='standings'
+        )
+    team = models.ForeignKey(
+        Team, on_delete=models.CASCADE, null=True, blank=True
+        )
+    user = models.ForeignKey(
+        CustomUser, on_delete=models.CASCADE, null=True, blank=True
+        )
+    played = models.IntegerField(default=0)
+    wins = models.IntegerField(default=0)
+    draws = models.IntegerField(default=0)
+    losses = models.IntegerField(default=0)
+    points = models.IntegerField(default=0)
+    score_for = models.IntegerField(default=0)
+    score_against = models.IntegerField(default=0)
+    score_difference = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['tournament', 'team'],
+                name='unique_team_standing',
+                condition=models.Q(team__isnull=False)
+            ),
+            models.UniqueConstraint(
+                fields=['tournament', 'user'],
+                name='unique_user_standing',
+                condition=models.Q(user__isnull=False)
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['tournament', '-points', '-score_difference',
+                        '-score_for', 'team', 'user'],
+                name='standing_rank_idx'
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.tournament.name}: {self.points} pts"
+
+    @property
+    def entrant_id(self):
+        return self.user_id if self.team_id is None else self.team_id
+
+
 class Transmission(models.Model):
     match = models.ForeignKey(Match, on_delete=models.CASCADE)
     platform = models.CharField(max_length=50)
@@ -247,3 +398,169 @@ class ContactInfo(models.Model):
 
     def __str__(self):
         return f"{self.platform}: {self.link}"
+
+
+class Upload(models.Model):
+    TARGET_CHOICES = (
+        ('team_voucher', 'Team voucher'),
+        ('inscription_voucher', 'Individual inscription voucher'),
+        ('game_bases', 'Game bases'),
+        ('media_content', 'Media content file'),
+    )
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('complete', 'Complete'),
+        ('failed', 'Failed'),
+    )
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
+    target = models.CharField(max_length=20, choices=TARGET_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    offset = models.PositiveBigIntegerField(default=0)
+    checksum = models.CharField(max_length=64)
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default='pending'
+        )
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.size})"
+
+
+class Task(models.Model):
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    )
+    queue = models.CharField(max_length=50, default='default')
+    name = models.CharField(max_length=200)
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    idempotency_key = models.CharField(
+        max_length=200, unique=True, null=True, blank=True
+        )
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default='queued'
+        )
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['run_at', 'id'], name='task_ready_idx',
+                condition=models.Q(status='queued')
+            ),
+            models.Index(
+                fields=['queue', 'locked_at'], name='task_running_idx',
+                condition=models.Q(status='running')
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.name} [{self.queue}] {self.status}"
+
+
+class ScheduleEntry(models.Model):
+    """
+    Denormalized row of the public schedule, kept up to date by
+    esports.schedule. `data` holds the feed item ready to be served.
+    """
+    match = models.OneToOneField(
+        Match, on_delete=models.CASCADE, primary_key=True,
+        related_name='schedule_entry'
+        )
+    # Entries go away with their match; no separate cascade from Game.
+    game = models.ForeignKey(
+        Game, on_delete=models.DO_NOTHING, db_constraint=False,
+        related_name='+'
+        )
+    date = models.DateTimeField()
+    data = models.JSONField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['date', 'match'], name='schedule_date_idx'),
+            models.Index(
+                fields=['game', 'date', 'match'], name='schedule_game_idx'
+            )
+        ]
+
+    def __str__(self):
+        return f"Match {self.match_id} on {self.date}"
+
+
+class SearchDocument(models.Model):
+    """
+    Public searchable text of a game, confirmed team, player or
+    tournament, kept up to date by esports.search. The full-text index
+    over it is created per backend by the migration.
+    """
+    KIND_CHOICES = (
+        ('game', 'Game'),
+        ('team', 'Team'),
+        ('player', 'Player'),
+        ('tournament', 'Tournament'),
+    )
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    title = models.TextField()
+    body = models.TextField(blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['kind', 'object_id'], name='unique_search_document'
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id}: {self.title}"
+
+
+class RegistrationReview(models.Model):
+    """
+    Audit trail of registration status changes made through the bulk
+    review API and admin actions. One row per changed registration.
+    """
+    KIND_CHOICES = (
+        ('team', 'Team'),
+        ('inscription', 'Individual inscription'),
+    )
+    STATUS_CHOICES = Team.STATUS_CHOICES
+
+    batch = models.UUIDField(default=uuid.uuid4)
+    # Kept when the reviewer account is deleted.
+    reviewer = models.ForeignKey(
+        CustomUser, on_delete=models.DO_NOTHING, db_constraint=False,
+        null=True, blank=True, related_name='registration_reviews'
+        )
+    kind = models.CharField(max_length=11, choices=KIND_CHOICES)
+    registration_id = models.BigIntegerField()
+    previous_status = models.CharField(max_length=10, choices=STATUS_CHOICES)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['kind', 'registration_id'],
+                name='review_registration_idx'
+            ),
+            models.Index(fields=['batch'], name='review_batch_idx')
+        ]
+
+    def __str__(self):
+        return (f"{self.kind} {self.registration_id}: "
+                f"{self.previous_status} -> {self.status}")
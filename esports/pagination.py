@@ -0,0 +1,117 @@
+import base64
+import json
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, CursorPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .standings import RANK_ORDERING, after_standing
+
+
+class IdCursorPagination(CursorPagination):
+    ordering = 'id'
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class StandingsPagination(BasePagination):
+    """
+    Keyset pagination over the standings ranking. The cursor carries the
+    sort key and the rank of the last row of the previous page, so every
+    page costs one indexed range scan regardless of its depth.
+    """
+    page_size = 20
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    cursor_fields = (
+        'rank', 'points', 'score_difference', 'score_for', 'entrant_id',
+    )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+
+        rank = 0
+        if cursor:
+            queryset = queryset.filter(after_standing(cursor))
+            rank = cursor['rank']
+
+        rows = list(queryset.order_by(*RANK_ORDERING)[:page_size + 1])
+        self.has_next = len(rows) > page_size
+        rows = rows[:page_size]
+        for offset, row in enumerate(rows, start=1):
+            row.rank = rank + offset
+        self.rows = rows
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded))
+            return {name: int(cursor[name]) for name in self.cursor_fields}
+        except (TypeError, ValueError, KeyError):
+            raise NotFound("Invalid cursor")
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        last = self.rows[-1]
+        cursor = {name: getattr(last, name) for name in self.cursor_fields}
+        encoded = base64.urlsafe_b64encode(
+            json.dumps(cursor).encode()).decode()
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def get_first_link(self):
+        if not self.request.query_params.get(self.cursor_query_param):
+            return None
+        url = self.request.build_absolute_uri()
+        return remove_query_param(url, self.cursor_query_param)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'first': self.get_first_link(),
+            'results': data,
+        })
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Django paginator for admin changelists on large tables. An
+    unfiltered PostgreSQL queryset is counted from the planner's row
+    estimate once the table holds ADMIN_ESTIMATED_COUNT_THRESHOLD rows;
+    filtered querysets and other backends are counted exactly.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT reltuples::bigint FROM pg_class "
+                    "WHERE oid = %s::regclass",
+                    [queryset.model._meta.db_table])
+                row = cursor.fetchone()
+            if row and row[0] >= settings.ADMIN_ESTIMATED_COUNT_THRESHOLD:
+                return row[0]
+        return super().count
@@ -1,5 +1,35 @@
 from rest_framework.permissions import BasePermission
 
+from .authentication import get_admin_game_ids
+from .models import Game
+
+
+def managed_game_ids(user):
+    """
+    Ids of the games `user` may manage, or None for every game. Resolved
+    once per user object, i.e. once per request.
+    """
+    # TokenUser answers any missing attribute from the token claims, so
+    # look the memo up in the instance dict.
+    try:
+        return vars(user)['_managed_game_ids']
+    except KeyError:
+        pass
+    role = getattr(user, 'role', None)
+    if role == 'superadmin' or getattr(user, 'is_superuser', False):
+        game_ids = None
+    elif role == 'admin':
+        game_ids = get_admin_game_ids(user.id)
+    else:
+        game_ids = frozenset()
+    user._managed_game_ids = game_ids
+    return game_ids
+
+
+def manages_game(user, game_id):
+    game_ids = managed_game_ids(user)
+    return game_ids is None or game_id in game_ids
+
 
 class IsSuperAdmin(BasePermission):
     def has_permission(self, request, view):
@@ -15,3 +45,14 @@ class IsAdminOrSuperAdmin(BasePermission):
             request.user.is_authenticated
             and request.user.role in ['admin', 'superadmin']
         )
+
+
+class IsGameAdmin(IsAdminOrSuperAdmin):
+    """
+    Admins may only act on objects of the games assigned to them;
+    superadmins on every object. Objects are a Game or have a `game_id`.
+    """
+
+    def has_object_permission(self, request, view, obj):
+        game_id = obj.pk if isinstance(obj, Game) else obj.game_id
+        return manages_game(request.user, game_id)
@@ -0,0 +1,148 @@
+import logging
+import random
+import re
+import time
+import traceback
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+current_detector = ContextVar('esports_query_detector', default=None)
+
+IN_LIST = re.compile(r'\bIN \((?:%s, )*%s\)')
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+
+
+class RepeatedQueryError(Exception):
+    pass
+
+
+def fingerprint(sql):
+    """
+    Normalizes `sql` so that statements differing only in their
+    parameters, inlined literals or IN-list length compare equal.
+    """
+    return LITERALS.sub('?', IN_LIST.sub('IN (...)', sql))
+
+
+def caller_stack():
+    """
+    The frames of project code that led to the current query, outermost
+    first, skipping Django, third-party packages and this module.
+    """
+    root = str(settings.BASE_DIR)
+    return [
+        frame for frame in traceback.extract_stack()
+        if frame.filename.startswith(root)
+        and 'site-packages' not in frame.filename
+        and frame.filename != __file__
+    ]
+
+
+class QueryDetector:
+    """
+    Collects the SELECT statements of one unit of work and reports the
+    fingerprints executed at least `threshold` times with different
+    parameters (N+1 patterns), and every query slower than `slow`
+    seconds, together with the Python stack that issued them.
+    """
+
+    def __init__(self, mode, threshold=None, slow=None):
+        self.mode = mode
+        self.threshold = threshold or settings.QUERY_DETECTOR_THRESHOLD
+        self.slow = slow if slow is not None else \
+            settings.QUERY_DETECTOR_SLOW_MS / 1000
+        self.seen = {}
+        self.repeated = []
+        self.slow_queries = []
+
+    def observe(self, sql, params, duration):
+        if duration >= self.slow:
+            self.slow_queries.append((sql, duration, caller_stack()))
+
+        if not sql.lstrip()[:6].upper() == 'SELECT':
+            return
+        key = fingerprint(sql)
+        entry = self.seen.get(key)
+        if entry is None:
+            entry = self.seen[key] = [0, set(), False]
+        entry[0] += 1
+        if len(entry[1]) < 2:
+            entry[1].add(repr(params))
+        if entry[2] or entry[0] < self.threshold or len(entry[1]) < 2:
+            return
+
+        entry[2] = True
+        stack = caller_stack()
+        self.repeated.append((key, stack))
+        if self.mode == 'raise':
+            raise RepeatedQueryError(
+                f"Query executed {entry[0]} times with different "
+                f"parameters:\n{key}\n{format_stack(stack)}")
+
+    def report(self, label):
+        for sql, stack in self.repeated:
+            logger.warning(
+                "Repeated query in %s (possible N+1):\n%s\n%s",
+                label, sql, format_stack(stack))
+        for sql, duration, stack in self.slow_queries:
+            logger.warning(
+                "Slow query in %s (%.0f ms):\n%s\n%s",
+                label, duration * 1000, sql, format_stack(stack))
+
+
+def format_stack(stack):
+    return ''.join(traceback.format_list(stack))
+
+
+def detect_query(execute, sql, params, many, context):
+    """
+    Execute wrapper installed on every database connection. It only
+    times queries while a detector is active.
+    """
+    detector = current_detector.get()
+    if detector is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    result = execute(sql, params, many, context)
+    detector.observe(sql, params, time.perf_counter() - started)
+    return result
+
+
+def install_detector(connection):
+    if detect_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(detect_query)
+
+
+def request_detector():
+    """
+    Returns a detector for the next request according to
+    QUERY_DETECTOR_MODE: always in 'raise' mode, for a
+    QUERY_DETECTOR_SAMPLE_RATE fraction of requests in 'log' mode, and
+    never when 'off'.
+    """
+    mode = settings.QUERY_DETECTOR_MODE
+    if mode == 'raise' or (
+            mode == 'log'
+            and random.random() < settings.QUERY_DETECTOR_SAMPLE_RATE):
+        return QueryDetector(mode)
+    return None
+
+
+@contextmanager
+def detect_queries(mode='raise', threshold=None, slow=None):
+    """
+    Runs the enclosed block under a detector, for use in tests and
+    management commands. In 'log' mode the findings are logged on exit.
+    """
+    detector = QueryDetector(mode, threshold, slow)
+    token = current_detector.set(detector)
+    try:
+        yield detector
+    finally:
+        current_detector.reset(token)
+    detector.report('block')
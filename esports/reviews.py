@@ -0,0 +1,166 @@
+import uuid
+
+from django.db import IntegrityError, transaction
+
+from .models import IndividualInscription, RegistrationReview, Team
+from .search import index
+
+
+# Model, owner field and one-confirmed-per-game message, by review kind.
+REVIEW_TARGETS = {
+    'team': (Team, 'captain_id',
+             "This captain is already registered for this game."),
+    'inscription': (IndividualInscription, 'user_id',
+                    "User is already registered for this game."),
+}
+
+
+class ConcurrentReview(Exception):
+    pass
+
+
+class ReviewReport:
+    def __init__(self, batch):
+        self.batch = batch
+        self.counts = {'updated': 0, 'unchanged': 0, 'errors': 0}
+        self.results = []
+
+    def add(self, kind, pk, status, error=None, changed=False):
+        row = {'type': kind, 'id': pk, 'status': status}
+        if error:
+            row.update(result='error', error=error)
+            self.counts['errors'] += 1
+        else:
+            row['result'] = 'updated' if changed else 'unchanged'
+            self.counts[row['result']] += 1
+        self.results.append(row)
+
+    def as_dict(self):
+        return {'batch': str(self.batch), **self.counts,
+                'results': self.results}
+
+
+class RegistrationReviewer:
+    """
+    Applies `(kind, id, status)` review decisions in one transaction.
+    Per kind, the registrations are loaded and locked with one query,
+    the one-confirmed-registration-per-owner-per-game invariant is
+    checked with one set-based query, and the changes are written with
+    one UPDATE per target status. Every change is recorded as a
+    RegistrationReview; invalid decisions are reported and skipped.
+    `game_ids` limits the review to the registrations of those games.
+    """
+
+    def __init__(self, reviewer_id=None, game_ids=None):
+        self.reviewer_id = reviewer_id
+        self.game_ids = game_ids
+        self.report = ReviewReport(uuid.uuid4())
+
+    def run(self, decisions):
+        decisions = list(decisions)
+        outcomes = [None] * len(decisions)
+        try:
+            with transaction.atomic():
+                audit = []
+                for kind in REVIEW_TARGETS:
+                    audit += self.review(kind, [
+                        (position, pk, status)
+                        for position, (k, pk, status) in enumerate(decisions)
+                        if k == kind], outcomes)
+                RegistrationReview.objects.bulk_create(audit)
+        except IntegrityError:
+            raise ConcurrentReview(
+                "Registrations changed during the review; retry it.")
+
+        for (kind, pk, status), (error, changed) in zip(decisions, outcomes):
+            self.report.add(kind, pk, status, error, changed)
+        return self.report
+
+    def review(self, kind, decisions, outcomes):
+        """
+        Reviews the `decisions` of one kind, storing `(error, changed)`
+        at their position in `outcomes`. Returns the audit rows.
+        """
+        if not decisions:
+            return []
+        model, owner, _ = REVIEW_TARGETS[kind]
+        rows = {
+            row['id']: row for row in model.objects.select_for_update()
+            .filter(pk__in={pk for _, pk, _ in decisions})
+            .values('id', 'game_id', owner, 'registration_status')
+        }
+
+        changes = self.changes(model, rows, decisions, outcomes)
+        self.check_confirmed(kind, rows, changes, outcomes)
+
+        by_status = {}
+        for pk, (_, status) in changes.items():
+            by_status.setdefault(status, []).append(pk)
+        # Release confirmed pairs before they are claimed again.
+        for status in sorted(by_status, key=lambda s: s == 'confirmed'):
+            model.objects.filter(pk__in=by_status[status]).update(
+                registration_status=status)
+
+        if kind == 'team' and changes:
+            # Only confirmed teams are searchable.
+            ids = list(changes)
+            transaction.on_commit(
+                lambda: index(Team.objects.filter(pk__in=ids)))
+
+        return [
+            RegistrationReview(
+                batch=self.report.batch, reviewer_id=self.reviewer_id,
+                kind=kind, registration_id=pk,
+                previous_status=rows[pk]['registration_status'],
+                status=status)
+            for pk, (_, status) in changes.items()
+        ]
+
+    def changes(self, model, rows, decisions, outcomes):
+        """
+        Validates each decision against the locked `rows`. Returns the
+        `{id: (position, status)}` of those changing a status.
+        """
+        changes = {}
+        seen = set()
+        for position, pk, status in decisions:
+            if pk not in rows:
+                name = model._meta.verbose_name.capitalize()
+                outcomes[position] = (f"{name} not found.", False)
+            elif (self.game_ids is not None
+                  and rows[pk]['game_id'] not in self.game_ids):
+                outcomes[position] = (
+                    "You do not manage this registration's game.", False)
+            elif pk in seen:
+                outcomes[position] = (
+                    "Duplicate decision for this registration.", False)
+            else:
+                seen.add(pk)
+                changed = rows[pk]['registration_status'] != status
+                outcomes[position] = (None, changed)
+                if changed:
+                    changes[pk] = (position, status)
+        return changes
+
+    def check_confirmed(self, kind, rows, changes, outcomes):
+        """
+        Drops from `changes` the confirmations that would give an owner
+        a second confirmed registration for a game, with one query.
+        """
+        model, owner, message = REVIEW_TARGETS[kind]
+        # Confirmed (game, owner) pairs, apart from rows changed here.
+        confirming = [rows[pk] for pk, (_, status) in changes.items()
+                      if status == 'confirmed']
+        if not confirming:
+            return
+        taken = set(model.objects.filter(
+            registration_status='confirmed',
+            game_id__in={row['game_id'] for row in confirming},
+            **{f'{owner}__in': {row[owner] for row in confirming}},
+        ).exclude(pk__in=list(changes)).values_list('game_id', owner))
+        for row in confirming:
+            pair = (row['game_id'], row[owner])
+            if pair in taken:
+                position, _ = changes.pop(row['id'])
+                outcomes[position] = (message, False)
+            taken.add(pair)
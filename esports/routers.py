@@ -0,0 +1,116 @@
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.utils.connection import ConnectionDoesNotExist
+
+
+logger = logging.getLogger(__name__)
+
+
+class ReplicaChoice:
+    """
+    The replica serving the reads of one request, picked on its first
+    read so a queryset and its prefetches see the same replication lag.
+    """
+    alias = None
+
+
+# A ReplicaChoice while the current request may read from replicas.
+request_replica = ContextVar('esports_request_replica', default=None)
+
+
+@contextmanager
+def primary_reads():
+    """
+    Sends the reads inside the block to the primary. Use it for data
+    cached under versions that writes on the primary bump: a lagging
+    replica would store stale rows under the new version.
+    """
+    token = request_replica.set(None)
+    try:
+        yield
+    finally:
+        request_replica.reset(token)
+
+
+REPLICA_LAG_SQL = (
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() "
+    "THEN 0 ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) "
+    "END"
+)
+
+_health = {}
+
+
+def replica_lag(alias):
+    """
+    Seconds the replica `alias` is behind the primary. Backends without
+    streaming replication (SQLite test mirrors) report no lag.
+    """
+    connection = connections[alias]
+    if connection.vendor != 'postgresql':
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(REPLICA_LAG_SQL)
+        lag = cursor.fetchone()[0]
+    return float(lag or 0)
+
+
+def is_healthy(alias):
+    """
+    Whether `alias` is reachable and within REPLICA_MAX_LAG seconds of
+    the primary. The answer is reused for REPLICA_CHECK_INTERVAL seconds.
+    """
+    now = time.monotonic()
+    checked = _health.get(alias)
+    if checked and now - checked[0] < settings.REPLICA_CHECK_INTERVAL:
+        return checked[1]
+
+    try:
+        lag = replica_lag(alias)
+        healthy = lag <= settings.REPLICA_MAX_LAG
+        if not healthy:
+            logger.warning("Replica %s is %.1fs behind", alias, lag)
+    except (DatabaseError, ConnectionDoesNotExist):
+        logger.warning("Replica %s is unavailable", alias, exc_info=True)
+        healthy = False
+    _health[alias] = (now, healthy)
+    return healthy
+
+
+def reset_health():
+    _health.clear()
+
+
+class ReplicaRouter:
+    """
+    Sends the reads of a request to one healthy replica while
+    `request_replica` is set for it (see ReplicaMiddleware), and
+    everything else to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        choice = request_replica.get()
+        if choice is None:
+            return DEFAULT_DB_ALIAS
+        if choice.alias is None:
+            healthy = [alias for alias in settings.DATABASE_REPLICAS
+                       if is_healthy(alias)]
+            choice.alias = (random.choice(healthy) if healthy
+                            else DEFAULT_DB_ALIAS)
+        return choice.alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,223 @@
+from datetime import timedelta, timezone as dt_timezone
+from functools import reduce
+from operator import or_
+
+from asgiref.local import Local
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Prefetch, Q
+from django.utils import timezone
+from rest_framework import serializers
+
+from .models import (
+    CustomUser, Game, Match, MatchParticipant, ScheduleEntry, Team,
+    Tournament, Transmission
+)
+
+
+LISTED_TOURNAMENT_STATUSES = ('upcoming', 'ongoing')
+REFRESH_BATCH = 500
+DATE_FIELD = serializers.DateTimeField()
+
+# Fields copied into the entries, and the lookup selecting the matches
+# that copy them, by source model.
+SOURCE_FIELDS = {
+    Game: ({'name', 'active'}, 'tournament__game'),
+    Tournament: ({'game', 'name', 'status'}, 'tournament'),
+    Team: ({'name'}, 'participants__team'),
+    CustomUser: ({'nickname'}, 'participants__user'),
+}
+
+
+def is_listed(match):
+    return (match.status != 'canceled'
+            and match.tournament.status in LISTED_TOURNAMENT_STATUSES
+            and match.tournament.game.active)
+
+
+def participant_name(participant):
+    if participant.team_id:
+        return participant.team.name
+    if participant.user_id:
+        return participant.user.nickname
+    return None
+
+
+def entry_data(match):
+    tournament = match.tournament
+    return {
+        'id': match.pk,
+        'date': DATE_FIELD.to_representation(match.date),
+        'round': match.round,
+        'status': match.status,
+        'results': match.results,
+        'game': {'id': tournament.game_id, 'name': tournament.game.name},
+        'tournament': {
+            'id': tournament.pk,
+            'name': tournament.name,
+            'status': tournament.status,
+        },
+        'participants': [
+            {'team': p.team_id, 'user': p.user_id,
+             'name': participant_name(p), 'score': p.score}
+            for p in match.participants.all()
+        ],
+        'transmissions': [
+            {'platform': t.platform, 'url': t.url}
+            for t in match.transmission_set.all()
+        ],
+    }
+
+
+def write(entries, unlisted):
+    with transaction.atomic():
+        if unlisted:
+            ScheduleEntry.objects.filter(match_id__in=unlisted).delete()
+        if entries:
+            ScheduleEntry.objects.bulk_create(
+                entries, update_conflicts=True, unique_fields=['match'],
+                update_fields=['game', 'date', 'data'])
+
+
+def refresh(matches):
+    """
+    Rebuilds the schedule entries of `matches`, a Match queryset: listed
+    matches are upserted and the others removed, REFRESH_BATCH at a
+    time.
+    """
+    matches = matches.select_related('tournament__game').prefetch_related(
+        Prefetch('participants',
+                 queryset=MatchParticipant.objects.select_related(
+                     'team', 'user').order_by('id')),
+        Prefetch('transmission_set',
+                 queryset=Transmission.objects.order_by('id')),
+    ).order_by('id')
+
+    entries, unlisted = [], []
+    for match in matches.iterator(chunk_size=REFRESH_BATCH):
+        if is_listed(match):
+            entries.append(ScheduleEntry(
+                match=match, game_id=match.tournament.game_id,
+                date=match.date, data=entry_data(match)))
+        else:
+            unlisted.append(match.pk)
+        if len(entries) + len(unlisted) >= REFRESH_BATCH:
+            write(entries, unlisted)
+            entries, unlisted = [], []
+    write(entries, unlisted)
+
+
+# Lookups waiting for a commit, scoped like the database connections.
+pending = Local()
+
+
+def refresh_pending():
+    lookups = getattr(pending, 'lookups', None)
+    pending.lookups = None
+    if lookups:
+        refresh(Match.objects.filter(
+            reduce(or_, (Q(**dict(lookup)) for lookup in lookups))))
+
+
+def refresh_later(**lookup):
+    """
+    Refreshes the entries of the matches selected by `lookup` once the
+    current transaction commits. Every call registers a callback and
+    the first one to run refreshes all pending lookups, so the changes
+    of one transaction share a single refresh.
+    """
+    lookups = getattr(pending, 'lookups', None)
+    if lookups is None:
+        lookups = pending.lookups = set()
+    lookups.add(tuple(lookup.items()))
+    transaction.on_commit(refresh_pending)
+
+
+def source_saved(instance, created, update_fields):
+    """
+    Refreshes the entries copying fields of `instance`, unless it is new
+    or the save did not touch any copied field.
+    """
+    fields, lookup = SOURCE_FIELDS[type(instance)]
+    if created or (update_fields is not None
+                   and fields.isdisjoint(update_fields)):
+        return
+    refresh_later(**{lookup: instance.pk})
+
+
+def upcoming(game_id=None):
+    """
+    Entries of the upcoming matches and of those started less than
+    SCHEDULE_MATCH_DURATION seconds ago, read from one index.
+    """
+    since = timezone.now() - timedelta(
+        seconds=settings.SCHEDULE_MATCH_DURATION)
+    entries = ScheduleEntry.objects.filter(date__gte=since)
+    if game_id is not None:
+        entries = entries.filter(game_id=game_id)
+    return entries.order_by('date', 'match')[:settings.SCHEDULE_FEED_SIZE]
+
+
+def ical_text(value):
+    return (str(value).replace('\\', '\\\\').replace(';', '\\;')
+            .replace(',', '\\,').replace('\n', '\\n'))
+
+
+def ical_date(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def fold(line):
+    """
+    Splits `line` into the 75 octet lines required by RFC 5545.
+    """
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line
+    parts, start, limit = [], 0, 75
+    while start < len(encoded):
+        end = min(start + limit, len(encoded))
+        # Do not split a multi-byte character.
+        while end < len(encoded) and encoded[end] & 0xC0 == 0x80:
+            end -= 1
+        parts.append(encoded[start:end].decode())
+        start, limit = end, 74
+    return '\r\n '.join(parts)
+
+
+def calendar(rows, host):
+    """
+    iCalendar document of `rows`, `(date, data)` pairs of schedule
+    entries, for clients that subscribe instead of polling the feed.
+    """
+    stamp = ical_date(timezone.now())
+    duration = timedelta(seconds=settings.SCHEDULE_MATCH_DURATION)
+    lines = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//esports//schedule//EN',
+        'CALSCALE:GREGORIAN',
+        'X-WR-CALNAME:Esports schedule',
+    ]
+    for date, data in rows:
+        names = [p['name'] for p in data['participants'] if p['name']]
+        summary = f"{data['tournament']['name']} - {data['round']}"
+        if names:
+            summary += f": {' vs '.join(names)}"
+        description = '\n'.join([data['game']['name']] + [
+            f"{t['platform']}: {t['url']}" for t in data['transmissions']])
+        lines += [
+            'BEGIN:VEVENT',
+            f"UID:match-{data['id']}@{host}",
+            f'DTSTAMP:{stamp}',
+            f'DTSTART:{ical_date(date)}',
+            f'DTEND:{ical_date(date + duration)}',
+            f'SUMMARY:{ical_text(summary)}',
+            f'DESCRIPTION:{ical_text(description)}',
+            'STATUS:CONFIRMED',
+        ]
+        if data['transmissions']:
+            lines.append(f"URL:{data['transmissions'][0]['url']}")
+        lines.append('END:VEVENT')
+    lines.append('END:VCALENDAR')
+    return '\r\n'.join(fold(line) for line in lines) + '\r\n'
@@ -0,0 +1,148 @@
+import re
+
+from django.db import connections, router, transaction
+
+from .models import CustomUser, Game, SearchDocument, Team, Tournament
+
+
+WORD = re.compile(r'\w+')
+MAX_TERMS = 8
+PLAYER_ROLES = ('player', 'captain')
+
+# Document kind and the fields copied into it, by source model.
+SOURCES = {
+    Game: ('game', {'name', 'description'}),
+    Team: ('team', {'name', 'registration_status'}),
+    CustomUser: ('player', {'nickname', 'role', 'is_active'}),
+    Tournament: ('tournament', {'name'}),
+}
+
+POSTGRES_SQL = """
+    SELECT kind, object_id, title, ts_rank_cd(vector, query) AS rank
+    FROM esports_searchdocument, to_tsquery('simple', %s) AS query
+    WHERE vector @@ query AND kind IN ({kinds})
+    ORDER BY rank DESC, id
+    LIMIT %s
+"""
+
+TRIGRAM_SQL = """
+    SELECT kind, object_id, title, word_similarity(%s, title) AS rank
+    FROM esports_searchdocument
+    WHERE %s <%% title AND kind IN ({kinds})
+    ORDER BY rank DESC, id
+    LIMIT %s
+"""
+
+SQLITE_SQL = """
+    SELECT d.kind, d.object_id, d.title,
+           -bm25(esports_searchdocument_fts, 10.0, 1.0) AS rank
+    FROM esports_searchdocument_fts
+    JOIN esports_searchdocument d ON d.id = esports_searchdocument_fts.rowid
+    WHERE esports_searchdocument_fts MATCH %s AND d.kind IN ({kinds})
+    ORDER BY rank DESC, d.id
+    LIMIT %s
+"""
+
+
+def document(instance):
+    """
+    The SearchDocument of `instance`, or None when it is not public.
+    """
+    kind = SOURCES[type(instance)][0]
+    if kind == 'game':
+        title, body = instance.name, instance.description
+    elif kind == 'team':
+        if instance.registration_status != 'confirmed':
+            return None
+        title, body = instance.name, ''
+    elif kind == 'player':
+        if instance.role not in PLAYER_ROLES or not instance.is_active:
+            return None
+        title, body = instance.nickname, ''
+    else:
+        title, body = instance.name, ''
+    return SearchDocument(
+        kind=kind, object_id=instance.pk, title=title, body=body)
+
+
+def index(instances):
+    """
+    Upserts the documents of `instances` with one query and removes
+    those that are no longer public.
+    """
+    documents, hidden = [], []
+    for instance in instances:
+        found = document(instance)
+        if found is None:
+            hidden.append((SOURCES[type(instance)][0], instance.pk))
+        else:
+            documents.append(found)
+
+    with transaction.atomic():
+        for kind in {kind for kind, _ in hidden}:
+            SearchDocument.objects.filter(
+                kind=kind,
+                object_id__in=[pk for k, pk in hidden if k == kind]
+            ).delete()
+        if documents:
+            SearchDocument.objects.bulk_create(
+                documents, update_conflicts=True,
+                unique_fields=['kind', 'object_id'],
+                update_fields=['title', 'body'])
+
+
+def reindex_later(instance, created, update_fields):
+    """
+    Re-indexes `instance` once the transaction commits, unless the save
+    did not touch any copied field.
+    """
+    fields = SOURCES[type(instance)][1]
+    if not created and update_fields is not None \
+            and fields.isdisjoint(update_fields):
+        return
+    transaction.on_commit(lambda: index([instance]))
+
+
+def unindex_later(instance):
+    kind, pk = SOURCES[type(instance)][0], instance.pk
+    transaction.on_commit(lambda: SearchDocument.objects.filter(
+        kind=kind, object_id=pk).delete())
+
+
+def fetch(connection, sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def search_documents(query, kinds=None, limit=20):
+    """
+    Documents matching every word of `query` as a prefix, best first.
+    On PostgreSQL a query without full-text matches falls back to
+    trigram similarity of the titles, which tolerates typos.
+    """
+    words = WORD.findall(query.lower())[:MAX_TERMS]
+    if not words:
+        return []
+    kinds = sorted(kinds or dict(SearchDocument.KIND_CHOICES))
+    placeholders = ', '.join(['%s'] * len(kinds))
+
+    connection = connections[router.db_for_read(SearchDocument)]
+    if connection.vendor == 'postgresql':
+        prefixes = ' & '.join(f'{word}:*' for word in words)
+        rows = fetch(connection, POSTGRES_SQL.format(kinds=placeholders),
+                     [prefixes, *kinds, limit])
+        if not rows:
+            text = ' '.join(words)
+            rows = fetch(connection, TRIGRAM_SQL.format(kinds=placeholders),
+                         [text, text, *kinds, limit])
+    else:
+        prefixes = ' '.join(f'"{word}"*' for word in words)
+        rows = fetch(connection, SQLITE_SQL.format(kinds=placeholders),
+                     [prefixes, *kinds, limit])
+
+    return [
+        {'type': kind, 'id': object_id, 'title': title,
+         'rank': round(float(rank), 6)}
+        for kind, object_id, title, rank in rows
+    ]
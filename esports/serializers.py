@@ -1,8 +1,18 @@
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
+from django.core.exceptions import SuspiciousFileOperation
+from django.utils.text import get_valid_filename
 from rest_framework.exceptions import AuthenticationFailed, PermissionDenied
-from .models import CustomUser, AdminGame, Game
+from .images import srcset
+from .importers import import_format
+from .models import (
+    CustomUser, AdminGame, Game, RegistrationReview, SearchDocument,
+    Standing, Upload
+)
+from .permissions import manages_game
+from .uploads import UPLOAD_GAME_FIELDS, UPLOAD_TARGETS
 
 
 class AdminLoginSerializer(serializers.Serializer):
@@ -64,14 +74,42 @@ class AdminListSerializer(serializers.ModelSerializer):
 
     def get_games(self, obj):
         if obj.role == 'superadmin':
-            return GameSerializer(Game.objects.all(), many=True).data
+            catalog = self.context.get('catalog')
+            if catalog is None:
+                catalog = GameSerializer(Game.objects.all(), many=True).data
+            return catalog
 
         elif obj.role == 'admin':
-            qs = AdminGame.objects.filter(admin=obj)
+            games_by_admin = self.context.get('games_by_admin')
+            if games_by_admin is not None:
+                return games_by_admin.get(obj.id, [])
+            qs = AdminGame.objects.filter(admin=obj).select_related('game')
             return GameSerializer([ag.game for ag in qs], many=True).data
         return []
 
 
+def admin_games_context(users):
+    """
+    Loads the game assignments of `users` in a constant number of queries
+    for AdminListSerializer: one for the assignments and, only when a
+    superadmin is listed, one for the catalog.
+    """
+    admin_ids = [user.id for user in users if user.role == 'admin']
+    assignments = AdminGame.objects.filter(
+        admin_id__in=admin_ids).select_related('game').order_by('id')
+
+    games_by_admin = {}
+    for assignment in assignments:
+        games_by_admin.setdefault(assignment.admin_id, []).append(
+            GameSerializer(assignment.game).data)
+
+    context = {'games_by_admin': games_by_admin}
+    if any(user.role == 'superadmin' for user in users):
+        context['catalog'] = GameSerializer(
+            Game.objects.all(), many=True).data
+    return context
+
+
 class AdminCreateSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
 
@@ -139,16 +177,138 @@ class GameCreateUpdateSerializer(serializers.ModelSerializer):
         return super().update(instance, validated_data)
 
 
-class GamePublicSerializer(serializers.ModelSerializer):
+class SparseFieldsMixin:
+    """
+    Restricts the serialized fields to the `fields` keyword argument,
+    usually taken from the `?fields=` query parameter.
+    """
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+def requested_fields(request):
+    value = request.query_params.get('fields')
+    if not value:
+        return None
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+class GamePublicSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     tournaments = serializers.SerializerMethodField()
+    image_renditions = serializers.SerializerMethodField()
 
     class Meta:
         model = Game
         fields = ['id', 'name', 'description', 'type_of_game',
-                  'active', 'images', 'bases', 'tournaments']
+                  'active', 'images', 'image_renditions', 'bases',
+                  'tournaments']
+
+    def get_image_renditions(self, obj):
+        return srcset(obj.image_renditions)
 
     def get_tournaments(self, obj):
         return [{
             'id': t.id,
             'name': t.name,
             'status': t.status} for t in obj.tournament_set.all()]
+
+
+class RegistrationImportSerializer(serializers.Serializer):
+    file = serializers.FileField()
+
+    def validate_file(self, value):
+        if import_format(value.name) is None:
+            raise serializers.ValidationError(
+                "File must be a CSV or JSONL file.")
+        return value
+
+
+class ReviewDecisionSerializer(serializers.Serializer):
+    type = serializers.ChoiceField(choices=RegistrationReview.KIND_CHOICES)
+    id = serializers.IntegerField(min_value=1)
+    status = serializers.ChoiceField(
+        choices=RegistrationReview.STATUS_CHOICES)
+
+
+class RegistrationReviewSerializer(serializers.Serializer):
+    decisions = ReviewDecisionSerializer(
+        many=True, allow_empty=False,
+        max_length=settings.REGISTRATION_REVIEW_MAX_ROWS)
+
+
+class SearchQuerySerializer(serializers.Serializer):
+    q = serializers.CharField(min_length=2, max_length=100)
+    type = serializers.MultipleChoiceField(
+        choices=SearchDocument.KIND_CHOICES, required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=50, default=20)
+
+
+class StandingSerializer(serializers.ModelSerializer):
+    rank = serializers.IntegerField(read_only=True)
+    entrant = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Standing
+        fields = ['rank', 'team', 'user', 'entrant', 'played', 'wins',
+                  'draws', 'losses', 'points', 'score_for', 'score_against',
+                  'score_difference']
+
+    def get_entrant(self, obj):
+        return obj.team.name if obj.team_id else obj.user.nickname
+
+
+class UploadSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Upload
+        fields = ['id', 'target', 'object_id', 'filename', 'size',
+                  'offset', 'checksum', 'status', 'created_at',
+                  'completed_at']
+        read_only_fields = ['id', 'offset', 'status', 'created_at',
+                            'completed_at']
+
+    def validate_size(self, value):
+        if not 0 < value <= settings.UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(
+                "Size must be between 1 and "
+                f"{settings.UPLOAD_MAX_SIZE} bytes.")
+        return value
+
+    def validate_filename(self, value):
+        if '/' in value or '\\' in value:
+            raise serializers.ValidationError(
+                "Filename must not contain path separators.")
+        try:
+            return get_valid_filename(value)
+        except SuspiciousFileOperation:
+            raise serializers.ValidationError("Invalid filename.")
+
+    def validate_checksum(self, value):
+        value = value.lower()
+        if len(value) != 64 or value.strip('0123456789abcdef'):
+            raise serializers.ValidationError(
+                "Checksum must be a hex-encoded SHA-256 digest.")
+        return value
+
+    def validate(self, data):
+        model, _ = UPLOAD_TARGETS[data['target']]
+        game_field = UPLOAD_GAME_FIELDS.get(data['target'], 'pk')
+        game_id = model.objects.filter(pk=data['object_id']).values_list(
+            game_field, flat=True).first()
+        if game_id is None:
+            raise serializers.ValidationError(
+                {"object_id": "Target object not found."})
+        request = self.context.get('request')
+        if (request and data['target'] in UPLOAD_GAME_FIELDS
+                and not manages_game(request.user, game_id)):
+            raise PermissionDenied("You do not manage this game.")
+        if (data['target'] == 'game_bases'
+                and not data['filename'].lower().endswith('.pdf')):
+            raise serializers.ValidationError(
+                {"filename": "Bases file must be a PDF."})
+        return data
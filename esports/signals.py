@@ -1,11 +1,34 @@
-from django.db.models.signals import post_migrate
+from django.db.models.signals import (
+    post_delete, post_migrate, post_save, pre_delete, pre_save
+)
+from django.db import transaction
+from django.db.backends.signals import connection_created
 from django.dispatch import receiver
 from django.conf import settings
-from .models import CustomUser
+from django.core.cache import cache
+from .authentication import bump_admin_games, token_version_key
+from .cache import bump_game
+from .live import broadcast_match, broadcast_participant, match_changes
+from .metrics import install_query_wrapper, registry
+from .querydetector import install_detector
+from .models import (
+    AdminGame, CustomUser, Game, Match, MatchParticipant, Team, Tournament,
+    Transmission
+)
+from .schedule import refresh_later, source_saved
+from .search import reindex_later, unindex_later
+from .standings import (
+    apply_match, match_saved, participant_deleted, participant_deleting,
+    participant_saved, participant_saving
+)
+from .tasks import schedule_renditions
 
 
 @receiver(post_migrate)
 def create_default_superadmin(sender, **kwargs):
+    # post_migrate is sent once per installed app; hash the password once.
+    if sender.name != 'esports':
+        return
     username = getattr(settings, 'DEFAULT_SUPERADMIN_USERNAME')
     password = getattr(settings, 'DEFAULT_SUPERADMIN_PASSWORD')
 
@@ -23,3 +46,133 @@ def create_default_superadmin(sender, **kwargs):
         superadmin.role = 'superadmin'
         superadmin.save()
         print(f"Default superadmin updated: {username}")
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    install_query_wrapper(connection)
+    install_detector(connection)
+    registry.connection_opened(connection.alias)
+
+
+@receiver([post_save, post_delete], sender=Game)
+def invalidate_game_cache(sender, instance, **kwargs):
+    bump_game(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Tournament)
+@receiver([post_save, post_delete], sender=AdminGame)
+def invalidate_related_game_cache(sender, instance, **kwargs):
+    bump_game(instance.game_id)
+
+
+@receiver([post_save, post_delete], sender=AdminGame)
+def invalidate_admin_games(sender, instance, **kwargs):
+    bump_admin_games()
+
+
+@receiver(post_save, sender=CustomUser)
+def cache_token_version(sender, instance, **kwargs):
+    cache.set(token_version_key(instance.pk), instance.token_version,
+              settings.TOKEN_VERSION_CACHE_TIMEOUT)
+
+
+@receiver(post_delete, sender=CustomUser)
+def drop_token_version(sender, instance, **kwargs):
+    cache.delete(token_version_key(instance.pk))
+
+
+@receiver(post_save, sender=Match)
+def update_standings(sender, instance, created, **kwargs):
+    previous = None if created else getattr(instance, '_loaded_status', None)
+    match_saved(instance, previous)
+    instance._loaded_status = instance.status
+
+
+@receiver(post_save, sender=Match)
+def push_match_update(sender, instance, created, **kwargs):
+    changes = match_changes(instance, created)
+    instance._loaded_values = {
+        name: getattr(instance, name) for name in instance.LIVE_FIELDS}
+    transaction.on_commit(lambda: broadcast_match(instance, changes))
+
+
+@receiver(post_save, sender=MatchParticipant)
+def push_score_update(sender, instance, **kwargs):
+    if instance._score_changed:
+        transaction.on_commit(lambda: broadcast_participant(instance))
+
+
+@receiver(pre_delete, sender=Match)
+def remove_from_standings(sender, instance, **kwargs):
+    if instance.status == 'played':
+        apply_match(instance, -1)
+
+
+@receiver(pre_save, sender=MatchParticipant)
+def withdraw_participant_match(sender, instance, update_fields, **kwargs):
+    instance._score_changed = instance.score_changed(update_fields)
+    instance._played_match = participant_saving(
+        instance, instance._score_changed)
+
+
+@receiver(post_save, sender=MatchParticipant)
+def update_participant_standings(sender, instance, **kwargs):
+    participant_saved(instance, instance._played_match)
+
+
+@receiver(pre_delete, sender=MatchParticipant)
+def withdraw_deleted_participant(sender, instance, origin=None, **kwargs):
+    participant_deleting(instance, origin)
+
+
+@receiver(post_delete, sender=MatchParticipant)
+def update_deleted_participant(sender, instance, origin=None, **kwargs):
+    participant_deleted(instance, origin)
+
+
+@receiver(post_save, sender=Game)
+def render_game_image(sender, instance, **kwargs):
+    schedule_renditions(instance, 'game')
+
+
+@receiver(post_save, sender=Team)
+def render_team_logo(sender, instance, **kwargs):
+    schedule_renditions(instance, 'team')
+
+
+@receiver(post_save, sender=Match)
+def refresh_match_schedule(sender, instance, **kwargs):
+    refresh_later(pk=instance.pk)
+
+
+@receiver([post_save, post_delete], sender=MatchParticipant)
+@receiver([post_save, post_delete], sender=Transmission)
+def refresh_related_match_schedule(sender, instance, **kwargs):
+    refresh_later(pk=instance.match_id)
+
+
+@receiver(post_save, sender=Game)
+@receiver(post_save, sender=Tournament)
+@receiver(post_save, sender=Team)
+@receiver(post_save, sender=CustomUser)
+def refresh_copied_schedule(sender, instance, created, update_fields,
+                            **kwargs):
+    source_saved(instance, created, update_fields)
+
+
+@receiver(post_save, sender=Game)
+@receiver(post_save, sender=Tournament)
+@receiver(post_save, sender=Team)
+@receiver(post_save, sender=CustomUser)
+def update_search_document(sender, instance, created, update_fields,
+                           **kwargs):
+    reindex_later(instance, created, update_fields)
+
+
+@receiver(post_delete, sender=Game)
+@receiver(post_delete, sender=Tournament)
+@receiver(post_delete, sender=Team)
+@receiver(post_delete, sender=CustomUser)
+def remove_search_document(sender, instance, **kwargs):
+    unindex_later(instance)
@@ -0,0 +1,178 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+
+from .models import Match, Standing
+
+
+STAT_FIELDS = (
+    'played', 'wins', 'draws', 'losses', 'points',
+    'score_for', 'score_against', 'score_difference',
+)
+# Ties are broken by the entrant, never by row id: the incremental path
+# and rebuild_standings() create rows in different orders. A tournament
+# ranks either teams or users, so the other column is always NULL.
+RANK_ORDERING = (
+    '-points', '-score_difference', '-score_for', 'team_id', 'user_id',
+)
+
+
+def contributions(participants):
+    """
+    Returns the standings delta of every participant of a played match,
+    keyed by `(team_id, user_id)`. Matches without a score for every
+    participant do not count.
+    """
+    participants = list(participants)
+    if len(participants) < 2 or any(p.score is None for p in participants):
+        return {}
+
+    points = settings.STANDINGS_POINTS
+    best = max(p.score for p in participants)
+    leaders = sum(1 for p in participants if p.score == best)
+    total = sum(p.score for p in participants)
+
+    deltas = {}
+    for participant in participants:
+        against = (total - participant.score) // (len(participants) - 1)
+        if participant.score < best:
+            outcome = 'losses'
+        elif leaders > 1:
+            outcome = 'draws'
+        else:
+            outcome = 'wins'
+        stats = dict.fromkeys(STAT_FIELDS, 0)
+        stats.update({
+            'played': 1,
+            outcome: 1,
+            'points': points[outcome],
+            'score_for': participant.score,
+            'score_against': against,
+            'score_difference': participant.score - against,
+        })
+        deltas[(participant.team_id, participant.user_id)] = stats
+    return deltas
+
+
+def apply_match(match, sign=1):
+    """
+    Adds (sign=1) or removes (sign=-1) the contribution of `match` to the
+    materialized standings of its tournament.
+    """
+    deltas = contributions(match.participants.all())
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        for (team_id, user_id), stats in deltas.items():
+            rows = Standing.objects.filter(
+                tournament_id=match.tournament_id,
+                team_id=team_id, user_id=user_id)
+            updated = rows.update(**{
+                name: F(name) + sign * value
+                for name, value in stats.items()
+            })
+            if not updated and sign > 0:
+                Standing.objects.create(
+                    tournament_id=match.tournament_id,
+                    team_id=team_id, user_id=user_id, **stats)
+        if sign < 0:
+            Standing.objects.filter(
+                tournament_id=match.tournament_id, played__lte=0).delete()
+
+
+def match_saved(match, previous_status):
+    if match.status == 'played' and previous_status != 'played':
+        apply_match(match, 1)
+    elif match.status != 'played' and previous_status == 'played':
+        apply_match(match, -1)
+
+
+def played_match(match_id):
+    return Match.objects.filter(pk=match_id, status='played').first()
+
+
+def participant_saving(participant, score_changed):
+    """
+    Withdraws the contribution of a played match before one of its
+    participants is added or re-scored. Returns the match, whose new
+    contribution participant_saved() adds, or None.
+    """
+    if not score_changed:
+        return None
+    match = played_match(participant.match_id)
+    if match is not None:
+        apply_match(match, -1)
+    return match
+
+
+def participant_saved(participant, match):
+    if match is not None:
+        apply_match(match, 1)
+    participant._loaded_score = participant.score
+
+
+def participant_deleting(participant, origin):
+    """
+    Withdraws the played match of directly deleted participants, once
+    per match and deletion. Deleting the match itself already does.
+    """
+    if getattr(origin, 'model', type(origin)) is not type(participant):
+        return
+    withdrawn = vars(origin).setdefault('_withdrawn_matches', {})
+    if participant.match_id not in withdrawn:
+        match = played_match(participant.match_id)
+        if match is not None:
+            apply_match(match, -1)
+        withdrawn[participant.match_id] = match
+
+
+def participant_deleted(participant, origin):
+    withdrawn = getattr(origin, '_withdrawn_matches', {})
+    match = withdrawn.pop(participant.match_id, None)
+    if match is not None:
+        apply_match(match, 1)
+
+
+def rebuild_standings(tournament):
+    """
+    Recomputes the standings of `tournament` from all of its played
+    matches. Produces the same rows as the incremental path.
+    """
+    matches = Match.objects.filter(
+        tournament=tournament, status='played'
+    ).prefetch_related('participants')
+
+    totals = {}
+    for match in matches:
+        for key, stats in contributions(match.participants.all()).items():
+            row = totals.setdefault(key, dict.fromkeys(STAT_FIELDS, 0))
+            for name, value in stats.items():
+                row[name] += value
+
+    with transaction.atomic():
+        Standing.objects.filter(tournament=tournament).delete()
+        Standing.objects.bulk_create(
+            Standing(tournament=tournament, team_id=team_id,
+                     user_id=user_id, **stats)
+            for (team_id, user_id), stats in totals.items()
+        )
+
+
+def after_standing(standing):
+    """
+    Keyset filter selecting the rows ranked after `standing`.
+    """
+    tied = Q(points=standing['points'],
+             score_difference=standing['score_difference'],
+             score_for=standing['score_for'])
+    return (
+        Q(points__lt=standing['points'])
+        | Q(points=standing['points'],
+            score_difference__lt=standing['score_difference'])
+        | Q(points=standing['points'],
+            score_difference=standing['score_difference'],
+            score_for__lt=standing['score_for'])
+        | tied & Q(team_id__gt=standing['entrant_id'])
+        | tied & Q(user_id__gt=standing['entrant_id'])
+    )
@@ -0,0 +1,9 @@
+'use strict';
+{
+    const $ = django.jQuery;
+
+    // Select2 triggers jQuery change events when a value is picked.
+    $(document).on('change', '.autocomplete-filter select', function() {
+        this.form.submit();
+    });
+}
@@ -0,0 +1,44 @@
+import hashlib
+import os
+import re
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+
+HASH_LENGTH = 12
+HASHED_NAME_RE = re.compile(r'\.([0-9a-f]{%d})(\.[^./]+)?$' % HASH_LENGTH)
+
+
+def content_hash(name):
+    """
+    Returns the content hash embedded in a stored file name, if any.
+    """
+    match = HASHED_NAME_RE.search(name)
+    return match.group(1) if match else None
+
+
+class HashedFileSystemStorage(FileSystemStorage):
+    """
+    Stores every file under a name that embeds a hash of its content,
+    e.g. `games/logo.3f2a9c1d0b7e.png`. Such names never change content,
+    so they can be served as immutable, and identical uploads share one
+    file on disk.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+
+        root, ext = os.path.splitext(name)
+        name = f'{root}.{digest.hexdigest()[:HASH_LENGTH]}{ext}'
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length=max_length)
@@ -0,0 +1,221 @@
+import logging
+import random
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connections, router, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import Task
+
+
+logger = logging.getLogger(__name__)
+
+REGISTRY = {}
+
+
+class TaskFunction:
+    """
+    A function that can run inline or be queued for a worker. Queued
+    calls are stored as Task rows, so they are written in the caller's
+    transaction and survive restarts.
+    """
+
+    def __init__(self, func, name, queue, max_attempts):
+        self.func = func
+        self.name = name
+        self.queue = queue
+        self.max_attempts = max_attempts
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def enqueue(self, args=(), kwargs=None, key=None, delay=0, queue=None):
+        """
+        Queues a call and returns its Task. With an idempotency `key`,
+        nothing is queued (and None is returned) while a call queued
+        under that key is waiting or running; finished tasks release it.
+        """
+        if settings.TASKS_EAGER:
+            self.func(*args, **(kwargs or {}))
+            return None
+
+        queued = Task(
+            queue=queue or self.queue,
+            name=self.name,
+            args=list(args),
+            kwargs=kwargs or {},
+            idempotency_key=key,
+            max_attempts=self.max_attempts or settings.TASK_MAX_ATTEMPTS,
+            run_at=timezone.now() + timedelta(seconds=delay),
+        )
+        if key is None:
+            queued.save()
+            return queued
+        # One INSERT ... ON CONFLICT DO NOTHING, without a savepoint.
+        Task.objects.bulk_create([queued], ignore_conflicts=True)
+        return None
+
+
+def task(queue='default', max_attempts=None, name=None):
+    def decorator(func):
+        registered = TaskFunction(
+            func, name or f'{func.__module__}.{func.__name__}', queue,
+            max_attempts)
+        REGISTRY[registered.name] = registered
+        return registered
+    return decorator
+
+
+def retry_delay(attempt):
+    """
+    Exponential backoff with up to 10% jitter, capped at
+    TASK_RETRY_MAX_DELAY seconds.
+    """
+    delay = min(settings.TASK_RETRY_BACKOFF * 2 ** (attempt - 1),
+                settings.TASK_RETRY_MAX_DELAY)
+    return delay + random.uniform(0, delay / 10)
+
+
+def limited_queues(queues):
+    return {queue: limit
+            for queue, limit in settings.TASK_QUEUE_CONCURRENCY.items()
+            if queues is None or queue in queues}
+
+
+def lock_queues(queues):
+    """
+    Serialises claims on `queues` until the end of the transaction, so
+    the running-task counts cannot race other workers. Uses advisory
+    locks, so limits are only exact on PostgreSQL.
+    """
+    connection = connections[router.db_for_write(Task)]
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        for queue in sorted(queues):
+            cursor.execute('SELECT pg_advisory_xact_lock(hashtext(%s))',
+                           [f'esports:tasks:{queue}'])
+
+
+def saturated_queues(limits):
+    """
+    Queues whose concurrency limit in `limits` is reached by running
+    tasks. Callers hold lock_queues() for them.
+    """
+    running = Task.objects.filter(
+        status='running', queue__in=limits).values('queue').annotate(
+        count=Count('id')).values_list('queue', 'count')
+    return [queue for queue, count in running if count >= limits[queue]]
+
+
+def claim(worker, queues=None):
+    """
+    Locks the next due task for `worker`. Concurrent workers skip rows
+    locked by each other and the final conditional update guarantees a
+    task is only claimed once. Claims on queues with a concurrency limit
+    are serialised so the limit holds across workers and hosts.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        ready = Task.objects.select_for_update(skip_locked=True).filter(
+            status='queued', run_at__lte=now).order_by('run_at', 'id')
+        if queues is not None:
+            ready = ready.filter(queue__in=queues)
+        limits = limited_queues(queues)
+        if limits:
+            lock_queues(limits)
+            full = saturated_queues(limits)
+            if full:
+                ready = ready.exclude(queue__in=full)
+        task = ready.first()
+        if task is None:
+            return None
+
+        task.status = 'running'
+        task.locked_by = worker
+        task.locked_at = now
+        task.attempts += 1
+        claimed = Task.objects.filter(pk=task.pk, status='queued').update(
+            status=task.status, locked_by=worker, locked_at=now,
+            attempts=task.attempts)
+    return task if claimed else None
+
+
+def execute(task):
+    """
+    Runs a claimed task and records its outcome. A failed task is queued
+    again after a backoff until it has used `max_attempts` attempts.
+    Finished tasks release their idempotency key.
+    """
+    registered = REGISTRY.get(task.name)
+    try:
+        if registered is None:
+            raise LookupError(f"Task '{task.name}' is not registered.")
+        registered.func(*task.args, **task.kwargs)
+    except Exception:
+        logger.exception("Task %s (%s) failed", task.pk, task.name)
+        task.last_error = traceback.format_exc()
+        if task.attempts < task.max_attempts:
+            task.status = 'queued'
+            task.run_at = timezone.now() + timedelta(
+                seconds=retry_delay(task.attempts))
+        else:
+            task.status = 'failed'
+            task.finished_at = timezone.now()
+    else:
+        task.status = 'succeeded'
+        task.finished_at = timezone.now()
+
+    if task.finished_at is not None:
+        task.idempotency_key = None
+    task.locked_by = ''
+    task.locked_at = None
+    task.save(update_fields=['status', 'run_at', 'last_error', 'locked_by',
+                             'locked_at', 'finished_at', 'idempotency_key'])
+    return task
+
+
+def requeue_stale():
+    """
+    Queues again the tasks of workers that died mid-task, i.e. running
+    for longer than TASK_VISIBILITY_TIMEOUT seconds. Tasks that have used
+    all of their attempts, e.g. by killing every worker that ran them,
+    fail and release their idempotency key instead.
+    """
+    now = timezone.now()
+    cutoff = now - timedelta(seconds=settings.TASK_VISIBILITY_TIMEOUT)
+    stale = Task.objects.filter(status='running', locked_at__lt=cutoff)
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status='failed', locked_by='', locked_at=None, finished_at=now,
+        idempotency_key=None,
+        last_error="The worker running the task stopped responding.")
+    return failed + stale.update(
+        status='queued', locked_by='', locked_at=None, run_at=now)
+
+
+def work(worker, queues=None, burst=False, stop=None, poll_interval=1.0):
+    """
+    Processes tasks until `stop` is set, or until no task is due when
+    `burst` is true. Returns the number of tasks processed.
+    """
+    processed = 0
+    while stop is None or not stop.is_set():
+        close_old_connections()
+        task = claim(worker, queues)
+        if task is None:
+            requeue_stale()
+            if burst:
+                break
+            if stop is not None:
+                stop.wait(poll_interval)
+            else:
+                time.sleep(poll_interval)
+            continue
+        execute(task)
+        processed += 1
+    close_old_connections()
+    return processed
@@ -0,0 +1,43 @@
+from .cache import bump_game
+from .images import generate_renditions
+from .models import Game, Team, Tournament
+from .standings import rebuild_standings
+from .taskqueue import task
+
+
+RENDITION_TARGETS = {
+    'game': (Game, 'images', 'image_renditions'),
+    'team': (Team, 'logo', 'logo_renditions'),
+}
+
+
+@task(queue='images')
+def render_image(target, pk):
+    model, image_field, renditions_field = RENDITION_TARGETS[target]
+    renditions = generate_renditions(
+        model, pk, image_field, renditions_field)
+    if renditions and model is Game:
+        bump_game(pk)
+
+
+@task(queue='standings')
+def rebuild_tournament_standings(tournament_id):
+    tournament = Tournament.objects.filter(pk=tournament_id).first()
+    if tournament is not None:
+        rebuild_standings(tournament)
+
+
+def schedule_renditions(instance, target):
+    """
+    Queues rendition generation when the stored map does not belong to
+    the current image. The image name is part of the idempotency key,
+    so saving the same image twice queues it once.
+    """
+    _, image_field, renditions_field = RENDITION_TARGETS[target]
+    source = getattr(instance, image_field).name
+    current = getattr(instance, renditions_field) or {}
+    if not source or current.get('source') == source:
+        return None
+    return render_image.enqueue(
+        args=[target, instance.pk],
+        key=f'renditions:{target}:{instance.pk}:{source}')
@@ -0,0 +1,2007 @@
+import asyncio
+import hashlib
+import io
+import json
+import shutil
+import tempfile
+from contextlib import contextmanager
+from datetime import timedelta
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import (
+    DatabaseError, IntegrityError, OperationalError, connection, transaction
+)
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from esports.authentication import (
+    get_admin_game_ids, get_token_version, issue_tokens
+)
+from esports.brackets import generate_bracket
+from esports.cache import get_stats
+from esports.checks import check_shared_cache
+from esports.images import generate_renditions
+from esports.importers import RegistrationImporter, read_rows
+from esports.live import (
+    broadcast_match, hub, match_channel, tournament_channel
+)
+from esports.metrics import registry
+from esports.middleware import ReplicaMiddleware
+from esports.models import (
+    AdminGame, ContactInfo, CustomUser, Game, IndividualInscription, Match,
+    MatchParticipant, MediaContent, RegistrationReview, Standing, Team,
+    TeamPlayer, Tournament, Task, Transmission, Upload
+)
+from esports.pagination import EstimatedCountPaginator
+from esports.querydetector import (
+    RepeatedQueryError, detect_queries, fingerprint
+)
+from esports.reviews import RegistrationReviewer
+from esports.routers import ReplicaChoice, request_replica, reset_health
+from esports import schedule, search
+from esports.serializers import GamePublicSerializer
+from esports.standings import (
+    RANK_ORDERING, STAT_FIELDS, rebuild_standings
+)
+from esports.storage import content_hash
+from esports.taskqueue import claim, task, work
+from esports.uploads import OffsetMismatch, append_chunk
+
+
+MEDIA_ROOT = tempfile.mkdtemp()
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+def png_file(name='image.png'):
+    buffer = io.BytesIO()
+    Image.new('RGB', (1, 1)).save(buffer, format='PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/png')
+
+
+def pdf_file(name='bases.pdf'):
+    return SimpleUploadedFile(name, b'%PDF-1.4\n', 'application/pdf')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, PASSWORD_HASHERS=FAST_HASHERS,
+                   QUERY_DETECTOR_MODE='raise')
+class QueryBudgetTests(TestCase):
+    """
+    Asserts the exact number of queries issued by every route in
+    esports/urls.py with `rows` games, tournaments and admins seeded.
+    """
+    rows = 1
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.superadmin = CustomUser.objects.create_user(
+            username='budget-superadmin', password='Sup3r-secret',
+            role='superadmin')
+        cls.admin = CustomUser.objects.create_user(
+            username='budget-admin', password='Adm1n-secret', role='admin')
+
+        games = Game.objects.bulk_create(
+            Game(name=f'Game {i}', description='-', type_of_game='team',
+                 bases='bases/game.pdf', images='games/game.png')
+            for i in range(cls.rows)
+        )
+        now = timezone.now()
+        tournaments = Tournament.objects.bulk_create(
+            Tournament(game=game, name=f'Cup {game.pk}', start_date=now)
+            for game in games
+        )
+        Match.objects.bulk_create(
+            Match(tournament=tournament, date=now + timedelta(days=1),
+                  round='Final')
+            for tournament in tournaments
+        )
+        # Bulk inserts send no signals; build the schedule and search
+        # rows read by the public routes.
+        schedule.refresh(Match.objects.all())
+        search.index([*games, *tournaments])
+        admins = CustomUser.objects.bulk_create(
+            CustomUser(username=f'admin-{i}', role='admin', password='!')
+            for i in range(cls.rows)
+        )
+        AdminGame.objects.bulk_create(
+            AdminGame(admin=admin, game=game)
+            for admin, game in zip(admins, games)
+        )
+        cls.game = games[0]
+        AdminGame.objects.create(admin=cls.admin, game=cls.game)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def authenticate(self, user):
+        # Token versions and game assignments are cached; warm the
+        # entries that setUp cleared so budgets reflect the steady state.
+        get_token_version(user.pk)
+        get_admin_game_ids(user.pk)
+        token = issue_tokens(user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    @contextmanager
+    def assertQueryBudget(self, expected):
+        # assertNumQueries caps its log at 9000 entries, so count through
+        # an execute wrapper to keep the 10k-row cases exact.
+        executed = []
+
+        def counter(execute, sql, params, many, context):
+            executed.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(counter):
+            yield
+        self.assertEqual(
+            len(executed), expected,
+            f"{len(executed)} queries executed, {expected} expected")
+
+    def test_games_list(self):
+        with self.assertQueryBudget(2):
+            response = self.client.get(reverse('games-list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), min(self.rows, 20))
+
+    def test_games_list_next_page(self):
+        first = self.client.get(reverse('games-list'))
+        if first.data['next'] is None:
+            return
+        with self.assertQueryBudget(2):
+            response = self.client.get(first.data['next'])
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(
+            response.data['results'][0]['id'],
+            first.data['results'][-1]['id'])
+
+    def test_games_list_sparse_fields(self):
+        with self.assertQueryBudget(1):
+            response = self.client.get(
+                reverse('games-list'), {'fields': 'id,name'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data['results'][0]), {'id', 'name'})
+
+    def test_games_retrieve(self):
+        url = reverse('games-detail', args=[self.game.pk])
+        with self.assertQueryBudget(2):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_games_cache_stats(self):
+        self.authenticate(self.superadmin)
+        with self.assertQueryBudget(0):
+            response = self.client.get(reverse('games-cache-stats'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_public_games_list(self):
+        with self.assertQueryBudget(2):
+            response = self.client.get(reverse('public-games-list'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_public_games_detail(self):
+        url = reverse('public-games-detail', args=[self.game.pk])
+        with self.assertQueryBudget(2):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_public_schedule(self):
+        with self.assertQueryBudget(1):
+            response = self.client.get(reverse('public-schedule'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']),
+                         min(self.rows, settings.SCHEDULE_FEED_SIZE))
+
+    def test_public_schedule_ical(self):
+        with self.assertQueryBudget(1):
+            response = self.client.get(
+                reverse('public-schedule-ical'), {'game': self.game.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content.count(b'BEGIN:VEVENT'), 1)
+
+    def test_search_list(self):
+        with self.assertQueryBudget(1):
+            response = self.client.get(reverse('search-list'), {'q': 'cup'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), min(self.rows, 20))
+
+    def test_games_create(self):
+        self.authenticate(self.superadmin)
+        data = {'name': 'New game', 'description': '-',
+                'type_of_game': 'individual', 'images': png_file(),
+                'bases': pdf_file()}
+        with self.assertQueryBudget(5):
+            response = self.client.post(
+                reverse('games-list'), data, format='multipart')
+        self.assertEqual(response.status_code, 201)
+
+    def test_games_update(self):
+        self.authenticate(self.superadmin)
+        url = reverse('games-detail', args=[self.game.pk])
+        data = {'name': 'Renamed', 'description': '-',
+                'type_of_game': 'team', 'images': png_file(),
+                'bases': pdf_file()}
+        with self.assertQueryBudget(6):
+            response = self.client.put(url, data, format='multipart')
+        self.assertEqual(response.status_code, 200)
+
+    def test_games_partial_update(self):
+        self.authenticate(self.admin)
+        url = reverse('games-detail', args=[self.game.pk])
+        with self.assertQueryBudget(4):
+            response = self.client.patch(url, {'description': 'Updated'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_games_destroy(self):
+        self.authenticate(self.superadmin)
+        url = reverse('games-detail', args=[self.game.pk])
+        # Includes cascading to the tournament's match and its children.
+        with self.assertQueryBudget(14):
+            response = self.client.delete(url)
+        self.assertEqual(response.status_code, 204)
+
+    def test_games_activate(self):
+        self.authenticate(self.superadmin)
+        url = reverse('games-activate', args=[self.game.pk])
+        with self.assertQueryBudget(3):
+            response = self.client.post(url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_games_deactivate(self):
+        self.authenticate(self.superadmin)
+        url = reverse('games-deactivate', args=[self.game.pk])
+        with self.assertQueryBudget(3):
+            response = self.client.post(url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_registrations_import(self):
+        solo = Game.objects.create(
+            name='Solo', description='-', type_of_game='individual',
+            bases='bases/solo.pdf', images='games/solo.png')
+        AdminGame.objects.create(admin=self.admin, game=solo)
+        self.authenticate(self.admin)
+        rows = [
+            {'kind': 'team', 'name': 'Budget team', 'captain': 'admin-0',
+             'game': self.game.name, 'logo': 'logos/team.png',
+             'voucher': 'vouchers/team.pdf', 'players': 'budget-admin'},
+            {'kind': 'individual', 'user': 'budget-admin', 'game': 'Solo',
+             'voucher': 'vouchers/solo.pdf'},
+        ]
+        upload = SimpleUploadedFile(
+            'rows.jsonl', '\n'.join(json.dumps(row) for row in rows).encode())
+        with self.assertQueryBudget(9):
+            response = self.client.post(
+                reverse('registrations-import'), {'file': upload},
+                format='multipart')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['errors'], [])
+
+    def test_tournaments_standings(self):
+        tournament = Tournament.objects.filter(game=self.game).get()
+        url = reverse('tournaments-standings', args=[tournament.pk])
+        with self.assertQueryBudget(2):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_uploads_create(self):
+        self.authenticate(self.superadmin)
+        data = {'target': 'game_bases', 'object_id': self.game.pk,
+                'filename': 'bases.pdf', 'size': 4,
+                'checksum': hashlib.sha256(b'%PDF').hexdigest()}
+        with self.assertQueryBudget(2):
+            response = self.client.post(reverse('uploads-list'), data)
+        self.assertEqual(response.status_code, 201)
+
+    def test_uploads_retrieve(self):
+        self.authenticate(self.superadmin)
+        upload = Upload.objects.create(
+            owner=self.superadmin, target='game_bases',
+            object_id=self.game.pk, filename='bases.pdf', size=4,
+            checksum='0' * 64)
+        url = reverse('uploads-detail', args=[upload.pk])
+        with self.assertQueryBudget(1):
+            response = self.client.get(url)
+        self.assertEqual(response['Upload-Offset'], '0')
+
+    def test_admin_login(self):
+        data = {'username': 'budget-admin', 'password': 'Adm1n-secret'}
+        with self.assertQueryBudget(1):
+            response = self.client.post(reverse('admin-login'), data)
+        self.assertEqual(response.status_code, 200)
+
+    def test_admin_change_password(self):
+        self.authenticate(self.admin)
+        data = {'old_password': 'Adm1n-secret',
+                'new_password': 'N3w-long-secret'}
+        with self.assertQueryBudget(2):
+            response = self.client.post(
+                reverse('admin-change-password'), data)
+        self.assertEqual(response.status_code, 200)
+
+    def test_admin_reset_password(self):
+        self.authenticate(self.superadmin)
+        url = reverse('admin-reset-password', args=[self.admin.pk])
+        with self.assertQueryBudget(2):
+            response = self.client.post(
+                url, {'new_password': 'N3w-long-secret'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_admin_list(self):
+        self.authenticate(self.superadmin)
+        with self.assertQueryBudget(3):
+            response = self.client.get(reverse('admin-list'))
+        self.assertEqual(response.status_code, 200)
+        games = {row['username']: row['games'] for row in response.data}
+        self.assertEqual(games['admin-0'], [
+            {'id': self.game.pk, 'name': self.game.name}])
+        self.assertEqual(len(games['budget-superadmin']), self.rows)
+
+    def test_admin_create(self):
+        self.authenticate(self.superadmin)
+        data = {'username': 'new-admin', 'password': 'Adm1n-secret',
+                'role': 'admin'}
+        with self.assertQueryBudget(3):
+            response = self.client.post(reverse('admin-list'), data)
+        self.assertEqual(response.status_code, 201)
+
+    def test_admin_destroy(self):
+        self.authenticate(self.superadmin)
+        url = reverse('admin-detail', args=[self.admin.pk])
+        # Includes deleting the admin's game assignment.
+        with self.assertQueryBudget(13):
+            response = self.client.delete(url)
+        self.assertEqual(response.status_code, 204)
+
+
+class QueryBudgetHundredRowsTests(QueryBudgetTests):
+    rows = 100
+
+
+class QueryBudgetTenThousandRowsTests(QueryBudgetTests):
+    rows = 10_000
+
+
+class GameResponseCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.game = Game.objects.create(
+            name='Cached', description='-', type_of_game='team',
+            bases='bases/game.pdf', images='games/game.png')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.url = reverse('games-detail', args=[self.game.pk])
+
+    def test_second_read_is_served_from_cache(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data['name'], 'Cached')
+        self.assertEqual(get_stats()['hits'], 1)
+
+    def test_matching_etag_returns_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_tournament_save_invalidates_game_and_list(self):
+        list_etag = self.client.get(reverse('games-list'))['ETag']
+        game_etag = self.client.get(self.url)['ETag']
+        Tournament.objects.create(
+            game=self.game, name='Cup', start_date=timezone.now())
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=game_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['tournaments']), 1)
+        response = self.client.get(
+            reverse('games-list'), HTTP_IF_NONE_MATCH=list_etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_deploy_check_requires_a_shared_cache(self):
+        self.assertEqual(
+            [error.id for error in check_shared_cache(None)],
+            ['esports.W001'])
+        shared = {'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': 'redis://localhost:6379/0'}}
+        with override_settings(CACHES=shared):
+            self.assertEqual(check_shared_cache(None), [])
+
+
+class AsyncCatalogTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.games = Game.objects.bulk_create(
+            Game(name=f'Async {i}', description='-', type_of_game='team',
+                 bases='bases/game.pdf', images='games/game.png')
+            for i in range(5)
+        )
+        Tournament.objects.create(
+            game=cls.games[0], name='Cup', start_date=timezone.now())
+
+    def setUp(self):
+        cache.clear()
+
+    async def test_pages_match_the_sync_catalog(self):
+        sync_url = reverse('games-list') + '?page_size=2'
+        async_url = reverse('public-games-list') + '?page_size=2'
+        sync_pages, async_pages = [], []
+        while sync_url:
+            data = (await self.async_client.get(sync_url)).json()
+            sync_pages.append(data['results'])
+            sync_url = data['next']
+        while async_url:
+            data = (await self.async_client.get(async_url)).json()
+            async_pages.append(data['results'])
+            async_url = data['next']
+
+        self.assertEqual(async_pages, sync_pages)
+        self.assertEqual(len(async_pages), 3)
+
+    async def test_previous_link_walks_back(self):
+        url = reverse('public-games-list') + '?page_size=2'
+        first = (await self.async_client.get(url)).json()
+        second = (await self.async_client.get(first['next'])).json()
+        back = (await self.async_client.get(second['previous'])).json()
+        self.assertEqual(back['results'], first['results'])
+        self.assertIsNone(first['previous'])
+
+    async def test_detail_is_cached_with_etag(self):
+        url = reverse('public-games-detail', args=[self.games[0].pk])
+        response = await self.async_client.get(url)
+        self.assertEqual(response.json()['tournaments'][0]['name'], 'Cup')
+
+        response = await self.async_client.get(
+            url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    async def test_missing_game_is_not_found(self):
+        url = reverse('public-games-detail', args=[0])
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(METRICS_ALLOWED_IPS=['127.0.0.1'])
+class PerformanceMiddlewareTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.game = Game.objects.create(
+            name='Measured', description='-', type_of_game='team',
+            bases='bases/game.pdf', images='games/game.png')
+
+    def setUp(self):
+        cache.clear()
+        registry.clear()
+        self.url = reverse('games-detail', args=[self.game.pk])
+
+    def test_server_timing_reports_queries_and_rendering(self):
+        response = self.client.get(self.url)
+        timing = response['Server-Timing']
+        self.assertIn('desc="2 queries"', timing)
+        self.assertRegex(timing, r'serialize;dur=\d+\.\d+, total;dur=')
+
+    async def test_async_view_queries_are_counted(self):
+        response = await self.async_client.get(
+            reverse('public-games-detail', args=[self.game.pk]))
+        self.assertIn('desc="2 queries"', response['Server-Timing'])
+
+    def test_metrics_are_exposed_per_route(self):
+        self.client.get(self.url)
+        self.client.get(self.url)
+        body = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn(
+            'esports_request_duration_seconds_count{route="games-detail"} 2',
+            body)
+        self.assertIn('esports_db_queries_total{route="games-detail"} 2',
+                      body)
+        self.assertIn(
+            'esports_request_duration_seconds_bucket'
+            '{route="games-detail",le="+Inf"} 2', body)
+
+    @override_settings(REQUEST_QUERY_BUDGET=1)
+    def test_requests_over_the_query_budget_are_flagged(self):
+        with self.assertLogs('esports.metrics', 'WARNING') as logs:
+            self.client.get(self.url)
+        self.assertIn('games-detail executed 2 queries', logs.output[0])
+        body = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn(
+            'esports_query_budget_exceeded_total{route="games-detail"} 1',
+            body)
+
+    def test_new_database_connections_are_counted(self):
+        connection_created.send(sender=type(connection), connection=connection)
+        body = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn(
+            'esports_db_connections_opened_total{alias="default"} 1', body)
+
+    def test_metrics_are_restricted_to_allowed_addresses(self):
+        response = self.client.get(reverse('metrics'), REMOTE_ADDR='10.0.0.9')
+        self.assertEqual(response.status_code, 403)
+        with override_settings(METRICS_ALLOWED_IPS=[]):
+            response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 403)
+
+
+@override_settings(DATABASE_REPLICAS=['replica_a', 'replica_b'])
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        reset_health()
+        self.factory = RequestFactory()
+        self.middleware = ReplicaMiddleware(
+            lambda request: HttpResponse(Game.objects.all().db))
+        patcher = mock.patch('esports.routers.replica_lag', return_value=0)
+        self.replica_lag = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def read_alias(self, request):
+        return self.middleware(request).content.decode()
+
+    def test_safe_requests_read_from_a_replica(self):
+        alias = self.read_alias(self.factory.get('/api/games/'))
+        self.assertIn(alias, ['replica_a', 'replica_b'])
+
+    def test_one_replica_serves_every_read_of_a_request(self):
+        middleware = ReplicaMiddleware(lambda request: HttpResponse(
+            ','.join({Game.objects.all().db for _ in range(10)})))
+        for _ in range(5):
+            aliases = middleware(self.factory.get('/api/games/')).content
+            self.assertIn(aliases.decode(), ['replica_a', 'replica_b'])
+
+    def test_writes_and_the_admin_stay_on_the_primary(self):
+        self.assertEqual(
+            self.read_alias(self.factory.post('/api/games/')), 'default')
+        self.assertEqual(
+            self.read_alias(self.factory.get('/admin/esports/game/')),
+            'default')
+
+    def test_writer_reads_its_own_writes_from_the_primary(self):
+        response = self.middleware(self.factory.post('/api/games/'))
+        primary_until = response['X-Primary-Until']
+        self.assertEqual(
+            response.cookies['primary_until'].value, primary_until)
+
+        request = self.factory.get(
+            '/api/games/', headers={'X-Primary-Until': primary_until})
+        self.assertEqual(self.read_alias(request), 'default')
+        request = self.factory.get('/api/games/')
+        request.COOKIES['primary_until'] = primary_until
+        self.assertEqual(self.read_alias(request), 'default')
+
+        request = self.factory.get(
+            '/api/games/', headers={'X-Primary-Until': '1'})
+        self.assertNotEqual(self.read_alias(request), 'default')
+
+    def test_lagging_or_unreachable_replicas_are_skipped(self):
+        self.replica_lag.side_effect = lambda alias: {
+            'replica_a': 30, 'replica_b': 0}[alias]
+        request = self.factory.get('/api/games/')
+        self.assertEqual(self.read_alias(request), 'replica_b')
+
+        reset_health()
+        self.replica_lag.side_effect = OperationalError
+        self.assertEqual(self.read_alias(request), 'default')
+
+    @override_settings(DATABASE_REPLICAS=['lagging'])
+    def test_cache_fills_read_from_the_primary(self):
+        # 'lagging' is within REPLICA_MAX_LAG but has no connection here,
+        # so a cache fill reading from it raises instead of storing rows
+        # older than the version they are cached under.
+        self.replica_lag.return_value = 1
+        cache.clear()
+        admin = CustomUser.objects.create_user(
+            username='replica-admin', role='admin')
+        game = Game.objects.create(
+            name='Fresh', description='-', type_of_game='team',
+            bases='bases/game.pdf', images='games/game.png')
+        AdminGame.objects.create(admin=admin, game=game)
+
+        token = request_replica.set(ReplicaChoice())
+        try:
+            self.assertEqual(Game.objects.all().db, 'lagging')
+            self.assertEqual(get_admin_game_ids(admin.pk), {game.pk})
+            self.assertEqual(get_token_version(admin.pk), 0)
+        finally:
+            request_replica.reset(token)
+
+        response = APIClient().get(reverse('games-list'))
+        self.assertEqual(response.data['results'][0]['name'], 'Fresh')
+        response = self.client.get(
+            reverse('public-games-detail', args=[game.pk]))
+        self.assertEqual(response.json()['name'], 'Fresh')
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class TokenAuthenticationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.superadmin = CustomUser.objects.create_user(
+            username='auth-superadmin', password='Sup3r-secret',
+            role='superadmin')
+        cls.admin = CustomUser.objects.create_user(
+            username='auth-admin', password='Adm1n-secret', role='admin')
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def authenticate(self, user):
+        token = issue_tokens(user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_permission_check_skips_user_lookup(self):
+        self.authenticate(self.superadmin)
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('games-cache-stats'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_password_reset_revokes_issued_tokens(self):
+        admin_token = issue_tokens(self.admin).access_token
+        self.authenticate(self.superadmin)
+        url = reverse('admin-reset-password', args=[self.admin.pk])
+        self.client.post(url, {'new_password': 'N3w-long-secret'})
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {admin_token}')
+        response = self.client.post(reverse('admin-change-password'), {
+            'old_password': 'N3w-long-secret',
+            'new_password': 'An0ther-long-secret'})
+        self.assertEqual(response.status_code, 401)
+
+    def test_deactivating_or_demoting_revokes_tokens(self):
+        for field, value in [('is_active', False), ('role', 'player')]:
+            user = CustomUser.objects.create_user(
+                username=f'revoked-{field}', role='superadmin')
+            self.authenticate(user)
+            user = CustomUser.objects.get(pk=user.pk)
+            setattr(user, field, value)
+            user.save(update_fields=[field])
+            response = self.client.get(reverse('games-cache-stats'))
+            self.assertEqual(response.status_code, 401)
+
+    def test_deleted_admin_tokens_are_rejected(self):
+        self.authenticate(self.admin)
+        self.admin.delete()
+        cache.clear()
+        response = self.client.get(reverse('games-cache-stats'))
+        self.assertEqual(response.status_code, 401)
+
+
+class GameScopeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.superadmin = CustomUser.objects.create_user(
+            username='scope-superadmin', role='superadmin')
+        cls.admin = CustomUser.objects.create_user(
+            username='scope-admin', role='admin')
+        cls.other = CustomUser.objects.create_user(
+            username='scope-other', role='admin')
+        cls.games = Game.objects.bulk_create(
+            Game(name=f'Scoped {i}', description='-', type_of_game='team',
+                 bases='bases/s.pdf', images='games/s.png')
+            for i in range(2))
+        AdminGame.objects.create(admin=cls.admin, game=cls.games[0])
+        cls.teams = Team.objects.bulk_create(
+            Team(name=f'Scoped team {i}', logo='logos/s.png', game=game,
+                 captain=cls.other, voucher='vouchers/s.pdf')
+            for i, game in enumerate(cls.games))
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def authenticate(self, user):
+        token = issue_tokens(user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def patch(self, game):
+        url = reverse('games-detail', args=[game.pk])
+        return self.client.patch(url, {'description': 'Scoped'})
+
+    def test_admins_only_update_their_games(self):
+        self.authenticate(self.admin)
+        self.assertEqual(self.patch(self.games[0]).status_code, 200)
+        self.assertEqual(self.patch(self.games[1]).status_code, 403)
+
+        self.authenticate(self.superadmin)
+        self.assertEqual(self.patch(self.games[1]).status_code, 200)
+
+    def test_assignments_are_cached_and_invalidated(self):
+        self.assertEqual(get_admin_game_ids(self.admin.pk),
+                         {self.games[0].pk})
+        with self.assertNumQueries(0):
+            get_admin_game_ids(self.admin.pk)
+
+        assignment = AdminGame.objects.create(
+            admin=self.admin, game=self.games[1])
+        self.assertEqual(get_admin_game_ids(self.admin.pk),
+                         {game.pk for game in self.games})
+
+        self.assertEqual(get_admin_game_ids(self.other.pk), set())
+        assignment.admin = self.other
+        assignment.save()
+        self.assertEqual(get_admin_game_ids(self.admin.pk),
+                         {self.games[0].pk})
+        self.assertEqual(get_admin_game_ids(self.other.pk),
+                         {self.games[1].pk})
+
+        assignment.delete()
+        self.assertEqual(get_admin_game_ids(self.other.pk), set())
+
+    def test_import_and_review_are_scoped(self):
+        importer = RegistrationImporter(game_ids={self.games[0].pk})
+        report = importer.run([(1, {
+            'kind': 'team', 'name': 'Outside', 'captain': 'scope-other',
+            'game': 'Scoped 1', 'logo': 'logos/s.png',
+            'voucher': 'vouchers/s.pdf'}, None)])
+        self.assertEqual(report.as_dict()['errors'], [
+            {'line': 1, 'error': "You do not manage game 'Scoped 1'."}])
+
+        reviewer = RegistrationReviewer(self.admin.pk, {self.games[0].pk})
+        report = reviewer.run(
+            [('team', team.pk, 'rejected') for team in self.teams])
+        self.assertEqual([row['result'] for row in report.results],
+                         ['updated', 'error'])
+
+    def test_uploads_are_scoped(self):
+        self.authenticate(self.admin)
+        data = {'target': 'game_bases', 'filename': 'bases.pdf',
+                'size': 4, 'checksum': hashlib.sha256(b'%PDF').hexdigest()}
+        response = self.client.post(
+            reverse('uploads-list'), {**data, 'object_id': self.games[1].pk})
+        self.assertEqual(response.status_code, 403)
+        response = self.client.post(
+            reverse('uploads-list'), {**data, 'object_id': self.games[0].pk})
+        self.assertEqual(response.status_code, 201)
+
+    def test_admin_querysets_are_scoped(self):
+        request = RequestFactory().get('/')
+        request.user = CustomUser.objects.get(pk=self.admin.pk)
+        for model, expected in [(Game, [self.games[0].pk]),
+                                (Team, [self.teams[0].pk])]:
+            queryset = admin.site._registry[model].get_queryset(request)
+            self.assertEqual(
+                list(queryset.values_list('pk', flat=True)), expected)
+
+        request.user = CustomUser.objects.get(pk=self.superadmin.pk)
+        queryset = admin.site._registry[Team].get_queryset(request)
+        self.assertEqual(queryset.count(), 2)
+
+
+class LoginHardeningTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    @override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+    def test_username_is_throttled_before_hashing(self):
+        data = {'username': 'nobody', 'password': 'wrong-password'}
+        for _ in range(5):
+            response = self.client.post(reverse('admin-login'), data)
+            self.assertEqual(response.status_code, 401)
+        with self.assertNumQueries(0):
+            response = self.client.post(reverse('admin-login'), data)
+        self.assertEqual(response.status_code, 429)
+
+    @override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+    def test_forwarded_for_does_not_reset_ip_limit(self):
+        statuses = [
+            self.client.post(reverse('admin-login'), {
+                'username': f'user-{index}', 'password': 'wrong-password',
+            }, HTTP_X_FORWARDED_FOR=f'10.0.0.{index}').status_code
+            for index in range(21)
+        ]
+        self.assertEqual(statuses[:20], [401] * 20)
+        self.assertEqual(statuses[20], 429)
+
+    def test_non_object_body_is_rejected(self):
+        response = self.client.post(
+            reverse('admin-login'), [], format='json')
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(PASSWORD_HASHERS=[
+        'esports.hashers.TunedScryptPasswordHasher',
+        'django.contrib.auth.hashers.MD5PasswordHasher',
+    ])
+    def test_login_rehashes_with_selected_profile(self):
+        user = CustomUser.objects.create(
+            username='legacy-admin', role='admin',
+            password=make_password('Adm1n-secret', hasher='md5'))
+        response = self.client.post(reverse('admin-login'), {
+            'username': 'legacy-admin', 'password': 'Adm1n-secret'})
+        self.assertEqual(response.status_code, 200)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('scrypt$'))
+
+
+class RegistrationImporterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.captain = CustomUser.objects.create(
+            username='captain', role='captain')
+        cls.player = CustomUser.objects.create(username='player')
+        cls.team_game = Game.objects.create(
+            name='Teams', description='-', type_of_game='team',
+            bases='bases/teams.pdf', images='games/teams.png')
+        cls.solo_game = Game.objects.create(
+            name='Solo', description='-', type_of_game='individual',
+            bases='bases/solo.pdf', images='games/solo.png')
+        IndividualInscription.objects.create(
+            user=cls.player, game=cls.solo_game, voucher='vouchers/a.pdf',
+            registration_status='confirmed')
+
+    def team_row(self, name, status='confirmed'):
+        return (1, {'kind': 'team', 'name': name, 'captain': 'captain',
+                    'game': 'Teams', 'logo': 'logos/a.png',
+                    'voucher': 'vouchers/a.pdf', 'players': 'player',
+                    'registration_status': status}, None)
+
+    def test_confirmed_registrations_are_unique_per_game(self):
+        rows = [
+            self.team_row('First'),
+            self.team_row('Second'),
+            self.team_row('Pending', status='pending'),
+            (4, {'kind': 'individual', 'user': 'player', 'game': 'Solo',
+                 'voucher': 'vouchers/b.pdf',
+                 'registration_status': 'confirmed'}, None),
+        ]
+        report = RegistrationImporter(chunk_size=2).run(rows)
+
+        self.assertEqual(report.created['teams'], 2)
+        self.assertEqual(report.created['team_players'], 2)
+        self.assertEqual(report.created['individual_inscriptions'], 0)
+        self.assertEqual(len(report.errors), 2)
+        self.assertEqual(
+            list(Team.objects.values_list('name', flat=True).order_by('id')),
+            ['First', 'Pending'])
+
+    def test_database_rejects_duplicate_confirmed_inscription(self):
+        with self.assertRaises(IntegrityError):
+            IndividualInscription.objects.create(
+                user=self.player, game=self.solo_game,
+                voucher='vouchers/b.pdf', registration_status='confirmed')
+
+    def test_invalid_rows_do_not_abort_the_batch(self):
+        rows = [
+            (1, None, 'Invalid JSON'),
+            (2, {'kind': 'team', 'name': 'No game', 'captain': 'captain',
+                 'game': 'Missing', 'logo': 'l.png', 'voucher': 'v.pdf'},
+             None),
+            (3, {'kind': 'individual', 'user': 'captain', 'game': 'Solo',
+                 'voucher': 'vouchers/c.pdf'}, None),
+        ]
+        report = RegistrationImporter().run(rows)
+
+        self.assertEqual([error['line'] for error in report.errors], [1, 2])
+        self.assertEqual(report.created['individual_inscriptions'], 1)
+
+    def test_byte_order_mark_and_invalid_bytes(self):
+        csv_data = (
+            '\ufeffkind,user,game,voucher\r\n'.encode()
+            + b'individual,\xff,Solo,vouchers/c.pdf\r\n'
+            + b'individual,captain,Solo,vouchers/c.pdf\r\n')
+        report = RegistrationImporter().run(
+            read_rows(io.BytesIO(csv_data), 'csv'))
+        self.assertEqual(report.errors, [
+            {'line': 2, 'error': "Line is not valid UTF-8."}])
+        self.assertEqual(report.created['individual_inscriptions'], 1)
+
+        jsonl_data = b'{"kind": "\xc3"}\n[]\n'
+        self.assertEqual(list(read_rows(io.BytesIO(jsonl_data), 'jsonl')), [
+            (1, None, "Line is not valid UTF-8."),
+            (2, None, "Each line must be a JSON object."),
+        ])
+
+    def test_over_long_values_fail_their_row_only(self):
+        rows = [self.team_row('x' * 101), self.team_row('Short')]
+        report = RegistrationImporter().run(rows)
+
+        self.assertEqual(report.errors, [
+            {'line': 1, 'error': "'name' must be at most 100 characters."}])
+        self.assertEqual(report.created['teams'], 1)
+
+    def test_failed_chunk_releases_its_confirmed_owners(self):
+        write = RegistrationImporter.write
+        failures = [DatabaseError('boom')]
+
+        def flaky_write(importer, teams, inscriptions):
+            if failures:
+                raise failures.pop()
+            write(importer, teams, inscriptions)
+
+        rows = [self.team_row('Lost'), self.team_row('Retried')]
+        with mock.patch.object(RegistrationImporter, 'write', flaky_write):
+            report = RegistrationImporter(chunk_size=1).run(rows)
+
+        self.assertEqual(len(report.errors), 1)
+        self.assertEqual(
+            list(Team.objects.values_list('name', flat=True)), ['Retried'])
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class RegistrationReviewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_superuser(
+            username='reviewer', password='R3view-secret', role='admin')
+        cls.captains = CustomUser.objects.bulk_create(
+            CustomUser(username=f'review-captain-{i}', role='captain')
+            for i in range(2))
+        cls.game = Game.objects.create(
+            name='Reviewed', description='-', type_of_game='team',
+            bases='bases/r.pdf', images='games/r.png')
+        cls.solo = Game.objects.create(
+            name='Reviewed solo', description='-',
+            type_of_game='individual', bases='bases/r.pdf',
+            images='games/r.png')
+        statuses = ['pending', 'pending', 'confirmed', 'pending']
+        owners = [0, 0, 1, 1]
+        cls.teams = Team.objects.bulk_create(
+            Team(name=f'Team {i}', logo='logos/r.png', game=cls.game,
+                 captain=cls.captains[owner], voucher='vouchers/r.pdf',
+                 registration_status=status)
+            for i, (owner, status) in enumerate(zip(owners, statuses)))
+        cls.inscription = IndividualInscription.objects.create(
+            user=cls.captains[0], game=cls.solo, voucher='vouchers/r.pdf')
+        AdminGame.objects.create(admin=cls.admin, game=cls.game)
+
+    def status(self, team):
+        team.refresh_from_db()
+        return team.registration_status
+
+    def test_report_and_one_confirmed_per_captain(self):
+        first, second, confirmed, blocked = self.teams
+        decisions = [
+            ('team', first.pk, 'confirmed'),
+            ('team', second.pk, 'confirmed'),
+            ('team', blocked.pk, 'confirmed'),
+            ('team', confirmed.pk, 'confirmed'),
+            ('team', first.pk, 'rejected'),
+            ('team', 0, 'rejected'),
+            ('inscription', self.inscription.pk, 'confirmed'),
+        ]
+        report = RegistrationReviewer(self.admin.pk).run(decisions)
+
+        self.assertEqual(
+            [row['result'] for row in report.results],
+            ['updated', 'error', 'error', 'unchanged', 'error', 'error',
+             'updated'])
+        self.assertEqual(report.results[1]['error'],
+                         "This captain is already registered for this game.")
+        self.assertEqual(report.results[5]['error'], "Team not found.")
+        self.assertEqual(report.counts,
+                         {'updated': 2, 'unchanged': 1, 'errors': 4})
+        self.assertEqual(
+            [self.status(team) for team in self.teams],
+            ['confirmed', 'pending', 'confirmed', 'pending'])
+
+        audit = RegistrationReview.objects.order_by('kind')
+        self.assertEqual(
+            list(audit.values_list('kind', 'previous_status', 'status')),
+            [('inscription', 'pending', 'confirmed'),
+             ('team', 'pending', 'confirmed')])
+        self.assertEqual({review.reviewer_id for review in audit},
+                         {self.admin.pk})
+
+    def test_confirmation_can_move_within_a_batch(self):
+        _, _, confirmed, blocked = self.teams
+        report = RegistrationReviewer().run([
+            ('team', blocked.pk, 'confirmed'),
+            ('team', confirmed.pk, 'rejected'),
+        ])
+        self.assertEqual(report.counts['updated'], 2)
+        self.assertEqual(self.status(blocked), 'confirmed')
+        self.assertEqual(self.status(confirmed), 'rejected')
+
+    def test_queries_do_not_grow_with_the_batch(self):
+        def count(size):
+            teams = Team.objects.bulk_create(
+                Team(name=f'Bulk {i}', logo='logos/r.png', game=self.game,
+                     captain=self.captains[0], voucher='vouchers/r.pdf')
+                for i in range(size))
+            with CaptureQueriesContext(connection) as queries:
+                RegistrationReviewer().run(
+                    [('team', team.pk, 'rejected') for team in teams])
+            return len(queries)
+
+        self.assertEqual(count(3), count(100))
+
+    def test_review_api(self):
+        client = APIClient()
+        url = reverse('registrations-review')
+        decisions = {'decisions': [
+            {'type': 'team', 'id': self.teams[0].pk, 'status': 'confirmed'}]}
+        self.assertEqual(
+            client.post(url, decisions, format='json').status_code, 401)
+
+        token = issue_tokens(self.admin).access_token
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        response = client.post(url, decisions, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['updated'], 1)
+        self.assertEqual(
+            client.post(url, {'decisions': []}, format='json').status_code,
+            400)
+
+    def test_admin_action(self):
+        self.client.force_login(self.admin)
+        response = self.client.post(
+            reverse('admin:esports_team_changelist'), {
+                'action': 'reject_registrations',
+                '_selected_action': [team.pk for team in self.teams],
+            })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            set(Team.objects.values_list('registration_status', flat=True)),
+            {'rejected'})
+        self.assertEqual(RegistrationReview.objects.count(), 4)
+
+
+class BracketGenerationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        game = Game.objects.create(
+            name='Bracket', description='-', type_of_game='team',
+            bases='bases/b.pdf', images='games/b.png')
+        captains = CustomUser.objects.bulk_create(
+            CustomUser(username=f'captain-{i}', role='captain')
+            for i in range(5))
+        Team.objects.bulk_create(
+            Team(name=f'Team {i}', logo='logos/t.png', captain=captain,
+                 game=game, voucher='vouchers/t.pdf',
+                 registration_status='confirmed')
+            for i, captain in enumerate(captains))
+        cls.tournament = Tournament.objects.create(
+            game=game, name='Open', start_date=timezone.now())
+
+    def rounds(self):
+        rounds = {}
+        for match in Match.objects.filter(
+                tournament=self.tournament).prefetch_related('participants'):
+            rounds.setdefault(match.round, []).append(
+                len(match.participants.all()))
+        return rounds
+
+    def test_single_elimination_places_byes_in_second_round(self):
+        with self.assertNumQueries(6):
+            generate_bracket(self.tournament, 'single_elimination')
+        self.assertEqual(self.rounds(), {
+            'Quarterfinals': [2],
+            'Semifinals': [1, 2],
+            'Final': [0],
+        })
+
+    def test_round_robin_pairs_every_entrant_once(self):
+        generate_bracket(self.tournament, 'round_robin')
+        rounds = self.rounds()
+        self.assertEqual(len(rounds), 5)
+        self.assertEqual(sum(map(len, rounds.values())), 10)
+
+    def test_losers_rounds_interleave_with_winners_rounds(self):
+        generate_bracket(self.tournament, 'double_elimination')
+        days = {
+            label: (date - self.tournament.start_date).days
+            for label, date in Match.objects.filter(
+                tournament=self.tournament).values_list('round', 'date')}
+        self.assertEqual(days['Losers Round 1'], days['Winners Semifinals'])
+        self.assertLess(days['Losers Round 1'], days['Winners Final'])
+        self.assertEqual(days['Losers Round 4'], 4)
+        self.assertEqual(days['Grand Final'], 5)
+
+    def test_swiss_gives_the_odd_entrant_a_bye(self):
+        generate_bracket(self.tournament, 'swiss')
+        self.assertEqual(self.rounds(), {'Round 1': [2, 2, 1]})
+        bye = Match.objects.get(tournament=self.tournament, results='Bye')
+        self.assertEqual(
+            bye.participants.get().team.captain.username, 'captain-4')
+
+    def test_existing_matches_are_kept_unless_replaced(self):
+        generate_bracket(self.tournament, 'swiss')
+        with self.assertRaises(ValidationError):
+            generate_bracket(self.tournament, 'double_elimination')
+        matches = generate_bracket(
+            self.tournament, 'double_elimination', replace=True)
+        self.assertEqual(len(matches), 4 + 6 + 1)
+
+
+class StandingsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        game = Game.objects.create(
+            name='League', description='-', type_of_game='individual',
+            bases='bases/l.pdf', images='games/l.png')
+        cls.players = CustomUser.objects.bulk_create(
+            CustomUser(username=f'player-{i}', nickname=f'P{i}')
+            for i in range(4))
+        IndividualInscription.objects.bulk_create(
+            IndividualInscription(user=player, game=game,
+                                  voucher='vouchers/p.pdf',
+                                  registration_status='confirmed')
+            for player in cls.players)
+        cls.tournament = Tournament.objects.create(
+            game=game, name='League', start_date=timezone.now())
+        generate_bracket(cls.tournament, 'round_robin')
+
+    def play_all(self, score=None, reverse=False):
+        matches = Match.objects.filter(
+            tournament=self.tournament).order_by('-id' if reverse else 'id')
+        for index, match in enumerate(matches):
+            for offset, participant in enumerate(match.participants.all()):
+                participant.score = (
+                    (index + offset) % 3 if score is None else score)
+                participant.save()
+            match.status = 'played'
+            match.save()
+
+    def snapshot(self):
+        return list(Standing.objects.filter(
+            tournament=self.tournament).order_by(*RANK_ORDERING).values(
+            'user_id', *STAT_FIELDS))
+
+    def test_incremental_standings_match_a_rebuild(self):
+        self.play_all()
+        incremental = self.snapshot()
+        self.assertEqual(len(incremental), 4)
+        self.assertEqual(sum(row['played'] for row in incremental), 12)
+
+        rebuild_standings(self.tournament)
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_ties_rank_the_same_after_a_rebuild(self):
+        # Played last match first, so rows are created in another order.
+        self.play_all(score=1, reverse=True)
+        incremental = [row['user_id'] for row in self.snapshot()]
+        self.assertEqual(
+            incremental, sorted(player.pk for player in self.players))
+
+        rebuild_standings(self.tournament)
+        self.assertEqual(
+            [row['user_id'] for row in self.snapshot()], incremental)
+
+    def test_leaving_played_reverts_the_match(self):
+        self.play_all()
+        match = Match.objects.filter(tournament=self.tournament).first()
+        match.status = 'canceled'
+        match.save()
+        incremental = self.snapshot()
+
+        rebuild_standings(self.tournament)
+        self.assertEqual(self.snapshot(), incremental)
+        self.assertEqual(sum(row['played'] for row in incremental), 10)
+
+    def test_scores_corrected_after_playing_are_applied(self):
+        match = Match.objects.filter(tournament=self.tournament).first()
+        match.status = 'played'
+        match.save()
+        first, second = match.participants.all()
+        for participant, score in [(first, 2), (second, 1), (second, 3)]:
+            participant.score = score
+            participant.save()
+        incremental = self.snapshot()
+        self.assertEqual(len(incremental), 2)
+
+        rebuild_standings(self.tournament)
+        self.assertEqual(self.snapshot(), incremental)
+
+        second.delete()
+        self.assertEqual(self.snapshot(), [])
+        match.status = 'canceled'
+        match.save()
+        self.assertEqual(self.snapshot(), [])
+
+    def test_standings_pages_carry_ranks(self):
+        self.play_all()
+        url = reverse('tournaments-standings', args=[self.tournament.pk])
+        first = APIClient().get(url, {'page_size': 3})
+        self.assertEqual(
+            [row['rank'] for row in first.data['results']], [1, 2, 3])
+
+        second = APIClient().get(first.data['next'])
+        self.assertEqual([row['rank'] for row in second.data['results']], [4])
+        self.assertIsNone(second.data['next'])
+        points = [row['points'] for row in
+                  first.data['results'] + second.data['results']]
+        self.assertEqual(points, sorted(points, reverse=True))
+
+    def test_standings_pages_walk_through_ties(self):
+        self.play_all(score=1, reverse=True)
+        url = reverse('tournaments-standings', args=[self.tournament.pk])
+        users, next_link = [], url + '?page_size=1'
+        while next_link:
+            page = APIClient().get(next_link)
+            users += [row['user'] for row in page.data['results']]
+            next_link = page.data['next']
+        self.assertEqual(users, sorted(player.pk for player in self.players))
+
+
+class ScheduleTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.game = Game.objects.create(
+                name='Arena', description='-', type_of_game='team',
+                bases='bases/a.pdf', images='games/a.png')
+            captain = CustomUser.objects.create(username='cap', nickname='C')
+            self.teams = [
+                Team.objects.create(name=name, captain=captain, game=self.game,
+                                    logo='logos/t.png',
+                                    voucher='vouchers/t.pdf')
+                for name in ('Red', 'Blue')
+            ]
+            self.tournament = Tournament.objects.create(
+                game=self.game, name='Open, Spring', status='ongoing',
+                start_date=timezone.now())
+            self.match = Match.objects.create(
+                tournament=self.tournament, round='Final',
+                date=timezone.now() + timedelta(hours=1))
+            for team in self.teams:
+                MatchParticipant.objects.create(match=self.match, team=team)
+            Transmission.objects.create(
+                match=self.match, platform='Twitch',
+                url='https://twitch.tv/arena')
+
+    def feed(self, **params):
+        response = self.client.get(reverse('public-schedule'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def test_feed_is_one_indexed_read(self):
+        with self.assertNumQueries(1):
+            results = self.feed()
+        self.assertEqual(len(results), 1)
+        entry = results[0]
+        self.assertEqual(entry['game']['name'], 'Arena')
+        self.assertEqual(
+            [p['name'] for p in entry['participants']], ['Red', 'Blue'])
+        self.assertEqual(entry['transmissions'][0]['platform'], 'Twitch')
+
+    def test_changes_refresh_entries_on_commit(self):
+        with mock.patch('esports.schedule.refresh',
+                        wraps=schedule.refresh) as refresh:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.teams[0].name = 'Crimson'
+                self.teams[0].save()
+                self.match.round = 'Grand final'
+                self.match.save()
+        self.assertEqual(refresh.call_count, 1)
+
+        entry = self.feed()[0]
+        self.assertEqual(entry['round'], 'Grand final')
+        self.assertEqual(entry['participants'][0]['name'], 'Crimson')
+
+    def test_rolled_back_changes_do_not_hold_later_refreshes(self):
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                self.match.round = 'Rolled back'
+                self.match.save()
+                raise IntegrityError
+        with self.captureOnCommitCallbacks(execute=True):
+            self.match.round = 'Semi final'
+            self.match.save()
+        self.assertEqual(self.feed()[0]['round'], 'Semi final')
+
+    def test_unlisted_matches_are_removed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.game.active = False
+            self.game.save()
+        self.assertEqual(self.feed(), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.game.active = True
+            self.game.save()
+            self.tournament.status = 'completed'
+            self.tournament.save()
+        self.assertEqual(self.feed(), [])
+
+    def test_unrelated_saves_do_not_refresh(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            CustomUser.objects.get(username='cap').save(
+                update_fields=['last_login'])
+        self.assertEqual(callbacks, [])
+
+    def test_feed_filters_by_game(self):
+        self.assertEqual(len(self.feed(game=self.game.pk)), 1)
+        self.assertEqual(self.feed(game=self.game.pk + 1), [])
+        response = self.client.get(reverse('public-schedule'), {'game': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_past_matches_leave_the_feed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.match.date = timezone.now() - timedelta(days=1)
+            self.match.save()
+        self.assertEqual(self.feed(), [])
+
+    def test_bracket_matches_are_listed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.teams[1].registration_status = 'confirmed'
+            self.teams[1].save()
+            self.teams[0].captain = CustomUser.objects.create(
+                username='cap-2', nickname='C2')
+            self.teams[0].registration_status = 'confirmed'
+            self.teams[0].save()
+            generate_bracket(self.tournament, 'round_robin', replace=True)
+        self.assertEqual(len(self.feed()), 1)
+
+    def test_ical_export(self):
+        response = self.client.get(reverse('public-schedule-ical'))
+        self.assertEqual(response['Content-Type'],
+                         'text/calendar; charset=utf-8')
+        body = response.content.decode()
+        self.assertTrue(body.startswith('BEGIN:VCALENDAR\r\n'))
+        self.assertIn(f'UID:match-{self.match.pk}@testserver\r\n', body)
+        self.assertIn('SUMMARY:Open\\, Spring - Final: Red vs Blue\r\n',
+                      body)
+        self.assertIn('URL:https://twitch.tv/arena\r\n', body)
+        self.assertTrue(all(
+            len(line.encode()) <= 75 for line in body.split('\r\n')))
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.game = Game.objects.create(
+                name='Valorant', description='Tactical hero shooter',
+                type_of_game='team', bases='bases/v.pdf',
+                images='games/v.png')
+            self.player = CustomUser.objects.create(
+                username='valk', nickname='Valkyrie')
+            CustomUser.objects.create(
+                username='valentina', nickname='Valentina', role='admin')
+            self.team = Team.objects.create(
+                name='Valor Squad', captain=self.player, game=self.game,
+                logo='logos/v.png', voucher='vouchers/v.pdf',
+                registration_status='confirmed')
+            Team.objects.create(
+                name='Valiant', captain=self.player, game=self.game,
+                logo='logos/v.png', voucher='vouchers/v.pdf')
+            self.tournament = Tournament.objects.create(
+                game=self.game, name='Valorant Masters',
+                start_date=timezone.now())
+
+    def search(self, **params):
+        response = self.client.get(reverse('search-list'), params)
+        self.assertEqual(response.status_code, 200)
+        return [(r['type'], r['title']) for r in response.json()['results']]
+
+    def test_prefix_search_covers_public_documents(self):
+        self.assertCountEqual(self.search(q='val'), [
+            ('game', 'Valorant'), ('player', 'Valkyrie'),
+            ('team', 'Valor Squad'), ('tournament', 'Valorant Masters'),
+        ])
+
+    def test_results_are_ranked(self):
+        self.assertEqual(self.search(q='valorant mas'),
+                         [('tournament', 'Valorant Masters')])
+        self.assertEqual(self.search(q='shooter'), [('game', 'Valorant')])
+        response = self.client.get(reverse('search-list'), {'q': 'val'})
+        ranks = [r['rank'] for r in response.json()['results']]
+        self.assertEqual(ranks, sorted(ranks, reverse=True))
+
+    def test_type_filter_and_limit(self):
+        self.assertEqual(self.search(q='val', type='team'),
+                         [('team', 'Valor Squad')])
+        self.assertEqual(
+            len(self.search(q='val', type=['game', 'tournament'])), 2)
+        self.assertEqual(len(self.search(q='val', limit=1)), 1)
+
+    def test_documents_follow_their_sources(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.team.name = 'Vortex'
+            self.team.save()
+            self.player.role = 'admin'
+            self.player.save()
+            self.tournament.delete()
+        self.assertEqual(self.search(q='vor'), [('team', 'Vortex')])
+        self.assertEqual(self.search(q='val'), [('game', 'Valorant')])
+
+    def test_unrelated_saves_do_not_reindex(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.player.save(update_fields=['last_login'])
+        self.assertEqual(callbacks, [])
+
+    def test_query_is_validated(self):
+        url = reverse('search-list')
+        self.assertEqual(self.client.get(url, {'q': 'v'}).status_code, 400)
+        self.assertEqual(
+            self.client.get(url, {'q': 'val', 'type': 'match'}).status_code,
+            400)
+        self.assertEqual(self.search(q='"*) OR'), [])
+
+
+class LiveUpdateTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        game = Game.objects.create(
+            name='Live', description='-', type_of_game='team',
+            bases='bases/live.pdf', images='games/live.png')
+        cls.tournament = Tournament.objects.create(
+            game=game, name='Finals', start_date=timezone.now())
+        cls.match = Match.objects.create(
+            tournament=cls.tournament, date=timezone.now(), round='Final')
+        cls.participant = MatchParticipant.objects.create(match=cls.match)
+
+    async def next_event(self, subscription):
+        return await asyncio.wait_for(subscription.queue.get(), 1)
+
+    async def test_event_is_encoded_once_for_every_subscriber(self):
+        first = hub.subscribe([match_channel(self.match.pk)])
+        second = hub.subscribe([match_channel(self.match.pk)])
+        try:
+            await sync_to_async(broadcast_match)(
+                self.match, {'results': '1-0'})
+            a, b = await self.next_event(first), await self.next_event(second)
+        finally:
+            hub.unsubscribe(first)
+            hub.unsubscribe(second)
+        self.assertIs(a, b)
+        self.assertIn(b'"results":"1-0"', a)
+
+    async def test_slow_subscriber_is_disconnected(self):
+        subscription = hub.subscribe([match_channel(self.match.pk)], 2)
+        for _ in range(3):
+            hub.dispatch(match_channel(self.match.pk), b'data: -\n\n')
+        await asyncio.sleep(0)
+        hub.unsubscribe(subscription)
+        self.assertTrue(subscription.closed)
+        self.assertIsNone(await self.next_event(subscription))
+
+    async def test_match_save_broadcasts_changed_fields(self):
+        subscription = hub.subscribe([tournament_channel(self.tournament.pk)])
+
+        def finish():
+            with self.captureOnCommitCallbacks(execute=True):
+                match = Match.objects.get(pk=self.match.pk)
+                match.results = '2-1'
+                match.save()
+
+        try:
+            await sync_to_async(finish)()
+            message = await self.next_event(subscription)
+        finally:
+            hub.unsubscribe(subscription)
+        data = json.loads(message.decode().split('data: ', 1)[1])
+        self.assertEqual(data['changes'], {'results': '2-1'})
+        self.assertEqual(data['match'], self.match.pk)
+
+    async def test_score_change_is_streamed_to_the_match(self):
+        response = await self.async_client.get(
+            reverse('live-match', args=[self.match.pk]))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b'retry: 5000\n\n')
+
+        def score():
+            with self.captureOnCommitCallbacks(execute=True):
+                self.participant.score = 3
+                self.participant.save()
+
+        await sync_to_async(score)()
+        event = await asyncio.wait_for(anext(stream), 1)
+        await stream.aclose()
+        self.assertTrue(event.startswith(b'event: score\n'))
+        self.assertIn(b'"score":3', event)
+
+    def test_unchanged_score_is_not_broadcast(self):
+        participant = MatchParticipant.objects.get(pk=self.participant.pk)
+        with mock.patch('esports.signals.broadcast_participant') as push:
+            with self.captureOnCommitCallbacks(execute=True):
+                participant.save()
+            push.assert_not_called()
+
+            with self.captureOnCommitCallbacks(execute=True):
+                participant.score = 1
+                participant.save()
+                participant.save()
+            push.assert_called_once_with(participant)
+
+    async def test_unknown_match_is_not_found(self):
+        response = await self.async_client.get(
+            reverse('live-match', args=[0]))
+        self.assertEqual(response.status_code, 404)
+
+
+class QueryDetectorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        game = Game.objects.create(
+            name='Detect', description='-', type_of_game='individual',
+            bases='bases/d.pdf', images='games/d.png')
+        tournament = Tournament.objects.create(
+            game=game, name='Detect', start_date=timezone.now())
+        players = CustomUser.objects.bulk_create(
+            CustomUser(username=f'detect-{i}', nickname=f'D{i}')
+            for i in range(6))
+        for player in players:
+            match = Match.objects.create(
+                tournament=tournament, date=timezone.now(), round='R1')
+            MatchParticipant.objects.create(match=match, user=player)
+
+    def test_lazy_relations_raise_in_strict_mode(self):
+        with self.assertRaises(RepeatedQueryError) as raised:
+            with detect_queries():
+                [str(match) for match in Match.objects.all()]
+        self.assertIn('in __str__', str(raised.exception))
+        self.assertIn('esports/models.py', str(raised.exception))
+
+    def test_prefetched_relations_pass(self):
+        with detect_queries() as detector:
+            [str(match) for match in Match.objects.prefetch_related(
+                'participants__team', 'participants__user')]
+        self.assertEqual(detector.repeated, [])
+
+    def test_log_mode_reports_the_stack(self):
+        with self.assertLogs('esports.querydetector', 'WARNING') as logs:
+            with detect_queries('log'):
+                [str(match) for match in Match.objects.all()]
+        self.assertIn('possible N+1', logs.output[0])
+        self.assertIn('test_log_mode_reports_the_stack', logs.output[0])
+
+    def test_fingerprint_ignores_parameters_and_in_list_length(self):
+        self.assertEqual(
+            fingerprint('SELECT 1 FROM t WHERE id IN (%s, %s) LIMIT 21'),
+            fingerprint('SELECT 1 FROM t WHERE id IN (%s) LIMIT 5'))
+
+    @override_settings(QUERY_DETECTOR_MODE='log',
+                       QUERY_DETECTOR_SAMPLE_RATE=1.0,
+                       QUERY_DETECTOR_SLOW_MS=0)
+    def test_sampled_requests_log_slow_queries(self):
+        with self.assertLogs('esports.querydetector', 'WARNING') as logs:
+            self.client.get(reverse('games-list'))
+        self.assertIn('Slow query in /api/games/', logs.output[0])
+
+
+class QueryIndexTests(TestCase):
+    """
+    Asserts that the hot filters are planned on their indexes. Postgres
+    would pick sequential scans on empty test tables, so those are
+    disabled for the duration of each EXPLAIN.
+    """
+
+    def assertUsesIndex(self, queryset, index):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        plan = queryset.explain()
+        self.assertIn(index, plan)
+
+    def test_admin_role_filter(self):
+        self.assertUsesIndex(
+            CustomUser.objects.filter(role__in=['admin', 'superadmin']),
+            'customuser_role_idx')
+
+    def test_confirmed_team_lookup(self):
+        self.assertUsesIndex(
+            Team.objects.filter(captain_id=1, game_id=1,
+                                registration_status='confirmed'),
+            'unique_confirmed_captain')
+
+    def test_confirmed_inscription_lookup(self):
+        self.assertUsesIndex(
+            IndividualInscription.objects.filter(
+                user_id=1, game_id=1, registration_status='confirmed'),
+            'unique_confirmed_inscription')
+
+    def test_registration_status_filters(self):
+        self.assertUsesIndex(
+            Team.objects.filter(registration_status='pending'),
+            'team_status_idx')
+        self.assertUsesIndex(
+            IndividualInscription.objects.filter(
+                registration_status='pending'),
+            'inscription_status_idx')
+
+    def test_tournament_status_filter(self):
+        self.assertUsesIndex(
+            Tournament.objects.filter(status='ongoing'),
+            'tournament_status_idx')
+
+    def test_match_schedule_filters(self):
+        now = timezone.now()
+        self.assertUsesIndex(
+            Match.objects.filter(status='programmed', date__gte=now),
+            'match_status_date_idx')
+        self.assertUsesIndex(
+            Match.objects.filter(date__gte=now), 'match_date_idx')
+
+    def test_active_games(self):
+        self.assertUsesIndex(
+            Game.objects.filter(active=True).order_by('id'),
+            'game_active_idx')
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS,
+                   QUERY_DETECTOR_MODE='raise')
+class AdminChangelistTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.superuser = CustomUser.objects.create_superuser(
+            username='changelist-root', password='R00t-secret',
+            role='superadmin')
+
+    def setUp(self):
+        self.client.force_login(self.superuser)
+
+    def seed(self, prefix, count):
+        users = CustomUser.objects.bulk_create(
+            CustomUser(username=f'{prefix}-user-{i}', nickname=f'{prefix}{i}')
+            for i in range(count))
+        games = Game.objects.bulk_create(
+            Game(name=f'{prefix} game {i}', description='-',
+                 type_of_game='team', bases='bases/g.pdf',
+                 images='games/g.png')
+            for i in range(count))
+        AdminGame.objects.bulk_create(
+            AdminGame(admin=user, game=game)
+            for user, game in zip(users, games))
+        teams = Team.objects.bulk_create(
+            Team(name=f'{prefix} team {i}', logo='logos/t.png',
+                 captain=user, game=game, voucher='vouchers/t.pdf')
+            for i, (user, game) in enumerate(zip(users, games)))
+        TeamPlayer.objects.bulk_create(
+            TeamPlayer(user=user, team=team)
+            for user, team in zip(users, teams))
+        IndividualInscription.objects.bulk_create(
+            IndividualInscription(user=user, game=game,
+                                  voucher='vouchers/i.pdf')
+            for user, game in zip(users, games))
+        tournaments = Tournament.objects.bulk_create(
+            Tournament(game=game, name=f'{prefix} cup',
+                       start_date=timezone.now())
+            for game in games)
+        matches = Match.objects.bulk_create(
+            Match(tournament=tournament, date=timezone.now(), round='R1')
+            for tournament in tournaments)
+        MatchParticipant.objects.bulk_create(
+            [MatchParticipant(match=match, team=team)
+             for match, team in zip(matches, teams)]
+            + [MatchParticipant(match=match, user=user)
+               for match, user in zip(matches, users)])
+        Transmission.objects.bulk_create(
+            Transmission(match=match, platform='Twitch',
+                         url='https://twitch.tv/esports')
+            for match in matches)
+        MediaContent.objects.bulk_create(
+            MediaContent(tittle=f'{prefix} {i}', file='media_content/m.png',
+                         type='image')
+            for i in range(count))
+        ContactInfo.objects.bulk_create(
+            ContactInfo(platform=f'{prefix} {i}', link='https://x.test')
+            for i in range(count))
+
+    def changelist_queries(self):
+        counts = {}
+        for model in admin.site._registry:
+            if model._meta.app_label != 'esports':
+                continue
+            url = reverse(f'admin:esports_{model._meta.model_name}_changelist')
+            executed = []
+
+            def counter(execute, sql, params, many, context):
+                executed.append(sql)
+                return execute(sql, params, many, context)
+
+            with connection.execute_wrapper(counter):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            counts[model._meta.model_name] = len(executed)
+        return counts
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        self.seed('small', 2)
+        small = self.changelist_queries()
+        self.seed('large', 30)
+        self.assertEqual(self.changelist_queries(), small)
+
+    def test_autocomplete_filter_loads_only_the_selected_row(self):
+        self.seed('filter', 3)
+        game = Game.objects.get(name='filter game 1')
+        url = reverse('admin:esports_team_changelist')
+        response = self.client.get(url, {'game__id__exact': game.pk})
+
+        self.assertContains(response, 'filter team 1')
+        self.assertNotContains(response, 'filter team 0')
+        self.assertContains(response, 'data-ajax--url')
+        self.assertNotContains(response, 'filter game 2')
+
+    def test_small_tables_are_counted_exactly(self):
+        self.seed('count', 3)
+        paginator = EstimatedCountPaginator(
+            Team.objects.order_by('id'), 100)
+        self.assertEqual(paginator.count, 3)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, IMAGE_RENDITION_WIDTHS=[320, 640],
+                   IMAGE_RENDITION_FORMATS=['webp', 'jpeg'])
+class ImageRenditionTests(TestCase):
+    def test_game_image_renditions_are_exposed_as_srcset(self):
+        buffer = io.BytesIO()
+        Image.new('RGBA', (800, 400)).save(buffer, format='PNG')
+        game = Game.objects.create(
+            name='Rendered', description='-', type_of_game='team',
+            bases='bases/r.pdf',
+            images=SimpleUploadedFile('wide.png', buffer.getvalue()))
+
+        renditions = generate_renditions(
+            Game, game.pk, 'images', 'image_renditions')
+        self.assertEqual(set(renditions['webp']), {'320', '640'})
+
+        game.refresh_from_db()
+        data = GamePublicSerializer(game).data
+        self.assertRegex(
+            data['image_renditions']['jpeg'],
+            r'^/media/renditions/games/wide\.\w+/320w\.\w+\.jpeg 320w, '
+            r'/media/renditions/games/wide\.\w+/640w\.\w+\.jpeg 640w$')
+        with default_storage.open(renditions['jpeg']['320']) as stream:
+            self.assertEqual(Image.open(stream).size, (320, 160))
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, IMAGE_RENDITION_WIDTHS=[320],
+                   IMAGE_RENDITION_FORMATS=['jpeg'], TASK_RETRY_BACKOFF=0,
+                   TASK_QUEUE_CONCURRENCY={})
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        self.calls = []
+
+        def record(value):
+            self.calls.append(value)
+            if value == 'fail':
+                raise ValueError('boom')
+
+        self.record = task(queue='test', max_attempts=2,
+                           name='tests.record')(record)
+
+    def test_queued_task_runs_in_worker(self):
+        self.record.enqueue(args=['ok'])
+        self.assertEqual(self.calls, [])
+
+        self.assertEqual(work('test', ['test'], burst=True), 1)
+        self.assertEqual(self.calls, ['ok'])
+        self.assertEqual(Task.objects.get().status, 'succeeded')
+
+    def test_failed_task_is_retried_then_marked_failed(self):
+        self.record.enqueue(args=['fail'])
+
+        self.assertEqual(work('test', ['test'], burst=True), 2)
+        queued = Task.objects.get()
+        self.assertEqual(queued.status, 'failed')
+        self.assertEqual(queued.attempts, 2)
+        self.assertIn('ValueError: boom', queued.last_error)
+
+    def test_retry_waits_for_backoff(self):
+        self.record.enqueue(args=['fail'])
+        with override_settings(TASK_RETRY_BACKOFF=60):
+            self.assertEqual(work('test', ['test'], burst=True), 1)
+        queued = Task.objects.get()
+        self.assertEqual(queued.status, 'queued')
+        self.assertGreater(queued.run_at, timezone.now())
+
+    def test_idempotency_key_queues_once_until_finished(self):
+        self.record.enqueue(args=['ok'], key='once')
+        self.record.enqueue(args=['ok'], key='once')
+        self.assertEqual(Task.objects.count(), 1)
+
+        work('test', ['test'], burst=True)
+        self.record.enqueue(args=['ok'], key='once')
+        work('test', ['test'], burst=True)
+        self.assertEqual(Task.objects.count(), 2)
+        self.assertEqual(self.calls, ['ok', 'ok'])
+
+    def test_failed_task_releases_its_key(self):
+        self.record.enqueue(args=['fail'], key='failing')
+        work('test', ['test'], burst=True)
+        self.record.enqueue(args=['ok'], key='failing')
+        self.assertEqual(
+            Task.objects.filter(idempotency_key='failing').get().args,
+            ['ok'])
+
+    def test_admin_action_queues_standings_rebuild(self):
+        root = CustomUser.objects.create_superuser(
+            username='tasks-root', password='R00t-secret',
+            role='superadmin')
+        game = Game.objects.create(
+            name='Rebuilt', description='-', type_of_game='team',
+            bases='bases/r.pdf', images='games/r.png')
+        tournament = Tournament.objects.create(
+            game=game, name='Rebuilt', start_date=timezone.now())
+        self.client.force_login(root)
+        self.client.post(reverse('admin:esports_tournament_changelist'), {
+            'action': 'rebuild_standings',
+            '_selected_action': [tournament.pk]})
+
+        queued = Task.objects.get(queue='standings')
+        self.assertEqual(queued.args, [tournament.pk])
+
+    def test_saturated_queue_is_skipped(self):
+        Task.objects.create(queue='test', name='tests.record',
+                            status='running', locked_at=timezone.now())
+        self.record.enqueue(args=['ok'])
+
+        with override_settings(TASK_QUEUE_CONCURRENCY={'test': 1}):
+            self.assertIsNone(claim('other', ['test']))
+        self.assertIsNotNone(claim('other', ['test']))
+
+    def test_stale_running_task_is_requeued(self):
+        Task.objects.create(
+            queue='test', name='tests.record', args=['ok'],
+            status='running', attempts=1,
+            locked_at=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(work('test', ['test'], burst=True), 0)
+        self.assertEqual(work('test', ['test'], burst=True), 1)
+        self.assertEqual(self.calls, ['ok'])
+
+    def test_stale_task_out_of_attempts_fails(self):
+        Task.objects.create(
+            queue='test', name='tests.record', args=['ok'],
+            idempotency_key='crash', status='running',
+            attempts=2, max_attempts=2,
+            locked_at=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(work('test', ['test'], burst=True), 0)
+        self.assertEqual(work('test', ['test'], burst=True), 0)
+        self.assertEqual(self.calls, [])
+        failed = Task.objects.get()
+        self.assertEqual(failed.status, 'failed')
+        self.assertIsNone(failed.idempotency_key)
+        self.record.enqueue(args=['ok'], key='crash')
+        self.assertEqual(Task.objects.filter(status='queued').count(), 1)
+
+    def test_game_image_renditions_are_queued(self):
+        game = Game.objects.create(
+            name='Queued', description='-', type_of_game='team',
+            bases='bases/q.pdf', images=png_file('queued.png'))
+        task_row = Task.objects.get(name='esports.tasks.render_image')
+        self.assertEqual(task_row.args, ['game', game.pk])
+
+        call_command('run_tasks', '--burst', '--queue', 'images',
+                     stdout=io.StringIO())
+        game.refresh_from_db()
+        self.assertEqual(game.image_renditions['source'], game.images.name)
+        self.assertIn('jpeg', game.image_renditions)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, MEDIA_OFFLOAD='')
+class MediaServingTests(TestCase):
+    def setUp(self):
+        self.name = default_storage.save(
+            'media_content/clip.mp4', ContentFile(b'0123456789'))
+        self.url = f'/media/{self.name}'
+
+    def test_hashed_file_is_served_as_immutable(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['ETag'], f'"{content_hash(self.name)}"')
+
+    def test_identical_uploads_share_a_file(self):
+        name = default_storage.save(
+            'media_content/copy.mp4', ContentFile(b'0123456789'))
+        self.assertNotEqual(name, self.name)
+        same = default_storage.save(
+            'media_content/clip.mp4', ContentFile(b'0123456789'))
+        self.assertEqual(same, self.name)
+
+    def test_range_request_returns_partial_content(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), b'2345')
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-3')
+        self.assertEqual(b''.join(response.streaming_content), b'789')
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=20-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */10')
+
+    def test_matching_etag_is_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    @override_settings(MEDIA_OFFLOAD='x-accel')
+    def test_body_can_be_offloaded_to_the_front_server(self):
+        response = self.client.get(self.url)
+        self.assertEqual(
+            response['X-Accel-Redirect'], f'/protected-media/{self.name}')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, UPLOAD_TEMP_DIR=MEDIA_ROOT)
+class ResumableUploadTests(TestCase):
+    content = b'%PDF-1.4 resumable bases'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.superadmin = CustomUser.objects.create(
+            username='uploader', role='superadmin')
+        cls.game = Game.objects.create(
+            name='Uploads', description='-', type_of_game='team',
+            bases='bases/old.pdf', images='games/u.png')
+
+    def setUp(self):
+        self.client = APIClient()
+        token = issue_tokens(self.superadmin).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def start(self, checksum=None):
+        response = self.client.post(reverse('uploads-list'), {
+            'target': 'game_bases', 'object_id': self.game.pk,
+            'filename': 'bases.pdf', 'size': len(self.content),
+            'checksum': checksum or hashlib.sha256(self.content).hexdigest(),
+        })
+        return reverse('uploads-detail', args=[response.data['id']])
+
+    def send(self, url, offset, chunk):
+        return self.client.generic(
+            'PATCH', url, chunk,
+            content_type='application/offset+octet-stream',
+            HTTP_UPLOAD_OFFSET=str(offset))
+
+    def test_chunks_are_assembled_and_attached(self):
+        url = self.start()
+        response = self.send(url, 0, self.content[:10])
+        self.assertEqual(response['Upload-Offset'], '10')
+        response = self.send(url, 10, self.content[10:])
+        self.assertEqual(response.data['status'], 'complete')
+
+        self.game.refresh_from_db()
+        with self.game.bases.open('rb') as stream:
+            self.assertEqual(stream.read(), self.content)
+
+    def test_wrong_offset_is_a_conflict(self):
+        url = self.start()
+        self.send(url, 0, self.content[:10])
+        response = self.send(url, 5, self.content[5:])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Upload-Offset'], '10')
+
+    def test_retry_of_a_written_chunk_is_a_conflict(self):
+        url = self.start()
+        stale = Upload.objects.get()
+        retry = Upload.objects.get()
+        append_chunk(stale, 0, io.BytesIO(self.content[:10]))
+        with self.assertRaises(OffsetMismatch):
+            append_chunk(retry, 0, io.BytesIO(self.content[:10]))
+        self.assertEqual(retry.offset, 10)
+
+        response = self.send(url, 10, self.content[10:])
+        self.assertEqual(response.data['status'], 'complete')
+
+    def test_filenames_with_paths_are_rejected(self):
+        for filename in ['../../evil.pdf', 'dir\\evil.pdf', '..']:
+            response = self.client.post(reverse('uploads-list'), {
+                'target': 'game_bases', 'object_id': self.game.pk,
+                'filename': filename, 'size': len(self.content),
+                'checksum': hashlib.sha256(self.content).hexdigest(),
+            })
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('filename', response.data)
+        self.assertFalse(Upload.objects.exists())
+
+    def test_checksum_mismatch_discards_the_upload(self):
+        url = self.start(checksum='0' * 64)
+        response = self.send(url, 0, self.content)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(url).data['status'], 'failed')
+        self.game.refresh_from_db()
+        self.assertEqual(self.game.bases.name, 'bases/old.pdf')
@@ -0,0 +1,28 @@
+from collections.abc import Mapping
+
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class LoginIPThrottle(SimpleRateThrottle):
+    scope = 'login_ip'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': self.get_ident(request)
+        }
+
+
+class LoginUsernameThrottle(SimpleRateThrottle):
+    scope = 'login_username'
+
+    def get_cache_key(self, request, view):
+        if not isinstance(request.data, Mapping):
+            return None
+        username = request.data.get('username')
+        if not isinstance(username, str) or not username:
+            return None
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': username.strip().lower()
+        }
@@ -0,0 +1,134 @@
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Game, IndividualInscription, MediaContent, Team, Upload
+
+
+BLOCK_SIZE = 64 * 1024
+
+UPLOAD_TARGETS = {
+    'team_voucher': (Team, 'voucher'),
+    'inscription_voucher': (IndividualInscription, 'voucher'),
+    'game_bases': (Game, 'bases'),
+    'media_content': (MediaContent, 'file'),
+}
+
+# Lookup from the target to its game, for targets scoped to a game.
+UPLOAD_GAME_FIELDS = {
+    'team_voucher': 'game_id',
+    'inscription_voucher': 'game_id',
+    'game_bases': 'pk',
+}
+
+
+class UploadError(Exception):
+    pass
+
+
+class OffsetMismatch(UploadError):
+    pass
+
+
+def part_path(upload):
+    return os.path.join(settings.UPLOAD_TEMP_DIR, f'{upload.pk}.part')
+
+
+def append_chunk(upload, offset, stream):
+    """
+    Appends the request body to the partial file and returns the new
+    offset. The upload row stays locked while the chunk is written, so
+    a concurrent request for the same offset (e.g. a client retry)
+    waits and then fails the offset check instead of writing twice.
+    """
+    with transaction.atomic():
+        locked = Upload.objects.select_for_update().only(
+            'status', 'offset').get(pk=upload.pk)
+        upload.status, upload.offset = locked.status, locked.offset
+        if upload.status != 'pending':
+            raise UploadError("This upload is no longer accepting data.")
+        if offset != upload.offset:
+            raise OffsetMismatch("Upload-Offset does not match the server.")
+        received = write_chunk(upload, stream)
+        Upload.objects.filter(pk=upload.pk).update(offset=received)
+
+    upload.offset = received
+    if upload.offset == upload.size:
+        complete(upload)
+    return upload.offset
+
+
+def write_chunk(upload, stream):
+    """
+    Writes `stream` after the recorded offset, one block at a time, so
+    memory use does not depend on the chunk size.
+    """
+    os.makedirs(settings.UPLOAD_TEMP_DIR, exist_ok=True)
+    with open(part_path(upload), 'ab') as part:
+        # Drop bytes written by a request that failed before recording
+        # its offset.
+        part.truncate(upload.offset)
+        received = upload.offset
+        while True:
+            block = stream.read(BLOCK_SIZE)
+            if not block:
+                break
+            received += len(block)
+            if received > upload.size:
+                part.truncate(upload.offset)
+                raise UploadError("Chunk exceeds the declared upload size.")
+            part.write(block)
+    return received
+
+
+def file_checksum(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as part:
+        for block in iter(lambda: part.read(BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def complete(upload):
+    """
+    Verifies the assembled file against the declared SHA-256 and
+    attaches it to the target field.
+    """
+    path = part_path(upload)
+    if file_checksum(path) != upload.checksum:
+        fail(upload)
+        raise UploadError("Checksum mismatch; the upload was discarded.")
+
+    model, field = UPLOAD_TARGETS[upload.target]
+    with transaction.atomic():
+        obj = model.objects.select_for_update().filter(
+            pk=upload.object_id).first()
+        if obj is None:
+            fail(upload)
+            raise UploadError("The upload target no longer exists.")
+        with open(path, 'rb') as part:
+            getattr(obj, field).save(
+                upload.filename, File(part), save=False)
+        obj.save(update_fields=[field])
+
+        upload.status = 'complete'
+        upload.completed_at = timezone.now()
+        upload.save(update_fields=['status', 'completed_at'])
+    os.remove(path)
+
+
+def fail(upload):
+    upload.status = 'failed'
+    upload.save(update_fields=['status'])
+    discard(upload)
+
+
+def discard(upload):
+    try:
+        os.remove(part_path(upload))
+    except FileNotFoundError:
+        pass
@@ -1,9 +1,30 @@
+from django.urls import path
 from rest_framework.routers import DefaultRouter
-from .views import AdminViewSet, GameViewSet
+from .views import (
+    AdminViewSet, GameViewSet, RegistrationViewSet, SearchViewSet,
+    TournamentViewSet, UploadViewSet, live_match, live_tournament,
+    public_game_detail, public_game_list, public_schedule,
+    public_schedule_ical
+)
 
 
 router = DefaultRouter()
 router.register(r'admin', AdminViewSet, basename='admin')
 router.register(r'games', GameViewSet, basename='games')
+router.register(
+    r'registrations', RegistrationViewSet, basename='registrations')
+router.register(r'search', SearchViewSet, basename='search')
+router.register(r'tournaments', TournamentViewSet, basename='tournaments')
+router.register(r'uploads', UploadViewSet, basename='uploads')
 
-urlpatterns = router.urls
+urlpatterns = router.urls + [
+    path('public/games/', public_game_list, name='public-games-list'),
+    path('public/games/<int:pk>/', public_game_detail,
+         name='public-games-detail'),
+    path('public/schedule/', public_schedule, name='public-schedule'),
+    path('public/schedule.ics', public_schedule_ical,
+         name='public-schedule-ical'),
+    path('live/tournaments/<int:pk>/', live_tournament,
+         name='live-tournament'),
+    path('live/matches/<int:pk>/', live_match, name='live-match'),
+]
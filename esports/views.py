@@ -1,17 +1,45 @@
+import io
+
+from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework import viewsets, status
 from django.contrib.auth import get_user_model
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import IsAuthenticated
+from django.db.models import Prefetch
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404
-from esports.models import Game
+from esports.models import Game, Match, Standing, Tournament, Upload
 from esports.serializers import (
     AdminLoginSerializer, ChangePasswordSerializer, ResetPasswordSerializer,
     AdminListSerializer, AdminCreateSerializer, GamePublicSerializer,
-    GameCreateUpdateSerializer
+    GameCreateUpdateSerializer, RegistrationImportSerializer,
+    RegistrationReviewSerializer, SearchQuerySerializer, StandingSerializer,
+    UploadSerializer, admin_games_context, requested_fields
+)
+from esports.authentication import issue_tokens
+from esports.cache import (
+    CATALOG_VERSION_KEY, acached_response, cached_response, game_version_key,
+    get_stats
+)
+from esports.importers import RegistrationImporter, import_format, read_rows
+from esports.live import match_channel, stream_response, tournament_channel
+from esports.metrics import registry
+from esports.pagination import IdCursorPagination, StandingsPagination
+from esports.permissions import (
+    IsAdminOrSuperAdmin, IsGameAdmin, IsSuperAdmin, managed_game_ids
+)
+from esports.reviews import ConcurrentReview, RegistrationReviewer
+from esports.schedule import calendar, upcoming
+from esports.search import search_documents
+from esports.throttling import LoginIPThrottle, LoginUsernameThrottle
+from esports.uploads import (
+    OffsetMismatch, UploadError, append_chunk, discard
 )
-from esports.permissions import IsAdminOrSuperAdmin, IsSuperAdmin
 
 
 User = get_user_model()
@@ -35,13 +63,14 @@ class AdminViewSet(viewsets.ViewSet):
         except KeyError:
             return []
 
-    @action(detail=False, methods=['post'], url_path='login')
+    @action(detail=False, methods=['post'], url_path='login',
+            throttle_classes=[LoginIPThrottle, LoginUsernameThrottle])
     def login(self, request):
         serializer = AdminLoginSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
         user = serializer.validated_data['user']
-        refresh = RefreshToken.for_user(user)
+        refresh = issue_tokens(user)
 
         return Response({
             'refresh': str(refresh),
@@ -53,7 +82,7 @@ class AdminViewSet(viewsets.ViewSet):
         serializer = ChangePasswordSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
-        user = request.user
+        user = User.objects.get(pk=request.user.id)
         old_password = serializer.validated_data['old_password']
         new_password = serializer.validated_data['new_password']
 
@@ -63,6 +92,7 @@ class AdminViewSet(viewsets.ViewSet):
             }, status=status.HTTP_400_BAD_REQUEST)
 
         user.set_password(new_password)
+        user.revoke_tokens()
         user.save()
 
         return Response({
@@ -83,6 +113,7 @@ class AdminViewSet(viewsets.ViewSet):
 
         new_password = serializer.validated_data['new_password']
         user.set_password(new_password)
+        user.revoke_tokens()
         user.save()
 
         return Response({
@@ -90,8 +121,9 @@ class AdminViewSet(viewsets.ViewSet):
         }, status=status.HTTP_200_OK)
 
     def list(self, request):
-        users = User.objects.filter(role__in=['admin', 'superadmin'])
-        serializer = AdminListSerializer(users, many=True)
+        users = list(User.objects.filter(role__in=['admin', 'superadmin']))
+        serializer = AdminListSerializer(
+            users, many=True, context=admin_games_context(users))
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     def create(self, request):
@@ -116,16 +148,39 @@ class AdminViewSet(viewsets.ViewSet):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+def public_games(fields=None):
+    """
+    Queryset of the public game catalog, loading only the requested
+    fields and prefetching tournaments only when they are serialized.
+    """
+    games = Game.objects.order_by('id')
+    if fields:
+        games = games.only(*(
+            name for name in fields
+            if name in GamePublicSerializer.Meta.fields
+            and name != 'tournaments'
+        ), 'id')
+    if fields and 'tournaments' not in fields:
+        return games
+
+    tournaments = Tournament.objects.only(
+        'id', 'name', 'status', 'game_id').order_by('id')
+    return games.prefetch_related(
+        Prefetch('tournament_set', queryset=tournaments))
+
+
 class GameViewSet(viewsets.ViewSet):
+    pagination_class = IdCursorPagination
     permission_classes_by_action = {
         'list': [],
         'retrieve': [],
         'create': [IsSuperAdmin],
         'update': [IsSuperAdmin],
-        'partial_update': [IsAdminOrSuperAdmin],
+        'partial_update': [IsGameAdmin],
         'destroy': [IsSuperAdmin],
         'activate': [IsSuperAdmin],
         'deactivate': [IsSuperAdmin],
+        'cache_stats': [IsSuperAdmin],
     }
 
     def get_permissions(self):
@@ -136,15 +191,28 @@ class GameViewSet(viewsets.ViewSet):
         except KeyError:
             return [IsAuthenticated()]
 
+    def get_queryset(self):
+        return public_games(requested_fields(self.request))
+
     def list(self, request):
-        games = Game.objects.all()
-        serializer = GamePublicSerializer(games, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        def build():
+            paginator = self.pagination_class()
+            games = paginator.paginate_queryset(
+                self.get_queryset(), request, view=self)
+            serializer = GamePublicSerializer(
+                games, many=True, fields=requested_fields(request))
+            return paginator.get_paginated_response(serializer.data)
+
+        return cached_response(request, [CATALOG_VERSION_KEY], build)
 
     def retrieve(self, request, pk=None):
-        game = get_object_or_404(Game, pk=pk)
-        serializer = GamePublicSerializer(game)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        def build():
+            game = get_object_or_404(self.get_queryset(), pk=pk)
+            serializer = GamePublicSerializer(
+                game, fields=requested_fields(request))
+            return Response(serializer.data, status=status.HTTP_200_OK)
+
+        return cached_response(request, [game_version_key(pk)], build)
 
     def create(self, request):
         serializer = GameCreateUpdateSerializer(data=request.data,
@@ -166,6 +234,7 @@ class GameViewSet(viewsets.ViewSet):
 
     def partial_update(self, request, pk=None):
         game = get_object_or_404(Game, pk=pk)
+        self.check_object_permissions(request, game)
         serializer = GameCreateUpdateSerializer(instance=game,
                                                 data=request.data,
                                                 partial=True,
@@ -200,3 +269,288 @@ class GameViewSet(viewsets.ViewSet):
         game.save()
         return Response({"message": "Game deactivated successfully."},
                         status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'], url_path='cache-stats')
+    def cache_stats(self, request):
+        return Response(get_stats(), status=status.HTTP_200_OK)
+
+
+async def public_game_list(request):
+    """
+    Async read of the public game catalog for ASGI deployments. Same
+    payload, cursors and cache as `GameViewSet.list`, but the page is
+    fetched with the async ORM so the worker is free while it waits.
+    """
+    request = Request(request)
+    fields = requested_fields(request)
+
+    async def build():
+        paginator = IdCursorPagination()
+        paginator.base_url = request.build_absolute_uri()
+        page_size = paginator.get_page_size(request)
+        try:
+            cursor = paginator.decode_cursor(request)
+        except NotFound as exc:
+            return {'detail': str(exc.detail)}, status.HTTP_404_NOT_FOUND
+
+        games = public_games(fields)
+        position = cursor.position if cursor else None
+        reverse = cursor.reverse if cursor else False
+        if position is not None:
+            games = games.filter(
+                **{'id__lt' if reverse else 'id__gt': position})
+        games = games.order_by('-id' if reverse else 'id')
+
+        rows = [game async for game in games[:page_size + 1]]
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+
+        next_link = previous_link = None
+        if rows and (has_more if not reverse else position is not None):
+            next_link = paginator.encode_cursor(
+                Cursor(offset=0, reverse=False, position=rows[-1].id))
+        if rows and (has_more if reverse else position is not None):
+            previous_link = paginator.encode_cursor(
+                Cursor(offset=0, reverse=True, position=rows[0].id))
+
+        serializer = GamePublicSerializer(rows, many=True, fields=fields)
+        return {
+            'next': next_link,
+            'previous': previous_link,
+            'results': serializer.data,
+        }, status.HTTP_200_OK
+
+    return await acached_response(request, [CATALOG_VERSION_KEY], build)
+
+
+async def public_game_detail(request, pk):
+    request = Request(request)
+    fields = requested_fields(request)
+
+    async def build():
+        game = await public_games(fields).filter(pk=pk).afirst()
+        if game is None:
+            return ({'detail': 'No Game matches the given query.'},
+                    status.HTTP_404_NOT_FOUND)
+        return GamePublicSerializer(game, fields=fields).data, \
+            status.HTTP_200_OK
+
+    return await acached_response(request, [game_version_key(pk)], build)
+
+
+def schedule_game(request):
+    game = request.GET.get('game')
+    if game is None:
+        return None
+    if not game.isdigit():
+        raise ValueError(game)
+    return int(game)
+
+
+async def public_schedule(request):
+    """
+    Upcoming and ongoing matches of the active games, optionally of one
+    `game`, served from the precomputed schedule in a single read.
+    """
+    try:
+        game = schedule_game(request)
+    except ValueError:
+        return JsonResponse({'game': ['A valid integer is required.']},
+                            status=status.HTTP_400_BAD_REQUEST)
+    entries = upcoming(game).values_list('data', flat=True)
+    return JsonResponse({'results': [data async for data in entries]})
+
+
+async def public_schedule_ical(request):
+    """
+    The public schedule as an iCalendar feed clients can subscribe to.
+    """
+    try:
+        game = schedule_game(request)
+    except ValueError:
+        return JsonResponse({'game': ['A valid integer is required.']},
+                            status=status.HTTP_400_BAD_REQUEST)
+    rows = [row async for row in upcoming(game).values_list('date', 'data')]
+    return HttpResponse(calendar(rows, request.get_host()),
+                        content_type='text/calendar; charset=utf-8')
+
+
+async def live_tournament(request, pk):
+    """
+    Server-sent events for every match of a tournament.
+    """
+    if not await Tournament.objects.filter(pk=pk).aexists():
+        return JsonResponse(
+            {'detail': 'No Tournament matches the given query.'},
+            status=status.HTTP_404_NOT_FOUND)
+    return stream_response([tournament_channel(pk)])
+
+
+async def live_match(request, pk):
+    """
+    Server-sent events for the status, results and scores of one match.
+    """
+    if not await Match.objects.filter(pk=pk).aexists():
+        return JsonResponse(
+            {'detail': 'No Match matches the given query.'},
+            status=status.HTTP_404_NOT_FOUND)
+    return stream_response([match_channel(pk)])
+
+
+def metrics(request):
+    """
+    Request metrics of this process in the Prometheus text format.
+    """
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        return HttpResponse(status=status.HTTP_403_FORBIDDEN)
+    return HttpResponse(registry.render(),
+                        content_type='text/plain; version=0.0.4')
+
+
+class RegistrationViewSet(viewsets.ViewSet):
+    permission_classes_by_action = {
+        'import_rows': [IsAdminOrSuperAdmin],
+        'review': [IsAdminOrSuperAdmin],
+    }
+
+    def get_permissions(self):
+        try:
+            return [permission()
+                    for permission in
+                    self.permission_classes_by_action[self.action]]
+        except KeyError:
+            return [IsAuthenticated()]
+
+    @action(detail=False, methods=['post'], url_path='import',
+            url_name='import', parser_classes=[MultiPartParser])
+    def import_rows(self, request):
+        serializer = RegistrationImportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        upload = serializer.validated_data['file']
+        importer = RegistrationImporter(
+            game_ids=managed_game_ids(request.user))
+        report = importer.run(
+            read_rows(upload.file, import_format(upload.name)))
+
+        return Response(report.as_dict(), status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['post'])
+    def review(self, request):
+        serializer = RegistrationReviewSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        decisions = [
+            (decision['type'], decision['id'], decision['status'])
+            for decision in serializer.validated_data['decisions']
+        ]
+        try:
+            report = RegistrationReviewer(
+                request.user.id, managed_game_ids(request.user)
+            ).run(decisions)
+        except ConcurrentReview as exc:
+            return Response({"error": str(exc)},
+                            status=status.HTTP_409_CONFLICT)
+        return Response(report.as_dict(), status=status.HTTP_200_OK)
+
+
+class TournamentViewSet(viewsets.ViewSet):
+    permission_classes_by_action = {
+        'standings': [],
+    }
+
+    def get_permissions(self):
+        try:
+            return [permission()
+                    for permission in
+                    self.permission_classes_by_action[self.action]]
+        except KeyError:
+            return [IsAuthenticated()]
+
+    @action(detail=True, methods=['get'])
+    def standings(self, request, pk=None):
+        tournament = get_object_or_404(Tournament.objects.only('id'), pk=pk)
+        paginator = StandingsPagination()
+        rows = paginator.paginate_queryset(
+            Standing.objects.filter(tournament=tournament).select_related(
+                'team', 'user'), request, view=self)
+        serializer = StandingSerializer(rows, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+
+class SearchViewSet(viewsets.ViewSet):
+    permission_classes_by_action = {
+        'list': [],
+    }
+
+    def get_permissions(self):
+        try:
+            return [permission()
+                    for permission in
+                    self.permission_classes_by_action[self.action]]
+        except KeyError:
+            return [IsAuthenticated()]
+
+    def list(self, request):
+        serializer = SearchQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        query = serializer.validated_data
+        results = search_documents(
+            query['q'], query.get('type'), query['limit'])
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+
+class UploadViewSet(viewsets.ViewSet):
+    permission_classes = [IsAdminOrSuperAdmin]
+
+    def get_upload(self, request, pk):
+        return get_object_or_404(Upload, pk=pk, owner_id=request.user.id)
+
+    def offset_response(self, upload, status_code=status.HTTP_200_OK):
+        response = Response(
+            UploadSerializer(upload).data, status=status_code)
+        response['Upload-Offset'] = str(upload.offset)
+        response['Upload-Length'] = str(upload.size)
+        return response
+
+    def create(self, request):
+        serializer = UploadSerializer(data=request.data,
+                                      context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        upload = serializer.save(owner_id=request.user.id)
+        return self.offset_response(upload, status.HTTP_201_CREATED)
+
+    def retrieve(self, request, pk=None):
+        return self.offset_response(self.get_upload(request, pk))
+
+    def partial_update(self, request, pk=None):
+        upload = self.get_upload(request, pk)
+        try:
+            offset = int(request.headers['Upload-Offset'])
+        except (KeyError, ValueError):
+            return Response({
+                "error": "A numeric Upload-Offset header is required."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            append_chunk(upload, offset, request.stream or io.BytesIO())
+        except OffsetMismatch as exc:
+            response = Response({
+                "error": str(exc)
+            }, status=status.HTTP_409_CONFLICT)
+            response['Upload-Offset'] = str(upload.offset)
+            return response
+        except UploadError as exc:
+            return Response({
+                "error": str(exc)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        return self.offset_response(upload)
+
+    def destroy(self, request, pk=None):
+        upload = self.get_upload(request, pk)
+        discard(upload)
+        upload.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)